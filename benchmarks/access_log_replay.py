@@ -0,0 +1,234 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import uuid
+from time import perf_counter
+from typing import Optional
+import httpx
+from benchmarks import benchmark_utils
+
+# Replays a captured access log (ACCESS_LOG_PATH) against a gateway with stub upstreams, e.g.:
+#   python -m benchmarks.access_log_replay access.log --speeds 1,2,10
+# Requests keep their relative timing divided by the speed factor. Requests of the same
+# anonymized user are sent strictly in log order, each one waiting for the previous to finish.
+
+USER_PASSWORD = "replayreplay1"
+SKIPPED_ROUTE_PREFIXES = ("/debug", "/docs", "/openapi.json", "/redoc", "<unmatched>")
+
+
+def load_access_log(path:str)->list[dict]:
+    with open(path) as log_file:
+        entries = [json.loads(line) for line in log_file if line.strip()]
+    entries = [entry for entry in entries if not entry["route"].startswith(SKIPPED_ROUTE_PREFIXES)]
+    entries.sort(key=lambda entry: entry["ts"])
+    return entries
+
+
+class ReplayUser():
+    def __init__(self):
+        self.user_name = f"replay_{uuid.uuid4().hex[:15]}"
+        self.headers = {}
+        self.product_ids = []
+
+    def registration(self)->dict:
+        return {"first_name":"replay", "last_name":"user", "user_name":self.user_name, "email":"replay@test.com", "password":USER_PASSWORD}
+
+    def authenticate(self, response:httpx.Response):
+        if "token" in response.cookies:
+            self.headers = {"Cookie": f"token={response.cookies['token']}"}
+
+
+class Replayer():
+    def __init__(self, client:httpx.AsyncClient, component_ids:list[str], currency_codes:list[str]):
+        self.client = client
+        self.component_ids = component_ids
+        self.currency_codes = currency_codes
+        self.users = {}
+
+    async def setup_user(self, anonymized_id:str)->ReplayUser:
+        user = ReplayUser()
+        response = await self.client.post("/register", json=user.registration())
+        response.raise_for_status()
+        user.authenticate(response)
+        product_response = await self.client.post("/products", headers=user.headers, json=self.product())
+        if product_response.status_code == 201:
+            user.product_ids.append(product_response.json()["id"])
+        self.users[anonymized_id] = user
+        return user
+
+    def product(self)->dict:
+        return {"name":"replay product", "description":"product created by access log replay", "componentIds":random.sample(self.component_ids, 2)}
+
+    def build_request(self, entry:dict, user:Optional[ReplayUser])->Optional[tuple]:
+        method, route = entry["method"], entry["route"]
+        headers = user.headers if user else {}
+        product_id = user.product_ids[-1] if user and user.product_ids else "unknown-product"
+        favorite = {"id":random.choice(self.component_ids), "itemType":"component"}
+        favorites = [{"id":component_id, "itemType":"component"} for component_id in random.sample(self.component_ids, 2)]
+        requests = {
+            ("POST", "/login"): {"json":{"user_name":user.user_name if user else "unknown", "password":USER_PASSWORD}},
+            ("POST", "/register"): {"json":ReplayUser().registration()},
+            ("GET", "/users"): {},
+            ("PATCH", "/users"): {"json":{**(user or ReplayUser()).registration(), "last_name":"replayed"}},
+            ("PATCH", "/users/password"): {"json":{"password":USER_PASSWORD, "new_password":USER_PASSWORD}},
+            ("DELETE", "/users"): {"json":{"password":USER_PASSWORD}},
+            ("GET", "/products"): {},
+            ("POST", "/products"): {"json":self.product()},
+            ("POST", "/products/price-preview"): {"json":{"componentIds":random.sample(self.component_ids, 2)}},
+            ("GET", "/products/{product_id}"): {"path":f"/products/{product_id}"},
+            ("PATCH", "/products/{product_id}"): {"path":f"/products/{product_id}", "json":self.product()},
+            ("DELETE", "/products/{product_id}"): {"path":f"/products/{product_id}"},
+            ("GET", "/favorites"): {},
+            ("POST", "/favorites/items"): {"json":favorite},
+            ("DELETE", "/favorites/items"): {"json":favorite},
+            ("POST", "/favorites/items/bulk"): {"json":favorites},
+            ("DELETE", "/favorites/items/bulk"): {"json":favorites},
+            ("GET", "/components"): {},
+            ("GET", "/currencies"): {},
+            ("GET", "/currencies/{old_currency_code}/{new_currency_code}"): {"path":f"/currencies/EUR/{random.choice(self.currency_codes)}"},
+            ("GET", "/me"): {},
+        }
+        request = requests.get((method, route))
+        if request is None:
+            return None
+        request = dict(request)
+        path = request.pop("path", route)
+        return method, path, {"headers":headers, **request}
+
+    def after_response(self, entry:dict, user:Optional[ReplayUser], response:httpx.Response):
+        if user is None:
+            return
+        if entry["route"] == "/login":
+            user.authenticate(response)
+        elif entry["method"] == "POST" and entry["route"] == "/products" and response.status_code == 201:
+            user.product_ids.append(response.json()["id"])
+        elif entry["method"] == "DELETE" and entry["route"] == "/products/{product_id}" and response.status_code == 204 and user.product_ids:
+            user.product_ids.pop()
+
+    async def replay(self, entries:list[dict], speed:float)->dict:
+        results = {"latencies":{}, "lags":[], "errors":0, "statusMatches":0, "skipped":{}, "sent":0}
+        user_queues = {}
+        first_ts = entries[0]["ts"]
+        started = perf_counter()
+
+        async def send(entry:dict, user:Optional[ReplayUser]):
+            due = started + (entry["ts"] - first_ts) / speed
+            delay = due - perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            request = self.build_request(entry, user)
+            if request is None:
+                # Routes without a request builder, e.g. the never ending /currencies/stream, are counted per route.
+                skipped_route = f"{entry['method']} {entry['route']}"
+                results["skipped"][skipped_route] = results["skipped"].get(skipped_route, 0) + 1
+                return
+            method, path, kwargs = request
+            send_start = perf_counter()
+            results["lags"].append(max(send_start - due, 0.0))
+            try:
+                response = await self.client.request(method, path, **kwargs)
+                status_code = response.status_code
+                self.after_response(entry, user, response)
+            except httpx.HTTPError:
+                status_code = 0
+            results["latencies"].setdefault(f"{method} {entry['route']}", []).append(perf_counter() - send_start)
+            results["sent"] += 1
+            results["errors"] += status_code == 0 or status_code >= 500
+            results["statusMatches"] += status_code == entry["status"]
+
+        async def run_user_queue(user:ReplayUser, user_entries:list[dict]):
+            for entry in user_entries:
+                await send(entry, user)
+
+        for entry in entries:
+            if entry.get("user"):
+                user_queues.setdefault(entry["user"], []).append(entry)
+        tasks = [asyncio.create_task(run_user_queue(self.users[user_id], user_entries)) for user_id, user_entries in user_queues.items()]
+        tasks += [asyncio.create_task(send(entry, None)) for entry in entries if not entry.get("user")]
+        await asyncio.gather(*tasks)
+        elapsed = perf_counter() - started
+
+        return {
+            "speed":speed,
+            "requests":results["sent"],
+            "skipped":sum(results["skipped"].values()),
+            "skippedRoutes":dict(sorted(results["skipped"].items())),
+            "elapsedSeconds":round(elapsed, 3),
+            "requestsPerSecond":round(results["sent"] / elapsed, 2),
+            "errorRate":round(results["errors"] / results["sent"], 4) if results["sent"] else 0.0,
+            "statusMatchRate":round(results["statusMatches"] / results["sent"], 4) if results["sent"] else 0.0,
+            "scheduleLag":benchmark_utils.latency_summary(results["lags"]),
+            "latency":benchmark_utils.latency_summary([latency for latencies in results["latencies"].values() for latency in latencies]),
+            "routes":{route: benchmark_utils.latency_summary(latencies) for route, latencies in sorted(results["latencies"].items())},
+        }
+
+
+async def replay_at_speed(base_url:str, entries:list[dict], speed:float, max_connections:int)->dict:
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        component_ids = [component["id"] for component in (await client.get("/components")).json()]
+        currency_codes = [currency["code"] for currency in (await client.get("/currencies")).json() if currency["code"] != "EUR"]
+        replayer = Replayer(client, component_ids, currency_codes)
+        for anonymized_id in {entry["user"] for entry in entries if entry.get("user")}:
+            await replayer.setup_user(anonymized_id)
+        return await replayer.replay(entries, speed)
+
+
+def is_sustainable(speed_result:dict, max_lag_ms:float, max_error_rate:float)->bool:
+    # The gateway keeps up when requests leave on schedule; a growing p99 lag means it fell behind.
+    return speed_result["scheduleLag"]["p99Ms"] <= max_lag_ms and speed_result["errorRate"] <= max_error_rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a captured gateway access log at multiples of its original speed.")
+    parser.add_argument("access_log", help="JSON lines written by the gateway with ACCESS_LOG_PATH set")
+    parser.add_argument("--speeds", default="1,2,10", help="comma separated speed factors")
+    parser.add_argument("--workers", type=int, default=1, help="gateway worker processes")
+    parser.add_argument("--stub-latency-ms", type=float, default=20.0)
+    parser.add_argument("--max-connections", type=int, default=500)
+    parser.add_argument("--max-lag-ms", type=float, default=50.0, help="p99 schedule lag still considered sustainable")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--output", help="result JSON path, defaults to benchmarks/results/access_log_replay_<time>.json")
+    args = parser.parse_args()
+
+    entries = load_access_log(args.access_log)
+    if not entries:
+        sys.exit("Access log contains no replayable requests.")
+    speed_results = []
+    for speed in [float(speed) for speed in args.speeds.split(",")]:
+        # Every speed gets fresh stubs and a fresh gateway so caches start equally cold.
+        stub_port = benchmark_utils.free_port()
+        gateway_port = benchmark_utils.free_port()
+        stubs = benchmark_utils.start_stubs(stub_port, {"STUB_LATENCY_MS":str(args.stub_latency_ms)})
+        try:
+            gateway = benchmark_utils.start_gateway(gateway_port, f"http://127.0.0.1:{stub_port}", workers=args.workers)
+            try:
+                speed_result = asyncio.run(replay_at_speed(f"http://127.0.0.1:{gateway_port}", entries, speed, args.max_connections))
+            finally:
+                benchmark_utils.stop_process(gateway)
+        finally:
+            benchmark_utils.stop_process(stubs)
+        speed_result["sustainable"] = is_sustainable(speed_result, args.max_lag_ms, args.max_error_rate)
+        speed_results.append(speed_result)
+        for skipped_route, count in speed_result["skippedRoutes"].items():
+            print(f"skipped {count} requests to {skipped_route}, the replay has no request for this route")
+        print(f"x{speed:<5g} {speed_result['requestsPerSecond']:>9.1f} req/s  p99={speed_result['latency']['p99Ms']:.1f}ms  p99 lag={speed_result['scheduleLag']['p99Ms']:.1f}ms  errors={speed_result['errorRate']:.2%}  {'sustainable' if speed_result['sustainable'] else 'NOT sustainable'}")
+
+    sustainable = [result for result in speed_results if result["sustainable"]]
+    results = {
+        "benchmark":"access_log_replay",
+        "revision":benchmark_utils.git_revision(),
+        "settings":vars(args),
+        "logRequests":len(entries),
+        "logUsers":len({entry["user"] for entry in entries if entry.get("user")}),
+        "maxSustainableRequestsPerSecondPerWorker":round(max(result["requestsPerSecond"] for result in sustainable) / args.workers, 2) if sustainable else None,
+        "speeds":speed_results,
+    }
+    print(f"Max sustainable load: {results['maxSustainableRequestsPerSecondPerWorker']} req/s per worker")
+    print(f"Results written to {benchmark_utils.write_results(results, args.output, 'access_log_replay')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT_DIR, "benchmarks", "results")
+UPSTREAM_URL_SETTINGS = ["IDENTITY_PROVIDER_URL", "PRODUCT_SERVICE_URL", "FAVORITES_SERVICE_URL", "COMPONENTS_SERVICE_URL", "CURRENCY_SERVICE_URL"]
+PERCENTILES = [50, 95, 99, 99.9]
+
+
+def percentile(sorted_values:list[float], percent:float)->float:
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(percent / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+def latency_summary(latencies:list[float])->dict:
+    sorted_latencies = sorted(latencies)
+    summary = {f"p{p:g}Ms".replace(".", "_"): round(percentile(sorted_latencies, p) * 1000, 3) for p in PERCENTILES}
+    summary["meanMs"] = round(sum(sorted_latencies) / len(sorted_latencies) * 1000, 3) if sorted_latencies else 0.0
+    summary["maxMs"] = round(sorted_latencies[-1] * 1000, 3) if sorted_latencies else 0.0
+    return summary
+
+
+def free_port()->int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port:int, timeout:float=15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.05)
+    raise RuntimeError(f"Nothing is listening on port {port} after {timeout}s")
+
+
+def start_process(args:list[str], port:int, env:Optional[dict]=None)->subprocess.Popen:
+    process = subprocess.Popen([sys.executable, *args], cwd=ROOT_DIR, env={**os.environ, **(env or {})})
+    try:
+        wait_for_port(port)
+    except RuntimeError:
+        process.kill()
+        raise
+    return process
+
+
+def start_stubs(port:int, stub_env:Optional[dict]=None)->subprocess.Popen:
+    return start_process(["-m", "upstream_stubs", "--port", str(port)], port, stub_env)
+
+
+def start_gateway(port:int, upstream_url:str, workers:int=1, gateway_env:Optional[dict]=None)->subprocess.Popen:
+    env = {setting: upstream_url for setting in UPSTREAM_URL_SETTINGS}
+    env.update(gateway_env or {})
+    args = ["-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    return start_process(args, port, env)
+
+
+def stop_process(process:subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def git_revision()->str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def write_results(results:dict, output_path:Optional[str], name:str)->str:
+    if output_path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output_path = os.path.join(RESULTS_DIR, f"{name}_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(output_path, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+    return output_path
+
+
+def load_results(path:str)->dict:
+    with open(path) as results_file:
+        return json.load(results_file)
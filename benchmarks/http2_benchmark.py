@@ -0,0 +1,204 @@
+import argparse
+import asyncio
+import sys
+import h11
+import h2.config
+import h2.connection
+import h2.events
+import h2.settings
+import httpx
+from benchmarks import benchmark_utils
+from benchmarks.route_benchmark import run_load
+from modules.upstream.upstream_transport import UpstreamTransport
+
+# Compares the upstream client's HTTP/1.1 connection pool with HTTP/2 multiplexing, e.g.:
+#   python -m benchmarks.http2_benchmark --concurrency 8,64,256 --latency-ms 20
+# uvicorn, and with it the upstream stubs, only speaks HTTP/1.1, so by default a minimal upstream process
+# is started that answers both HTTP/1.1 and HTTP/2 with prior knowledge (h2c). With --url an https
+# upstream is benchmarked instead and HTTP/2 is negotiated through ALPN.
+
+HTTP2_PREFACE = b"PRI * HTTP/2.0\r\n\r\nSM\r\n\r\n"
+
+
+class BenchmarkUpstream():
+    def __init__(self, latency:float, body_size:int, max_streams:int):
+        self.latency = latency
+        self.body = b"[" + b"0," * max(body_size // 2 - 1, 0) + b"0]"
+        self.max_streams = max_streams
+
+    async def serve(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter):
+        try:
+            data = await reader.read(65536)
+            if data and data.startswith(HTTP2_PREFACE[:len(data)]):
+                await self.serve_http2(reader, writer, data)
+            else:
+                await self.serve_http1(reader, writer, data)
+        except (ConnectionError, h11.ProtocolError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve_http1(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter, data:bytes):
+        connection = h11.Connection(h11.SERVER)
+        connection.receive_data(data)
+        while True:
+            event = connection.next_event()
+            if event is h11.NEED_DATA:
+                data = await reader.read(65536)
+                if not data:
+                    return
+                connection.receive_data(data)
+            elif isinstance(event, h11.EndOfMessage):
+                await asyncio.sleep(self.latency)
+                writer.write(connection.send(h11.Response(status_code=200, headers=[("content-type", "application/json"), ("content-length", str(len(self.body)))])))
+                writer.write(connection.send(h11.Data(data=self.body)))
+                writer.write(connection.send(h11.EndOfMessage()))
+                await writer.drain()
+                connection.start_next_cycle()
+            elif isinstance(event, h11.ConnectionClosed):
+                return
+
+    async def serve_http2(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter, data:bytes):
+        connection = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=False))
+        connection.initiate_connection()
+        connection.update_settings({h2.settings.SettingCodes.MAX_CONCURRENT_STREAMS: self.max_streams})
+        # Response bodies waiting for flow control window, by stream id.
+        pending_bodies = {}
+        responses = set()
+
+        def flush():
+            for stream_id, body in list(pending_bodies.items()):
+                size = min(len(body), connection.local_flow_control_window(stream_id), connection.max_outbound_frame_size)
+                if size > 0:
+                    connection.send_data(stream_id, body[:size], end_stream=size == len(body))
+                    body = body[size:]
+                if body:
+                    pending_bodies[stream_id] = body
+                else:
+                    del pending_bodies[stream_id]
+            writer.write(connection.data_to_send())
+
+        async def respond(stream_id:int):
+            await asyncio.sleep(self.latency)
+            connection.send_headers(stream_id, [(":status", "200"), ("content-type", "application/json"), ("content-length", str(len(self.body)))])
+            pending_bodies[stream_id] = self.body
+            flush()
+
+        while data:
+            for event in connection.receive_data(data):
+                if isinstance(event, h2.events.StreamEnded):
+                    response = asyncio.create_task(respond(event.stream_id))
+                    responses.add(response)
+                    response.add_done_callback(responses.discard)
+                elif isinstance(event, h2.events.StreamReset):
+                    pending_bodies.pop(event.stream_id, None)
+                elif isinstance(event, h2.events.ConnectionTerminated):
+                    data = b""
+            flush()
+            await writer.drain()
+            data = data and await reader.read(65536)
+        for response in responses:
+            response.cancel()
+
+
+class StreamLimitedClient():
+    # Caps the requests in flight like the upstream client does per host with HTTP/2 enabled.
+    def __init__(self, client:httpx.AsyncClient, max_streams:int):
+        self.client = client
+        self.semaphore = asyncio.Semaphore(max_streams)
+
+    async def request(self, method:str, url:str, **kwargs)->httpx.Response:
+        async with self.semaphore:
+            return await self.client.request(method, url, **kwargs)
+
+
+async def run_mode(url:str, http2:bool, concurrency_levels:list[int], duration:float, warmup:float, max_connections:int, max_streams:int)->list[dict]:
+    prior_knowledge = http2 and url.startswith("http://")
+    transport = UpstreamTransport(
+        http1=not prior_knowledge,
+        http2=http2,
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections))
+    mode_results = []
+    async with httpx.AsyncClient(transport=transport, timeout=30) as client:
+        load_client = StreamLimitedClient(client, max_streams) if http2 else client
+        for concurrency in concurrency_levels:
+            level_result = await run_load(load_client, lambda: ("GET", url, {}), concurrency, duration, warmup)
+            level_result["connections"] = len(transport.pool.connections)
+            level_result["httpVersions"] = sorted({connection.info().split(", ")[1] for connection in transport.pool.connections})
+            print(f"{'HTTP/2' if http2 else 'HTTP/1.1':>8} c={concurrency:<4} {level_result['requestsPerSecond']:>9.1f} req/s  p50={level_result['p50Ms']:.1f}ms  p99={level_result['p99Ms']:.1f}ms  connections={level_result['connections']}  errors={level_result['errorRate']:.2%}")
+            mode_results.append(level_result)
+    return mode_results
+
+
+async def serve_upstream(port:int, latency:float, body_size:int, max_streams:int):
+    upstream = BenchmarkUpstream(latency, body_size, max_streams)
+    server = await asyncio.start_server(upstream.serve, "127.0.0.1", port)
+    async with server:
+        await server.serve_forever()
+
+
+async def run_benchmark(url:str, args:argparse.Namespace, concurrency_levels:list[int])->dict:
+    return {
+        "http1": await run_mode(url, False, concurrency_levels, args.duration, args.warmup, args.max_connections, args.max_streams),
+        "http2": await run_mode(url, True, concurrency_levels, args.duration, args.warmup, args.max_connections, args.max_streams),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP/1.1 connection pool versus HTTP/2 multiplexing for upstream requests.")
+    parser.add_argument("--url", help="benchmark this upstream URL instead of a local one, HTTP/2 needs https with ALPN or an h2c server")
+    parser.add_argument("--concurrency", default="8,64,256", help="comma separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per protocol and concurrency level")
+    parser.add_argument("--warmup", type=float, default=1.0, help="unmeasured seconds before each measurement")
+    parser.add_argument("--max-connections", type=int, default=100, help="connection pool size, like UPSTREAM_MAX_CONNECTIONS")
+    parser.add_argument("--max-streams", type=int, default=100, help="streams in flight per host with HTTP/2, like UPSTREAM_HTTP2_MAX_STREAMS")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="response latency of the local upstream")
+    parser.add_argument("--body-size", type=int, default=2048, help="response body bytes of the local upstream")
+    parser.add_argument("--server-max-streams", type=int, default=128, help="SETTINGS_MAX_CONCURRENT_STREAMS of the local upstream")
+    parser.add_argument("--output", help="result JSON path, defaults to benchmarks/results/http2_benchmark_<time>.json")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="only run the local upstream on this port")
+    args = parser.parse_args()
+
+    if args.serve:
+        asyncio.run(serve_upstream(args.serve, args.latency_ms / 1000, args.body_size, args.server_max_streams))
+        return
+
+    concurrency_levels = sorted(int(level) for level in args.concurrency.split(","))
+    upstream_process = None
+    try:
+        url = args.url
+        if url is None:
+            # A separate process, so the upstream does not compete with the client for the event loop.
+            upstream_port = benchmark_utils.free_port()
+            upstream_process = benchmark_utils.start_process([
+                "-m", "benchmarks.http2_benchmark", "--serve", str(upstream_port),
+                "--latency-ms", str(args.latency_ms),
+                "--body-size", str(args.body_size),
+                "--server-max-streams", str(args.server_max_streams)], upstream_port)
+            url = f"http://127.0.0.1:{upstream_port}/components"
+        protocol_results = asyncio.run(run_benchmark(url, args, concurrency_levels))
+    finally:
+        if upstream_process is not None:
+            benchmark_utils.stop_process(upstream_process)
+    results = {
+        "benchmark":"http2",
+        "revision":benchmark_utils.git_revision(),
+        "settings":{
+            "url":args.url,
+            "concurrency":concurrency_levels,
+            "duration":args.duration,
+            "maxConnections":args.max_connections,
+            "maxStreams":args.max_streams,
+            "latencyMs":None if args.url else args.latency_ms,
+            "bodySize":None if args.url else args.body_size,
+            "serverMaxStreams":None if args.url else args.server_max_streams,
+        },
+        **protocol_results,
+    }
+    output_path = benchmark_utils.write_results(results, args.output, "http2_benchmark")
+    print(f"Results written to {output_path}")
+    sys.exit(1 if any(level["errorRate"] > 0 for mode in ("http1", "http2") for level in results[mode]) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import argparse
+import contextvars
+import json
+import os
+import statistics
+import sys
+import timeit
+from datetime import datetime, timedelta
+from typing import Callable
+from pydantic import parse_obj_as
+from benchmarks import benchmark_utils
+from models.component_model import Component
+from models.favorites_models import FavoritesModel
+from models.product_models import ProductResponseModel
+from models.user_models import UserOutModel
+from modules.case_converter import case_converter
+from modules.jwt.jwt_module import JwtEncoder
+from upstream_stubs.components_service_stub import generate_components
+import utils
+
+# Micro-benchmarks for the in-process work every gateway request does, e.g.:
+#   python -m benchmarks.micro_benchmark
+# Each run is appended to benchmarks/results/micro_benchmark_history.jsonl and compared with the previous one.
+
+HISTORY_PATH = os.path.join(benchmark_utils.RESULTS_DIR, "micro_benchmark_history.jsonl")
+
+USER_DATA = {"firstName":"test", "lastName":"test", "userName":"test_usr", "email":"test@test.com"}
+PRODUCT_DATA = {
+    "id":"29f6f518-53a8-11ed-a980-cd9f67f7363d",
+    "name":"test product",
+    "componentIds":["546c08d7-539d-11ed-a980-cd9f67f7363d","546c08da-539d-11ed-a980-cd9f67f7363d"],
+    "description":"test product for get method",
+    "price":638.9
+}
+FAVORITES_DATA = {
+    "ownerId":"test-user",
+    "componentIds":["546c08d7-539d-11ed-a980-cd9f67f7363d","546c08da-539d-11ed-a980-cd9f67f7363d"],
+    "productIds":["29f6f518-53a8-11ed-a980-cd9f67f7363d"]
+}
+
+
+def benchmark_cases()->dict[str, Callable[[], object]]:
+    service_jwt_encoder = JwtEncoder(secret="micro-benchmark-access-key", algorithm=utils.JWT_ALGORITHM)
+    service_token = service_jwt_encoder.generate_jwt({"exp":(datetime.now() + timedelta(minutes=10)).timestamp()})
+    auth_token = utils.jwt_encoder.generate_jwt({
+        "userId":"test-user",
+        "exp":(datetime.now() + timedelta(hours=1)).timestamp(),
+        "aud":utils.JWT_AUDIENCE,
+        "iss":utils.JWT_ISSUER,
+    })
+    user = UserOutModel.parse_obj(USER_DATA)
+    product = ProductResponseModel.parse_obj(PRODUCT_DATA)
+    favorites = FavoritesModel.parse_obj(FAVORITES_DATA)
+    cases = {
+        "jwt.generate_jwt": lambda: service_jwt_encoder.generate_jwt({"exp":(datetime.now() + timedelta(minutes=1)).timestamp()}),
+        "jwt.decode_jwt": lambda: service_jwt_encoder.decode_jwt(service_token),
+        # A fresh context per call, decode_auth_token otherwise returns the token decoded by the previous call.
+        "utils.decode_auth_token": lambda: contextvars.Context().run(utils.decode_auth_token, auth_token),
+        "utils.generate_microservice_access_token": lambda: utils.generate_microservice_access_token(service_jwt_encoder),
+        "case_converter.snake_to_camel_case": lambda: case_converter.snake_to_camel_case("product_group_ean_number"),
+        "UserOutModel.parse_obj": lambda: UserOutModel.parse_obj(USER_DATA),
+        "UserOutModel.dict": lambda: user.dict(by_alias=True),
+        "ProductResponseModel.parse_obj": lambda: ProductResponseModel.parse_obj(PRODUCT_DATA),
+        "ProductResponseModel.dict": lambda: product.dict(by_alias=True),
+        "FavoritesModel.parse_obj": lambda: FavoritesModel.parse_obj(FAVORITES_DATA),
+        "FavoritesModel.dict": lambda: favorites.dict(by_alias=True),
+    }
+    for count in (100, 1000, 10000):
+        components = generate_components(count)
+        cases[f"list[Component] validation x{count}"] = lambda components=components: parse_obj_as(list[Component], components)
+    return cases
+
+
+def measure(function:Callable[[], object], repeat:int, min_time:float)->dict:
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    number = max(int(number * min_time / 0.2), 1)
+    timings = [total / number for total in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "bestUs":round(min(timings) * 1e6, 3),
+        "medianUs":round(statistics.median(timings) * 1e6, 3),
+        "loops":number,
+    }
+
+
+def load_history()->list[dict]:
+    if not os.path.exists(HISTORY_PATH):
+        return []
+    with open(HISTORY_PATH) as history_file:
+        return [json.loads(line) for line in history_file if line.strip()]
+
+
+def append_history(run:dict):
+    os.makedirs(os.path.dirname(HISTORY_PATH), exist_ok=True)
+    with open(HISTORY_PATH, "a") as history_file:
+        history_file.write(json.dumps(run) + "\n")
+
+
+def compare(run:dict, baseline:dict, tolerance:float)->list[str]:
+    # Best-of-n timings are compared, they are far less noisy than means.
+    regressions = []
+    for name, result in run["cases"].items():
+        baseline_result = baseline["cases"].get(name)
+        if baseline_result and result["bestUs"] > baseline_result["bestUs"] * (1 + tolerance):
+            regressions.append(f"{name}: {baseline_result['bestUs']} -> {result['bestUs']} us per call")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the gateway's hot in-process code.")
+    parser.add_argument("--filter", default="", help="only run cases containing this text")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="approximate seconds per repetition")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown against the baseline run")
+    parser.add_argument("--baseline-revision", help="compare against the latest history entry of this git revision instead of the previous run")
+    parser.add_argument("--no-history", action="store_true", help="do not append this run to the history file")
+    args = parser.parse_args()
+
+    results = {}
+    for name, function in benchmark_cases().items():
+        if args.filter not in name:
+            continue
+        results[name] = measure(function, args.repeat, args.min_time)
+        print(f"{name:<45} {results[name]['bestUs']:>12.3f} us  (median {results[name]['medianUs']:.3f} us)")
+
+    run = {
+        "revision":benchmark_utils.git_revision(),
+        "createdAt":datetime.now().isoformat(),
+        "python":sys.version.split()[0],
+        "cases":results,
+    }
+    history = load_history()
+    if args.baseline_revision:
+        history = [entry for entry in history if entry["revision"] == args.baseline_revision]
+    regressions = compare(run, history[-1], args.tolerance) if history else []
+    if not args.no_history:
+        append_history(run)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
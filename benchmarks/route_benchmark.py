@@ -0,0 +1,202 @@
+import argparse
+import asyncio
+import sys
+import uuid
+from time import perf_counter
+from typing import Callable, Optional
+import httpx
+from benchmarks import benchmark_utils
+
+# Drives every gateway router against local upstream stubs at fixed concurrency levels, e.g.:
+#   python -m benchmarks.route_benchmark --concurrency 1,8,32 --duration 10 --stub-latency-ms 20
+# Compare against an earlier run with --baseline benchmarks/results/<file>.json.
+
+TEST_USER_CREDENTIALS = {"user_name":"test_usr", "password":"testtesttest4"}
+
+
+def register_request():
+    user_name = f"bench_{uuid.uuid4().hex[:16]}"
+    return "POST", "/register", {"json":{
+        "first_name":"bench",
+        "last_name":"user",
+        "user_name":user_name,
+        "email":"bench@test.com",
+        "password":"benchbench1"
+    }}
+
+
+ROUTE_REQUESTS: dict[str, Callable[[], tuple]] = {
+    "login": lambda: ("POST", "/login", {"json":TEST_USER_CREDENTIALS}),
+    "register": register_request,
+    "users": lambda: ("GET", "/users", {}),
+    "products": lambda: ("GET", "/products", {}),
+    "favorites": lambda: ("GET", "/favorites", {}),
+    "components": lambda: ("GET", "/components", {}),
+    "currencies": lambda: ("GET", "/currencies", {}),
+}
+
+# Served from the gateway's caches after the first request, so their throughput is bound by the
+# gateway's CPU and does not grow with concurrency like routes waiting on upstreams do.
+CACHED_ROUTES = {"users", "products", "favorites", "components", "currencies"}
+
+
+async def run_load(client:httpx.AsyncClient, make_request:Callable[[], tuple], concurrency:int, duration:float, warmup:float)->dict:
+    latencies = []
+    errors = 0
+    status_codes = {}
+    measure_from = perf_counter() + warmup
+    stop_at = measure_from + duration
+
+    async def worker():
+        nonlocal errors
+        while True:
+            method, path, kwargs = make_request()
+            start = perf_counter()
+            if start >= stop_at:
+                return
+            try:
+                response = await client.request(method, path, **kwargs)
+                status_code = response.status_code
+            except httpx.HTTPError:
+                status_code = 0
+            finished = perf_counter()
+            if start < measure_from:
+                continue
+            latencies.append(finished - start)
+            status_codes[status_code] = status_codes.get(status_code, 0) + 1
+            if status_code == 0 or status_code >= 500:
+                errors += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {
+        "concurrency":concurrency,
+        "requests":len(latencies),
+        "requestsPerSecond":round(len(latencies) / duration, 2),
+        "errorRate":round(errors / len(latencies), 4) if latencies else 0.0,
+        "statusCodes":{str(code): count for code, count in sorted(status_codes.items())},
+        **benchmark_utils.latency_summary(latencies),
+    }
+
+
+async def login(client:httpx.AsyncClient, attempts:int=40):
+    # Retried because injected faults may make the identity provider unavailable at first.
+    for _ in range(attempts - 1):
+        response = await client.post("/login", json=TEST_USER_CREDENTIALS)
+        if response.status_code == 200:
+            break
+        await asyncio.sleep(0.25)
+    else:
+        response = await client.post("/login", json=TEST_USER_CREDENTIALS)
+    response.raise_for_status()
+    client.cookies.set("token", response.cookies["token"])
+
+
+def concurrency_scaling(route_results:list[dict])->Optional[float]:
+    # Throughput gain from the lowest to the highest concurrency level. With upstream latency
+    # dominating, a non-blocking gateway scales almost linearly, a serialized event loop stays near 1.
+    if len(route_results) < 2 or route_results[0]["requestsPerSecond"] == 0:
+        return None
+    return round(route_results[-1]["requestsPerSecond"] / route_results[0]["requestsPerSecond"], 2)
+
+
+async def run_benchmark(base_url:str, routes:list[str], concurrency_levels:list[int], duration:float, warmup:float)->dict:
+    limits = httpx.Limits(max_connections=max(concurrency_levels), max_keepalive_connections=max(concurrency_levels))
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        await login(client)
+        results = {}
+        for route in routes:
+            route_results = []
+            for concurrency in concurrency_levels:
+                route_result = await run_load(client, ROUTE_REQUESTS[route], concurrency, duration, warmup)
+                print(f"{route:>11} c={concurrency:<4} {route_result['requestsPerSecond']:>9.1f} req/s  p50={route_result['p50Ms']:.1f}ms  p99={route_result['p99Ms']:.1f}ms  errors={route_result['errorRate']:.2%}")
+                route_results.append(route_result)
+            results[route] = {"levels":route_results, "concurrencyScaling":concurrency_scaling(route_results)}
+        return results
+
+
+def compare_with_baseline(results:dict, baseline:dict, tolerance:float)->list[str]:
+    regressions = []
+    for route, route_results in results["routes"].items():
+        baseline_levels = {level["concurrency"]: level for level in baseline.get("routes", {}).get(route, {}).get("levels", [])}
+        for level in route_results["levels"]:
+            baseline_level = baseline_levels.get(level["concurrency"])
+            if baseline_level is None:
+                continue
+            if level["requestsPerSecond"] < baseline_level["requestsPerSecond"] * (1 - tolerance):
+                regressions.append(f"{route} c={level['concurrency']}: throughput {baseline_level['requestsPerSecond']} -> {level['requestsPerSecond']} req/s")
+            if level["p99Ms"] > baseline_level["p99Ms"] * (1 + tolerance):
+                regressions.append(f"{route} c={level['concurrency']}: p99 {baseline_level['p99Ms']} -> {level['p99Ms']} ms")
+    return regressions
+
+
+def serialized_routes(results:dict, min_scaling:float)->list[str]:
+    return [
+        f"{route}: throughput only scales x{route_results['concurrencyScaling']} from lowest to highest concurrency"
+        for route, route_results in results["routes"].items()
+        if route not in CACHED_ROUTES and route_results["concurrencyScaling"] is not None and route_results["concurrencyScaling"] < min_scaling
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and latency benchmark for every gateway route.")
+    parser.add_argument("--routes", default=",".join(ROUTE_REQUESTS), help="comma separated subset of " + ", ".join(ROUTE_REQUESTS))
+    parser.add_argument("--concurrency", default="1,8,32", help="comma separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per route and concurrency level")
+    parser.add_argument("--warmup", type=float, default=1.0, help="unmeasured seconds before each measurement")
+    parser.add_argument("--workers", type=int, default=1, help="gateway worker processes")
+    parser.add_argument("--stub-latency-ms", type=float, default=20.0)
+    parser.add_argument("--stub-component-count", type=int, default=100)
+    parser.add_argument("--faults", help="fault rules for the stubs, JSON or a file such as benchmarks/fault_profiles/identity_503_bursts.json")
+    parser.add_argument("--gateway-url", help="benchmark an already running gateway instead of starting one with stubs")
+    parser.add_argument("--output", help="result JSON path, defaults to benchmarks/results/route_benchmark_<time>.json")
+    parser.add_argument("--baseline", help="earlier result JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative throughput drop or p99 increase")
+    parser.add_argument("--min-scaling", type=float, help="fail if routes not served from cache scale less than this across concurrency levels, e.g. 1.5")
+    args = parser.parse_args()
+
+    routes = args.routes.split(",")
+    concurrency_levels = sorted(int(level) for level in args.concurrency.split(","))
+    processes = []
+    try:
+        base_url = args.gateway_url
+        if base_url is None:
+            stub_port = benchmark_utils.free_port()
+            gateway_port = benchmark_utils.free_port()
+            processes.append(benchmark_utils.start_stubs(stub_port, {
+                "STUB_LATENCY_MS":str(args.stub_latency_ms),
+                "STUB_COMPONENT_COUNT":str(args.stub_component_count),
+                "STUB_FAULTS":args.faults or ""}))
+            processes.append(benchmark_utils.start_gateway(gateway_port, f"http://127.0.0.1:{stub_port}", workers=args.workers))
+            base_url = f"http://127.0.0.1:{gateway_port}"
+        route_results = asyncio.run(run_benchmark(base_url, routes, concurrency_levels, args.duration, args.warmup))
+    finally:
+        for process in reversed(processes):
+            benchmark_utils.stop_process(process)
+
+    results = {
+        "benchmark":"routes",
+        "revision":benchmark_utils.git_revision(),
+        "settings":{
+            "concurrency":concurrency_levels,
+            "duration":args.duration,
+            "workers":args.workers,
+            "stubLatencyMs":args.stub_latency_ms,
+            "stubComponentCount":args.stub_component_count,
+            "faults":args.faults,
+        },
+        "routes":route_results,
+    }
+    output_path = benchmark_utils.write_results(results, args.output, "route_benchmark")
+    print(f"Results written to {output_path}")
+
+    # Under injected faults throughput is expected to suffer, only a baseline run of the same profile is meaningful.
+    problems = serialized_routes(results, args.min_scaling) if args.min_scaling and not args.faults else []
+    if args.baseline:
+        problems += compare_with_baseline(results, benchmark_utils.load_results(args.baseline), args.tolerance)
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import argparse
+import asyncio
+import random
+import sys
+import uuid
+from time import perf_counter
+from typing import Optional
+import httpx
+from benchmarks import benchmark_utils
+
+# Replays user journeys against the gateway with open-loop (Poisson) session arrivals, e.g.:
+#   python -m benchmarks.scenario_load --session-rate 20 --duration 30 --think-time 0.5
+# A session logs in (or registers), loads the user, products and favorites pages,
+# adds and removes a favorite component and switches the display currency.
+
+USER_PASSWORD = "benchbench1"
+SUCCESS_STATUS_CODES = {200, 201, 204}
+
+
+class StepRecorder():
+    def __init__(self):
+        self.latencies = {}
+        self.failures = {}
+
+    def record(self, step:str, latency:float, ok:bool):
+        self.latencies.setdefault(step, []).append(latency)
+        if not ok:
+            self.failures[step] = self.failures.get(step, 0) + 1
+
+    def summary(self)->dict:
+        return {
+            step: {
+                "requests":len(latencies),
+                "failures":self.failures.get(step, 0),
+                **benchmark_utils.latency_summary(latencies),
+            }
+            for step, latencies in self.latencies.items()
+        }
+
+
+class Session():
+    def __init__(self, client:httpx.AsyncClient, recorder:StepRecorder, think_time:float):
+        self.client = client
+        self.recorder = recorder
+        self.think_time = think_time
+        self.headers = {}
+        self.ok = True
+
+    async def step(self, name:str, method:str, path:str, ok_status_codes=SUCCESS_STATUS_CODES, **kwargs)->Optional[httpx.Response]:
+        start = perf_counter()
+        try:
+            response = await self.client.request(method, path, headers=self.headers, **kwargs)
+        except httpx.HTTPError:
+            response = None
+        ok = response is not None and response.status_code in ok_status_codes
+        self.recorder.record(name, perf_counter() - start, ok)
+        self.ok = self.ok and ok
+        if self.think_time > 0:
+            await asyncio.sleep(random.expovariate(1 / self.think_time))
+        return response if ok else None
+
+    def authenticate(self, response:httpx.Response):
+        self.headers = {"Cookie": f"token={response.cookies['token']}"}
+
+
+def new_user()->dict:
+    return {
+        "first_name":"bench",
+        "last_name":"user",
+        "user_name":f"bench_{uuid.uuid4().hex[:16]}",
+        "email":"bench@test.com",
+        "password":USER_PASSWORD
+    }
+
+
+async def run_session(client:httpx.AsyncClient, recorder:StepRecorder, think_time:float, user_pool:list[dict], register_ratio:float, component_ids:list[str], currency_codes:list[str])->bool:
+    session = Session(client, recorder, think_time)
+    if not user_pool or random.random() < register_ratio:
+        response = await session.step("register", "POST", "/register", json=new_user())
+    else:
+        user = random.choice(user_pool)
+        response = await session.step("login", "POST", "/login", json={"user_name":user["user_name"], "password":USER_PASSWORD})
+    if response is None:
+        return False
+    session.authenticate(response)
+
+    await session.step("get user", "GET", "/users")
+    await session.step("list products", "GET", "/products")
+    await session.step("get favorites", "GET", "/favorites")
+    item = {"id":random.choice(component_ids), "itemType":"component"}
+    # 409 and 422 mean another session of the same user toggled the item concurrently.
+    await session.step("add favorite", "POST", "/favorites/items", ok_status_codes=SUCCESS_STATUS_CODES | {409}, json=item)
+    await session.step("remove favorite", "DELETE", "/favorites/items", ok_status_codes=SUCCESS_STATUS_CODES | {422}, json=item)
+    await session.step("list currencies", "GET", "/currencies")
+    await session.step("switch currency", "GET", f"/currencies/EUR/{random.choice(currency_codes)}")
+    return session.ok
+
+
+async def prepare(client:httpx.AsyncClient, user_pool_size:int)->tuple[list[dict], list[str], list[str]]:
+    user_pool = []
+    for _ in range(user_pool_size):
+        user = new_user()
+        response = await client.post("/register", json=user)
+        response.raise_for_status()
+        user_pool.append(user)
+    component_ids = [component["id"] for component in (await client.get("/components")).json()]
+    currency_codes = [currency["code"] for currency in (await client.get("/currencies")).json() if currency["code"] != "EUR"]
+    return user_pool, component_ids, currency_codes
+
+
+async def run_scenarios(base_url:str, session_rate:float, duration:float, think_time:float, user_pool_size:int, register_ratio:float, max_connections:int)->dict:
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        user_pool, component_ids, currency_codes = await prepare(client, user_pool_size)
+        recorder = StepRecorder()
+        sessions = []
+        session_durations = []
+
+        async def timed_session():
+            start = perf_counter()
+            ok = await run_session(client, recorder, think_time, user_pool, register_ratio, component_ids, currency_codes)
+            session_durations.append(perf_counter() - start)
+            return ok
+
+        started = perf_counter()
+        while perf_counter() - started < duration:
+            sessions.append(asyncio.create_task(timed_session()))
+            await asyncio.sleep(random.expovariate(session_rate))
+        outcomes = await asyncio.gather(*sessions)
+        elapsed = perf_counter() - started
+
+    return {
+        "sessions":len(outcomes),
+        "failedSessions":outcomes.count(False),
+        "sessionsPerSecond":round(len(outcomes) / elapsed, 2),
+        "sessionDuration":benchmark_utils.latency_summary(session_durations),
+        "steps":recorder.summary(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session-based load scenarios modelling real user journeys.")
+    parser.add_argument("--session-rate", type=float, default=10.0, help="mean new sessions per second (Poisson arrivals)")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds during which new sessions arrive")
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean seconds between steps of a session (exponential)")
+    parser.add_argument("--register-ratio", type=float, default=0.1, help="share of sessions that register instead of logging in")
+    parser.add_argument("--user-pool", type=int, default=50, help="users registered up front for login sessions")
+    parser.add_argument("--max-connections", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=1, help="gateway worker processes")
+    parser.add_argument("--stub-latency-ms", type=float, default=20.0)
+    parser.add_argument("--gateway-url", help="load an already running gateway instead of starting one with stubs")
+    parser.add_argument("--output", help="result JSON path, defaults to benchmarks/results/scenario_load_<time>.json")
+    args = parser.parse_args()
+
+    processes = []
+    try:
+        base_url = args.gateway_url
+        if base_url is None:
+            stub_port = benchmark_utils.free_port()
+            gateway_port = benchmark_utils.free_port()
+            processes.append(benchmark_utils.start_stubs(stub_port, {"STUB_LATENCY_MS":str(args.stub_latency_ms)}))
+            processes.append(benchmark_utils.start_gateway(gateway_port, f"http://127.0.0.1:{stub_port}", workers=args.workers))
+            base_url = f"http://127.0.0.1:{gateway_port}"
+        results = asyncio.run(run_scenarios(base_url, args.session_rate, args.duration, args.think_time, args.user_pool, args.register_ratio, args.max_connections))
+    finally:
+        for process in reversed(processes):
+            benchmark_utils.stop_process(process)
+
+    for step, step_results in results["steps"].items():
+        print(f"{step:>16} {step_results['requests']:>6} req  p50={step_results['p50Ms']:.1f}ms  p99={step_results['p99Ms']:.1f}ms  failures={step_results['failures']}")
+    print(f"{results['sessions']} sessions, {results['failedSessions']} failed, {results['sessionsPerSecond']} sessions/s")
+
+    results = {
+        "benchmark":"scenarios",
+        "revision":benchmark_utils.git_revision(),
+        "settings":vars(args),
+        **results,
+    }
+    print(f"Results written to {benchmark_utils.write_results(results, args.output, 'scenario_load')}")
+    sys.exit(1 if results["failedSessions"] else 0)
+
+
+if __name__ == "__main__":
+    main()
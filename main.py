@@ -1,8 +1,28 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from decouple import config
+from modules.server_timing.server_timing import ServerTimingMiddleware
+from modules.profiling.request_profiler import RequestProfilerMiddleware
+from modules.access_log.access_log import AccessLogMiddleware, create_access_logger
+from modules.upstream import upstream_client
+from modules.catalog_cache import catalog_cache
+from modules.catalog_cache.cache_snapshot import CacheSnapshotter
+from modules.lru_cache import lru_cache
 from routes.identity_provider import identity_provider_auth_routes, identity_provider_users_routes
-from routes import product_service_routes, currency_service_routes, components_service_routes, favorites_service_routes
+from routes import product_service_routes, currency_service_routes, components_service_routes, favorites_service_routes, me_routes, debug_routes
+from utils import is_valid_debug_access_key
 
+ACCESS_LOG_PATH = config("ACCESS_LOG_PATH", default="")
+ACCESS_LOG_USER_ID_SALT = config("ACCESS_LOG_USER_ID_SALT", default="")
+CACHE_SNAPSHOT_PATH = config("CACHE_SNAPSHOT_PATH", default="")
+CACHE_SNAPSHOT_INTERVAL = config("CACHE_SNAPSHOT_INTERVAL", default=60, cast=float)
+CACHE_SNAPSHOT_MAX_AGE = config("CACHE_SNAPSHOT_MAX_AGE", default=3600, cast=float)
+
+cache_snapshotter = CacheSnapshotter(
+    CACHE_SNAPSHOT_PATH,
+    catalog_cache.catalog_caches,
+    interval=CACHE_SNAPSHOT_INTERVAL,
+    max_age=CACHE_SNAPSHOT_MAX_AGE) if CACHE_SNAPSHOT_PATH else None
 
 app = FastAPI()
 
@@ -12,6 +32,32 @@ app.include_router(router=components_service_routes.router)
 app.include_router(router=product_service_routes.router)
 app.include_router(router=favorites_service_routes.router)
 app.include_router(router=currency_service_routes.router)
+app.include_router(router=me_routes.router)
+app.include_router(router=debug_routes.router)
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    if debug_routes.SAMPLING_PROFILER_ENABLED:
+        debug_routes.sampling_profiler.start()
+    if cache_snapshotter is not None:
+        cache_snapshotter.load()
+        cache_snapshotter.start()
+    upstream_client.start_background_tasks()
+    catalog_cache.start_prefetching()
+    lru_cache.start_reconciling()
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    debug_routes.sampling_profiler.stop()
+    await catalog_cache.stop_prefetching()
+    await lru_cache.stop_reconciling()
+    await currency_service_routes.exchange_rate_feed.stop()
+    await upstream_client.stop_background_tasks()
+    if cache_snapshotter is not None:
+        await cache_snapshotter.stop()
+    await upstream_client.close()
 
 origins = [
     "http://localhost",
@@ -28,10 +74,18 @@ app.add_middleware(
     allow_headers=["*"],
     expose_headers=["*"])
 
+app.add_middleware(
+    ServerTimingMiddleware,
+    is_authorized=is_valid_debug_access_key,
+    sample_rate=config("SERVER_TIMING_SAMPLE_RATE", default=0.0, cast=float))
 
+app.add_middleware(
+    RequestProfilerMiddleware,
+    profile_store=debug_routes.request_profile_store,
+    is_authorized=is_valid_debug_access_key)
 
-
-
-
-
-
+if ACCESS_LOG_PATH:
+    app.add_middleware(
+        AccessLogMiddleware,
+        logger=create_access_logger(ACCESS_LOG_PATH),
+        user_id_salt=ACCESS_LOG_USER_ID_SALT)
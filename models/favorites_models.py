@@ -1,3 +1,4 @@
+from typing import Any, Optional
 from models.custom_base_model import CustomBaseModel
 from pydantic import Field
 
@@ -13,5 +14,9 @@ class ToggleFavoriteModel(CustomBaseModel):
     id: str
     item_type :str
 
+class ToggleFavoriteResultModel(ToggleFavoriteModel):
+    status_code: int
+    detail: Optional[Any]
+
 class FavoritesRequestModel(CustomBaseModel):
     key: str = Field(alias="ownerId")
@@ -0,0 +1,13 @@
+from typing import Optional
+from models.custom_base_model import CustomBaseModel
+from models import user_models, product_models, favorites_models
+
+class SectionErrorModel(CustomBaseModel):
+    status_code: int
+    detail: str
+
+class MeResponseModel(CustomBaseModel):
+    user: Optional[user_models.UserOutModel]
+    products: Optional[list[product_models.ProductResponseModel]]
+    favorites: Optional[favorites_models.FavoritesModel]
+    errors: dict[str, SectionErrorModel]
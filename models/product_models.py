@@ -13,6 +13,13 @@ class ProductResponseModel(ProductModel):
     productId: str = Field(alias="id")
     price: float
 
+class PricePreviewRequestModel(CustomBaseModel):
+    component_ids: list[str]
+
+class PricePreviewResponseModel(CustomBaseModel):
+    price: float
+    currency: str
+
 class ProductRequestModel(ProductModel):
     key: str = Field(alias="productId")
    
@@ -0,0 +1,94 @@
+import hashlib
+import hmac
+import json
+import logging
+import logging.handlers
+import queue
+from http.cookies import SimpleCookie
+from time import perf_counter, time
+from typing import Optional
+import jwt
+from starlette.datastructures import Headers
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def anonymize_user_id(user_id:str, salt:str)->str:
+    return hmac.new(salt.encode(), user_id.encode(), hashlib.sha256).hexdigest()[:16]
+
+
+def user_id_from_cookie(cookie_header:Optional[str])->Optional[str]:
+    # Only used to group log lines per user, so the signature is not verified here.
+    # Works for request Cookie headers as well as the Set-Cookie header of /login and /register.
+    if not cookie_header:
+        return None
+    cookie = SimpleCookie()
+    try:
+        cookie.load(cookie_header)
+    except Exception:
+        return None
+    if "token" not in cookie:
+        return None
+    try:
+        return jwt.decode(cookie["token"].value, options={"verify_signature": False}).get("userId")
+    except jwt.PyJWTError:
+        return None
+
+
+def create_access_logger(log_path:str)->logging.Logger:
+    # Lines are handed to a background thread so file I/O never blocks the event loop.
+    log_queue = queue.SimpleQueue()
+    file_handler = logging.FileHandler(log_path)
+    file_handler.setFormatter(logging.Formatter("%(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, file_handler)
+    listener.start()
+    logger = logging.getLogger("cs_api_gateway.access_log")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    return logger
+
+
+class AccessLogMiddleware():
+    # Writes one JSON line per request with the route template instead of the concrete path,
+    # so logs contain no product ids and can be replayed with benchmarks/access_log_replay.py.
+    def __init__(self, app, logger:logging.Logger, user_id_salt:str):
+        self.app = app
+        self.logger = logger
+        self.user_id_salt = user_id_salt
+        self._route_paths = None
+
+    def _route_path(self, scope)->str:
+        if self._route_paths is None:
+            self._route_paths = {route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")}
+        return self._route_paths.get(scope.get("endpoint"), UNMATCHED_ROUTE)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter()
+        started_at = time()
+        status_code = 500
+        response_cookie = None
+
+        async def send_with_status(message):
+            nonlocal status_code, response_cookie
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                response_cookie = Headers(raw=message.get("headers", [])).get("set-cookie")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            user_id = user_id_from_cookie(Headers(scope=scope).get("cookie")) or user_id_from_cookie(response_cookie)
+            self.logger.info(json.dumps({
+                "ts":round(started_at, 6),
+                "method":scope["method"],
+                "route":self._route_path(scope),
+                "status":status_code,
+                "durationMs":round((perf_counter() - start) * 1000, 3),
+                "user":anonymize_user_id(user_id, self.user_id_salt) if user_id else None,
+            }))
@@ -0,0 +1,107 @@
+import asyncio
+import json
+import mmap
+import os
+import struct
+import zlib
+from time import time
+
+SNAPSHOT_MAGIC = b"CSGWSNAP"
+SNAPSHOT_VERSION = 1
+# magic, format version, created at (unix time), payload length, payload crc32
+SNAPSHOT_HEADER = struct.Struct("<8sHdQI")
+
+
+def encode_snapshot(caches:dict, created_at:float)->bytes:
+    entries = {}
+    for name, cache in caches.items():
+        snapshot = cache.snapshot()
+        if snapshot is not None:
+            value, age = snapshot
+            entries[name] = {"ageSeconds": age, "value": value}
+    payload = json.dumps(entries, separators=(",", ":")).encode()
+    return SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, created_at, len(payload), zlib.crc32(payload)) + payload
+
+
+def write_snapshot(path:str, caches:dict):
+    data = encode_snapshot(caches, time())
+    # Written next to the target and renamed over it, so readers never see a partial file.
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as snapshot_file:
+        snapshot_file.write(data)
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+    os.replace(temporary_path, path)
+
+
+def read_snapshot(path:str, max_age:float):
+    # Returns (entries, snapshot age in seconds), or None if the file is missing, damaged, of another version or too old.
+    try:
+        with open(path, "rb") as snapshot_file, mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ) as snapshot:
+            if len(snapshot) < SNAPSHOT_HEADER.size:
+                return None
+            magic, version, created_at, length, checksum = SNAPSHOT_HEADER.unpack_from(snapshot)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                return None
+            snapshot_age = max(0.0, time() - created_at)
+            if snapshot_age > max_age or len(snapshot) != SNAPSHOT_HEADER.size + length:
+                return None
+            payload = snapshot[SNAPSHOT_HEADER.size:]
+    except (OSError, ValueError):
+        return None
+    if zlib.crc32(payload) != checksum:
+        return None
+    return json.loads(payload), snapshot_age
+
+
+class CacheSnapshotter():
+    # Periodically writes the shared caches to one file and restores them on startup,
+    # so a restarted worker serves warm data before its first upstream call.
+    def __init__(self, path:str, caches:dict, interval:float=60, max_age:float=3600):
+        self.path = path
+        self.caches = caches
+        self.interval = interval
+        self.max_age = max_age
+        self._task = None
+
+    def load(self)->list:
+        snapshot = read_snapshot(self.path, self.max_age)
+        if snapshot is None:
+            return []
+        entries, snapshot_age = snapshot
+        restored = []
+        for name, entry in entries.items():
+            cache = self.caches.get(name)
+            age = entry["ageSeconds"] + snapshot_age
+            if cache is not None and age <= cache.stale_ttl:
+                cache.restore(entry["value"], age)
+                restored.append(name)
+        return restored
+
+    async def write(self):
+        await asyncio.to_thread(write_snapshot, self.path, self.caches)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.write()
+        except OSError:
+            pass
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.write()
+            except OSError:
+                pass
@@ -0,0 +1,154 @@
+import asyncio
+import random
+from time import monotonic
+from decouple import config
+
+CATALOG_CACHE_TTL = config("CATALOG_CACHE_TTL", default=300, cast=float)
+CATALOG_REFRESH_INTERVAL = config("CATALOG_REFRESH_INTERVAL", default=240, cast=float)
+CATALOG_REFRESH_JITTER = config("CATALOG_REFRESH_JITTER", default=0.1, cast=float)
+CATALOG_REFRESH_MAX_BACKOFF = config("CATALOG_REFRESH_MAX_BACKOFF", default=60, cast=float)
+CATALOG_STALE_TTL = config("CATALOG_STALE_TTL", default=3600, cast=float)
+CATALOG_PREFETCH_ENABLED = config("CATALOG_PREFETCH_ENABLED", default=True, cast=bool)
+
+
+class RefreshingCache():
+    # Holds one shared dataset, loaded on demand and, once started, refreshed in the background every
+    # refresh_interval seconds (+-jitter, so workers drift apart) before the ttl runs out. Failed refreshes
+    # are retried with jittered exponential backoff while the last value is served for up to stale_ttl.
+    def __init__(self, name:str, loader, ttl:float=300, refresh_interval:float=240, jitter:float=0.1,
+            retry_delay:float=1, max_backoff:float=60, stale_ttl:float=3600):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.jitter = jitter
+        self.retry_delay = retry_delay
+        self.max_backoff = max_backoff
+        self.stale_ttl = stale_ttl
+        self.hits = 0
+        self.misses = 0
+        self.refresh_failures = 0
+        self._value = None
+        self._loaded_at = None
+        self._loading = None
+        self._task = None
+        self._consecutive_failures = 0
+
+    def age(self):
+        return None if self._loaded_at is None else monotonic() - self._loaded_at
+
+    def is_fresh(self)->bool:
+        age = self.age()
+        return age is not None and age < self.ttl
+
+    async def get(self):
+        if self.is_fresh():
+            self.hits += 1
+            return self._value
+        self.misses += 1
+        try:
+            return await self.refresh()
+        except Exception:
+            age = self.age()
+            if age is not None and age < self.stale_ttl:
+                return self._value
+            raise
+
+    async def refresh(self):
+        # Concurrent callers share one load, which keeps running when the request that started it goes away.
+        loop = asyncio.get_running_loop()
+        if self._loading is None or self._loading.done() or self._loading.get_loop() is not loop:
+            self._loading = loop.create_task(self._load())
+        return await asyncio.shield(self._loading)
+
+    async def _load(self):
+        value = await self.loader()
+        self._value = value
+        self._loaded_at = monotonic()
+        return value
+
+    def snapshot(self):
+        # Returns (value, age in seconds) or None if nothing was loaded yet.
+        if self._loaded_at is None:
+            return None
+        return self._value, self.age()
+
+    def restore(self, value, age:float):
+        if self._loaded_at is None or age < self.age():
+            self._value = value
+            self._loaded_at = monotonic() - age
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def next_refresh_delay(self)->float:
+        if self._consecutive_failures:
+            return random.uniform(0, min(self.max_backoff, self.retry_delay * 2 ** self._consecutive_failures))
+        return self.refresh_interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    async def _run(self):
+        # A value restored from a snapshot or loaded by a request is only refreshed once it is due.
+        age = self.age()
+        delay = 0 if age is None else max(0, self.next_refresh_delay() - age)
+        while True:
+            loaded_at = self._loaded_at
+            await asyncio.sleep(delay)
+            if self._loaded_at != loaded_at:
+                # Loaded meanwhile by a request or another poller, so the next refresh is due later.
+                self._consecutive_failures = 0
+                delay = max(0, self.next_refresh_delay() - self.age())
+                continue
+            try:
+                await self.refresh()
+                self._consecutive_failures = 0
+            except Exception:
+                self._consecutive_failures += 1
+                self.refresh_failures += 1
+            delay = self.next_refresh_delay()
+
+    def stats(self)->dict:
+        age = self.age()
+        return {
+            "fresh": self.is_fresh(),
+            "ageSeconds": round(age, 3) if age is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshFailures": self.refresh_failures,
+            "prefetching": self._task is not None and not self._task.done(),
+        }
+
+
+catalog_caches = {}
+
+
+def create_catalog_cache(name:str, loader)->RefreshingCache:
+    catalog_caches[name] = RefreshingCache(
+        name,
+        loader,
+        ttl=CATALOG_CACHE_TTL,
+        refresh_interval=CATALOG_REFRESH_INTERVAL,
+        jitter=CATALOG_REFRESH_JITTER,
+        max_backoff=CATALOG_REFRESH_MAX_BACKOFF,
+        stale_ttl=CATALOG_STALE_TTL)
+    return catalog_caches[name]
+
+
+def start_prefetching():
+    if CATALOG_PREFETCH_ENABLED:
+        for catalog_cache in catalog_caches.values():
+            catalog_cache.start()
+
+
+async def stop_prefetching():
+    for catalog_cache in catalog_caches.values():
+        await catalog_cache.stop()
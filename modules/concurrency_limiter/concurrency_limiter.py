@@ -0,0 +1,109 @@
+import asyncio
+import heapq
+from itertools import count
+from time import monotonic
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+
+class RequestShedError(Exception):
+    pass
+
+
+class AdaptiveConcurrencyLimiter():
+    # AIMD on latency: the limit grows by about one per round trip while latencies stay within
+    # latency_tolerance times the best recent round trip, and is cut by backoff_ratio when they
+    # do not or the upstream fails. Requests over the limit wait in a short priority queue and
+    # are shed once it is full or they waited queue_timeout seconds.
+    def __init__(self, name:str, initial_limit:int=20, min_limit:int=2, max_limit:int=200,
+            max_queue:int=50, queue_timeout:float=1.0, latency_tolerance:float=2.0,
+            backoff_ratio:float=0.9, min_rtt_window:float=30.0):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        self.min_rtt_window = min_rtt_window
+        self.in_flight = 0
+        self.shed_count = 0
+        self._waiters = []
+        self._sequence = count()
+        self._min_rtt = None
+        self._min_rtt_reset_at = monotonic() + min_rtt_window
+        self._last_decrease = 0.0
+
+    async def acquire(self, priority:int=PRIORITY_NORMAL):
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        if len(self._waiters) >= self.max_queue:
+            lowest_priority_waiter = max(self._waiters, default=None)
+            if lowest_priority_waiter is None or lowest_priority_waiter[0] <= priority:
+                self._shed()
+            # A more important request takes the queue slot of the least important one that waits.
+            self._remove_waiter(lowest_priority_waiter)
+            if not lowest_priority_waiter[2].done():
+                lowest_priority_waiter[2].set_result(False)
+        entry = (priority, next(self._sequence), waiter)
+        heapq.heappush(self._waiters, entry)
+        try:
+            granted = await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            granted = False
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled() and waiter.result():
+                self.release(None)
+            else:
+                self._remove_waiter(entry)
+            raise
+        if not granted:
+            self._remove_waiter(entry)
+            self._shed()
+
+    def release(self, rtt, failed:bool=False):
+        self.in_flight -= 1
+        if rtt is not None or failed:
+            self._update_limit(rtt, failed)
+        while self._waiters and self.in_flight < int(self.limit):
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(True)
+
+    def _update_limit(self, rtt, failed:bool):
+        now = monotonic()
+        if rtt is not None and not failed:
+            if self._min_rtt is None or rtt < self._min_rtt or now >= self._min_rtt_reset_at:
+                self._min_rtt = rtt
+                self._min_rtt_reset_at = now + self.min_rtt_window
+        if failed or rtt > self._min_rtt * self.latency_tolerance:
+            # Decrease at most once per round trip, the samples of one congested window all look alike.
+            if now - self._last_decrease >= (self._min_rtt or 0):
+                self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+                self._last_decrease = now
+        elif self.in_flight + 1 >= int(self.limit) / 2:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def _remove_waiter(self, entry):
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+
+    def _shed(self):
+        self.shed_count += 1
+        raise RequestShedError(self.name)
+
+    def stats(self)->dict:
+        return {
+            "limit": int(self.limit),
+            "inFlight": self.in_flight,
+            "queued": len(self._waiters),
+            "shed": self.shed_count,
+            "minRttMs": round(self._min_rtt * 1000, 3) if self._min_rtt is not None else None,
+        }
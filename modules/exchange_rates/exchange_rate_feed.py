@@ -0,0 +1,80 @@
+import asyncio
+import json
+from time import time
+
+
+class ExchangeRateFeed():
+    # One polling loop per worker shared by all subscribers. It runs while anybody is subscribed and
+    # pushes the rates from base_currency to every currency whenever they change. Subscribers get a
+    # queue holding only the latest update, so slow clients skip intermediate ones instead of piling up.
+    def __init__(self, fetch_rates, interval:float=10, base_currency:str="EUR"):
+        self.fetch_rates = fetch_rates
+        self.interval = interval
+        self.base_currency = base_currency
+        self.rates = {}
+        self.updated_at = None
+        self._subscribers = set()
+        self._task = None
+
+    def subscribe(self)->asyncio.Queue:
+        queue = asyncio.Queue(maxsize=1)
+        if self.rates:
+            queue.put_nowait(self._update())
+        self._subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue:asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def subscriber_count(self)->int:
+        return len(self._subscribers)
+
+    async def stop(self):
+        self._subscribers.clear()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def poll(self):
+        rates = await self.fetch_rates(self.base_currency)
+        if rates != self.rates:
+            self.rates = rates
+            self.updated_at = time()
+            self._publish(self._update())
+
+    def _update(self)->dict:
+        return {"rates": self.rates, "updatedAt": self.updated_at}
+
+    def _publish(self, update:dict):
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(update)
+
+    async def _run(self):
+        while self._subscribers:
+            try:
+                await self.poll()
+            except Exception:
+                # Subscribers keep the last rates, the next poll tries again.
+                pass
+            await asyncio.sleep(self.interval)
+
+
+def convert_rates(rates_from_base:dict, base_currency:str, currency_codes=None)->dict:
+    # Cross rates from one base: 1 base_currency = rates[code] code.
+    base_rate = rates_from_base.get(base_currency)
+    if not base_rate:
+        return {}
+    codes = rates_from_base if currency_codes is None else [code for code in currency_codes if code in rates_from_base]
+    return {code: rates_from_base[code] / base_rate for code in codes}
+
+
+def format_event(event:str, data:dict)->str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
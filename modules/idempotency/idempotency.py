@@ -0,0 +1,82 @@
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from time import monotonic
+from fastapi import HTTPException
+
+
+class IdempotencyKeyConflictError(Exception):
+    pass
+
+
+class _IdempotencyEntry():
+    __slots__ = ("fingerprint", "outcome", "expires_at")
+
+    def __init__(self, fingerprint:str, outcome:asyncio.Future, expires_at:float):
+        self.fingerprint = fingerprint
+        self.outcome = outcome
+        self.expires_at = expires_at
+
+
+class IdempotencyStore():
+    # Keeps the outcome of the first request per (user, key) for ttl seconds, bounded to max_entries
+    # by dropping the oldest keys. Requests with a key that is still in flight wait for
+    # the original instead of calling the microservice again. Failures of the microservice (5xx) are
+    # forgotten so the client can retry them.
+    def __init__(self, ttl:float=86400, max_entries:int=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    async def run(self, user_id:str, key:str, fingerprint:str, operation):
+        # Returns the result of operation() and whether it was replayed from an earlier request.
+        self._drop_expired()
+        store_key = (user_id, key)
+        entry = self._entries.get(store_key)
+        if entry is not None:
+            if entry.fingerprint != fingerprint:
+                raise IdempotencyKeyConflictError(key)
+            try:
+                return await asyncio.shield(entry.outcome), True
+            except asyncio.CancelledError:
+                if not entry.outcome.cancelled():
+                    raise
+                # The original request was cancelled and its entry forgotten, so this one runs the operation.
+                return await self.run(user_id, key, fingerprint, operation)
+
+        entry = _IdempotencyEntry(fingerprint, asyncio.get_running_loop().create_future(), monotonic() + self.ttl)
+        self._entries[store_key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        try:
+            result = await operation()
+        except BaseException as exception:
+            if not isinstance(exception, HTTPException) or exception.status_code >= 500:
+                self._forget(store_key, entry)
+            if isinstance(exception, Exception):
+                entry.outcome.set_exception(exception)
+                # Marks the exception as retrieved, nobody may be waiting for it.
+                entry.outcome.exception()
+            else:
+                entry.outcome.cancel()
+            raise
+        entry.outcome.set_result(result)
+        return result, False
+
+    def _forget(self, store_key:tuple, entry:_IdempotencyEntry):
+        if self._entries.get(store_key) is entry:
+            del self._entries[store_key]
+
+    def _drop_expired(self):
+        # Entries are kept in creation order with the same ttl, so the expired ones are always at the front.
+        now = monotonic()
+        while self._entries and next(iter(self._entries.values())).expires_at <= now:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def request_fingerprint(*parts)->str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
@@ -0,0 +1,184 @@
+import asyncio
+import json
+from collections import OrderedDict
+from time import monotonic
+
+
+def json_size(value)->int:
+    return len(json.dumps(value, separators=(",", ":"), default=str))
+
+
+class LruCache():
+    # Least recently used entries are evicted once there are more than max_entries or their
+    # sizes add up to more than max_bytes, and every entry expires ttl seconds after it was stored.
+    # Values are shared with the callers and must be replaced, not modified in place.
+    # Once started with a reconcile_loader, entries read since the last pass and last loaded more than
+    # reconcile_interval seconds ago are reloaded in the background, which corrects values that were only
+    # changed in place by update(). Reloads keep the expiry, so reconciled entries still expire after ttl.
+    def __init__(self, name:str, ttl:float=30, max_entries:int=10000, max_bytes:int=32 * 1024 * 1024, sizeof=json_size,
+            reconcile_loader=None, reconcile_interval:float=60, reconcile_concurrency:int=8):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.reconcile_loader = reconcile_loader
+        self.reconcile_interval = reconcile_interval
+        self.reconcile_concurrency = reconcile_concurrency
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.corrections = 0
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._read_keys = set()
+        self._task = None
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and entry[2] <= monotonic():
+            self._remove(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        if self.reconcile_loader is not None:
+            self._read_keys.add(key)
+        return entry[0]
+
+    def set(self, key, value):
+        self._loading.pop(key, None)
+        self._store(key, value, monotonic() + self.ttl)
+
+    def update(self, key, change):
+        # Write-through: replaces a cached value with change(value), keeping its expiry.
+        # Without a cached value only loads in flight are discarded, they may have read the old state.
+        self._loading.pop(key, None)
+        entry = self._entries.get(key)
+        if entry is None or entry[2] <= monotonic():
+            self._remove(key)
+            return
+        self._store(key, change(entry[0]), entry[2])
+
+    def _store(self, key, value, expires_at:float):
+        self._remove(key)
+        size = self.sizeof(value)
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        self._entries[key] = (value, size, expires_at)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def invalidate(self, key):
+        # Also keeps loads that started before the invalidation from storing what they read.
+        self._loading.pop(key, None)
+        self._remove(key)
+
+    async def get_or_load(self, key, loader):
+        value = self.get(key)
+        if value is None:
+            value = await self._load(key, loader)
+        return value
+
+    async def reload(self, key, loader):
+        # Replaces a cached entry with a fresh load, unless it is dropped or written meanwhile.
+        await self._load(key, loader, only_cached=True)
+
+    async def _load(self, key, loader, only_cached:bool=False):
+        token = object()
+        self._loading[key] = token
+        try:
+            value = await loader()
+        finally:
+            is_current_load = self._loading.get(key) is token
+            if is_current_load:
+                del self._loading[key]
+        if is_current_load and (key in self._entries or not only_cached):
+            previous = self._entries.get(key)
+            if previous is not None and previous[0] != value:
+                self.corrections += 1
+            expires_at = previous[2] if only_cached else monotonic() + self.ttl
+            if expires_at > monotonic():
+                self._store(key, value, expires_at)
+            else:
+                self._remove(key)
+        return value
+
+    def keys_loaded_before(self, loaded_before:float)->list:
+        # update() and reloads keep the expiry, so it tells when the value was last loaded on demand.
+        now = monotonic()
+        return [key for key, (_, _, expires_at) in self._entries.items() if now < expires_at and expires_at - self.ttl <= loaded_before]
+
+    async def _reconcile(self):
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            # Entries nobody read since the last pass are left to expire.
+            read_keys, self._read_keys = self._read_keys, set()
+            keys = [key for key in self.keys_loaded_before(monotonic() - self.reconcile_interval) if key in read_keys]
+            for batch_start in range(0, len(keys), self.reconcile_concurrency):
+                await asyncio.gather(
+                    *(self.reload(key, lambda key=key: self.reconcile_loader(key)) for key in keys[batch_start:batch_start + self.reconcile_concurrency]),
+                    return_exceptions=True)
+
+    def start(self):
+        if self.reconcile_loader is not None and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._reconcile())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def clear(self):
+        self._entries.clear()
+        self._loading.clear()
+        self._read_keys.clear()
+        self.bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self)->dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "corrections": self.corrections,
+            "reconciling": self._task is not None and not self._task.done(),
+        }
+
+
+user_caches = {}
+
+
+def create_user_cache(name:str, ttl:float, max_entries:int, max_bytes:int, reconcile_loader=None, reconcile_interval:float=60)->LruCache:
+    user_caches[name] = LruCache(name, ttl=ttl, max_entries=max_entries, max_bytes=max_bytes,
+        reconcile_loader=reconcile_loader, reconcile_interval=reconcile_interval)
+    return user_caches[name]
+
+
+def start_reconciling():
+    for user_cache in user_caches.values():
+        user_cache.start()
+
+
+async def stop_reconciling():
+    for user_cache in user_caches.values():
+        await user_cache.stop()
@@ -0,0 +1,30 @@
+from collections import OrderedDict
+
+
+def convert_prices(items:list, rate:float)->list:
+    # Upstreams send '' for unknown prices, the models read those as 0.
+    return [{**item, "price": round(float(item["price"] or 0) * rate, 2)} for item in items]
+
+
+def convert_price(item:dict, rate:float)->dict:
+    return convert_prices([item], rate)[0]
+
+
+class ConvertedPriceCache():
+    # Converted copies of shared lists by key, e.g. per currency or per user and currency. A copy is reused until
+    # the source list is replaced (the caches hand out the same list object until it changes) or the rate changes.
+    def __init__(self, max_entries:int=32):
+        self.max_entries = max_entries
+        self._converted = OrderedDict()
+
+    def get(self, key, items:list, rate:float)->list:
+        cached = self._converted.get(key)
+        if cached is not None and cached[0] is items and cached[1] == rate:
+            self._converted.move_to_end(key)
+            return cached[2]
+        converted = convert_prices(items, rate)
+        self._converted[key] = (items, rate, converted)
+        self._converted.move_to_end(key)
+        while len(self._converted) > self.max_entries:
+            self._converted.popitem(last=False)
+        return converted
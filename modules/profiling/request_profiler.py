@@ -0,0 +1,114 @@
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from time import perf_counter
+from typing import Callable, Optional
+from uuid import uuid4
+from starlette.datastructures import MutableHeaders
+
+PROFILE_REQUEST_HEADER = b"debugprofile"
+PROFILE_ID_RESPONSE_HEADER = "debugProfileId"
+
+
+class RequestProfile():
+    def __init__(self, profile_id:str, method:str, path:str, duration:float, stats:pstats.Stats):
+        self.profile_id = profile_id
+        self.method = method
+        self.path = path
+        self.duration = duration
+        self.created_at = datetime.now()
+        self.stats = stats
+
+    def summary(self)->dict:
+        return {
+            "id":self.profile_id,
+            "method":self.method,
+            "path":self.path,
+            "durationMs":round(self.duration * 1000, 3),
+            "createdAt":self.created_at.isoformat(),
+        }
+
+    def to_text(self, sort_by:str="cumulative", limit:int=60)->str:
+        buffer = io.StringIO()
+        self.stats.stream = buffer
+        self.stats.sort_stats(sort_by).print_stats(limit)
+        return buffer.getvalue()
+
+    def to_bytes(self)->bytes:
+        # Same format as pstats.Stats.dump_stats, loadable by snakeviz or pstats.
+        return marshal.dumps(self.stats.stats)
+
+
+class ProfileStore():
+    def __init__(self, max_profiles:int=20, output_dir:Optional[str]=None):
+        self._profiles = OrderedDict()
+        self._max_profiles = max_profiles
+        self._output_dir = output_dir
+        self._lock = threading.Lock()
+
+    def add(self, profile:RequestProfile):
+        with self._lock:
+            self._profiles[profile.profile_id] = profile
+            while len(self._profiles) > self._max_profiles:
+                self._profiles.popitem(last=False)
+        if self._output_dir:
+            os.makedirs(self._output_dir, exist_ok=True)
+            profile.stats.dump_stats(os.path.join(self._output_dir, f"{profile.profile_id}.prof"))
+
+    def get(self, profile_id:str)->Optional[RequestProfile]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self)->list[RequestProfile]:
+        with self._lock:
+            return list(reversed(self._profiles.values()))
+
+
+class RequestProfilerMiddleware():
+    # Runs a single request under cProfile when it carries a valid debugProfile header.
+    # The profiler traces the event loop thread, so coroutines of other requests that
+    # interleave with the profiled one show up in the profile as well.
+    def __init__(self, app, profile_store:ProfileStore, is_authorized:Callable[[str], bool]):
+        self.app = app
+        self.profile_store = profile_store
+        self.is_authorized = is_authorized
+        self._active = False
+
+    def _requested_key(self, scope)->Optional[str]:
+        for name, value in scope["headers"]:
+            if name == PROFILE_REQUEST_HEADER:
+                return value.decode("latin-1")
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        requested_key = self._requested_key(scope)
+        if requested_key is None or self._active or not self.is_authorized(requested_key):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid4().hex
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(PROFILE_ID_RESPONSE_HEADER, profile_id)
+            await send(message)
+
+        self._active = True
+        profiler = cProfile.Profile()
+        start = perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.disable()
+            self._active = False
+            duration = perf_counter() - start
+            self.profile_store.add(RequestProfile(profile_id, scope["method"], scope["path"], duration, pstats.Stats(profiler)))
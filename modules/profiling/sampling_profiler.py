@@ -0,0 +1,108 @@
+import os
+import sys
+import threading
+from collections import Counter
+from time import perf_counter, time
+from typing import Optional
+
+OVERFLOW_STACK = "[other stacks]"
+
+
+class SamplingProfiler():
+    # Statistical profiler that periodically snapshots the stacks of all other threads
+    # of this process and aggregates them as collapsed stacks (flamegraph.pl / speedscope format).
+    def __init__(self, interval:float=0.01, max_stacks:int=10000, max_depth:int=96):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+        self._stacks = Counter()
+        self._frame_labels = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._sample_count = 0
+        self._sampling_time = 0.0
+        self._started_at: Optional[float] = None
+
+    @property
+    def is_running(self)->bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self._stop_event.clear()
+        self._started_at = time()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self.is_running:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self._sample_count = 0
+            self._sampling_time = 0.0
+            self._started_at = time() if self.is_running else None
+
+    def _frame_label(self, frame)->str:
+        code = frame.f_code
+        label = self._frame_labels.get(code)
+        if label is None:
+            module = frame.f_globals.get("__name__", os.path.basename(code.co_filename))
+            label = f"{module}:{code.co_name}".replace(";", ":").replace(" ", "_")
+            self._frame_labels[code] = label
+        return label
+
+    def _collapse(self, thread_name:str, frame)->str:
+        labels = []
+        while frame is not None and len(labels) < self.max_depth:
+            labels.append(self._frame_label(frame))
+            frame = frame.f_back
+        labels.append(thread_name)
+        return ";".join(reversed(labels))
+
+    def sample(self):
+        start = perf_counter()
+        own_thread_id = threading.get_ident()
+        thread_names = {thread.ident: thread.name.replace(" ", "_") for thread in threading.enumerate()}
+        frames = sys._current_frames()
+        stacks = [
+            self._collapse(thread_names.get(thread_id, f"thread-{thread_id}"), frame)
+            for thread_id, frame in frames.items()
+            if thread_id != own_thread_id
+        ]
+        del frames
+        with self._lock:
+            for stack in stacks:
+                if stack not in self._stacks and len(self._stacks) >= self.max_stacks:
+                    stack = OVERFLOW_STACK
+                self._stacks[stack] += 1
+            self._sample_count += 1
+            self._sampling_time += perf_counter() - start
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    def collapsed_stacks(self)->str:
+        with self._lock:
+            return "\n".join(f"{stack} {count}" for stack, count in self._stacks.most_common())
+
+    def stats(self)->dict:
+        with self._lock:
+            elapsed = time() - self._started_at if self._started_at else 0.0
+            return {
+                "running":self.is_running,
+                "workerPid":os.getpid(),
+                "intervalMs":self.interval * 1000,
+                "samples":self._sample_count,
+                "distinctStacks":len(self._stacks),
+                "samplingTimeMs":round(self._sampling_time * 1000, 3),
+                "estimatedOverheadPercent":round(self._sampling_time / elapsed * 100, 3) if elapsed else 0.0,
+            }
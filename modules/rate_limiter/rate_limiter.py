@@ -0,0 +1,42 @@
+from collections import OrderedDict
+from time import monotonic
+
+
+class TokenBucketRateLimiter():
+    # One token bucket per key, refilled lazily on access so every check is O(1).
+    # The least recently used buckets are dropped beyond max_keys, which only ever refills them early.
+    def __init__(self, rate:float, burst:float, max_keys:int=100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    def acquire(self, key:str)->float:
+        # Returns 0 if a token was taken, otherwise the seconds until the next token is available.
+        now = monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = self.burst
+            if len(self._buckets) >= self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            self._buckets.move_to_end(key)
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now)
+            return 0.0
+        self._buckets[key] = (tokens, now)
+        return (1 - tokens) / self.rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+def parse_rate_limits(rate_limits:str)->dict[str, tuple[float, float]]:
+    # "products=10/30,auth=1/5" means 10 requests per second with bursts of 30 for products, 1/s with bursts of 5 for auth.
+    limits = {}
+    for rate_limit in filter(None, (part.strip() for part in rate_limits.split(","))):
+        route_group, limit = rate_limit.split("=")
+        rate, burst = limit.split("/")
+        limits[route_group.strip()] = (float(rate), float(burst))
+    return limits
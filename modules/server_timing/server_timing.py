@@ -0,0 +1,123 @@
+import asyncio
+import functools
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Callable, Optional
+from fastapi.routing import APIRoute
+from starlette.datastructures import Headers, MutableHeaders
+
+SERVER_TIMING_REQUEST_HEADER = "serverTiming"
+
+_current_timings: ContextVar[Optional["ServerTimings"]] = ContextVar("server_timings", default=None)
+
+
+class ServerTimings():
+    def __init__(self):
+        self._metrics = []
+        self.route_started = None
+        self.endpoint_started = None
+        self.endpoint_finished = None
+
+    def add(self, name:str, duration:float, description:Optional[str]=None):
+        self._metrics.append((name, duration, description))
+
+    def header_value(self)->str:
+        entries = []
+        for name, duration, description in self._metrics:
+            if description is None:
+                entries.append(f"{name};dur={duration * 1000:.2f}")
+            else:
+                entries.append(f'{name};desc="{description}";dur={duration * 1000:.2f}')
+        return ", ".join(entries)
+
+
+def current_timings()->Optional[ServerTimings]:
+    return _current_timings.get()
+
+
+@contextmanager
+def measure(name:str, description:Optional[str]=None):
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, perf_counter() - start, description)
+
+
+class ServerTimingMiddleware():
+    # Timings reveal the upstream calls behind a route, so clients only get them with a serverTiming header
+    # that is_authorized accepts. Sampled requests get them regardless, sampling is off unless configured.
+    def __init__(self, app, is_authorized:Callable[[str], bool], sample_rate:float=0.0):
+        self.app = app
+        self.is_authorized = is_authorized
+        self.sample_rate = sample_rate
+
+    def _is_enabled(self, scope)->bool:
+        requested_key = Headers(scope=scope).get(SERVER_TIMING_REQUEST_HEADER)
+        if requested_key is not None and self.is_authorized(requested_key):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._is_enabled(scope):
+            await self.app(scope, receive, send)
+            return
+
+        timings = ServerTimings()
+        context_token = _current_timings.set(timings)
+        start = perf_counter()
+
+        async def send_with_server_timing(message):
+            if message["type"] == "http.response.start":
+                timings.add("total", perf_counter() - start)
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", timings.header_value())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_server_timing)
+        finally:
+            _current_timings.reset(context_token)
+
+
+class TimedRoute(APIRoute):
+    # Splits the time FastAPI spends around the endpoint into request validation
+    # (before the endpoint runs) and response serialization (after it returns).
+    def get_route_handler(self):
+        endpoint = self.dependant.call
+        if asyncio.iscoroutinefunction(endpoint):
+            @functools.wraps(endpoint)
+            async def timed_endpoint(**kwargs):
+                timings = _current_timings.get()
+                if timings is None:
+                    return await endpoint(**kwargs)
+                timings.endpoint_started = perf_counter()
+                try:
+                    return await endpoint(**kwargs)
+                finally:
+                    timings.endpoint_finished = perf_counter()
+            self.dependant.call = timed_endpoint
+
+        route_handler = super().get_route_handler()
+
+        async def timed_route_handler(request):
+            timings = _current_timings.get()
+            if timings is None:
+                return await route_handler(request)
+            timings.route_started = perf_counter()
+            try:
+                response = await route_handler(request)
+            finally:
+                validation_finished = timings.endpoint_started or perf_counter()
+                timings.add("validate", validation_finished - timings.route_started)
+            if timings.endpoint_finished is not None:
+                timings.add("serialize", perf_counter() - timings.endpoint_finished)
+            return response
+
+        return timed_route_handler
@@ -0,0 +1,131 @@
+import asyncio
+import ipaddress
+import socket
+from itertools import zip_longest
+from time import monotonic
+import dns.asyncresolver
+import dns.exception
+import httpcore
+from httpcore.backends.auto import AutoBackend
+from httpcore.backends.base import AsyncNetworkBackend
+
+
+class DnsCache():
+    # Caches A and AAAA records for their TTL (clamped to min_ttl..max_ttl). Entries past refresh_ratio of their
+    # TTL are re-resolved in the background while the cached addresses keep being used, and addresses
+    # are kept for up to stale_ttl when the resolver fails. Names the resolver cannot answer, like
+    # hosts file entries, fall back to the system resolver.
+    def __init__(self, min_ttl:float=5, max_ttl:float=300, refresh_ratio:float=0.8, stale_ttl:float=3600, timeout:float=2, resolver=None):
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.refresh_ratio = refresh_ratio
+        self.stale_ttl = stale_ttl
+        self.timeout = timeout
+        self.lookups = 0
+        self._entries = {}
+        self._resolving = {}
+        self._resolver = resolver
+
+    async def resolve(self, host:str)->list:
+        if _is_ip_address(host):
+            return [host]
+        now = monotonic()
+        entry = self._entries.get(host)
+        if entry is not None:
+            addresses, resolved_at, ttl = entry
+            age = now - resolved_at
+            if age < ttl:
+                if age >= ttl * self.refresh_ratio:
+                    self._start_lookup(host)
+                return addresses
+        try:
+            return await asyncio.shield(self._start_lookup(host))
+        except (OSError, dns.exception.DNSException):
+            if entry is not None and now - entry[1] < self.stale_ttl:
+                return entry[0]
+            raise
+
+    def _start_lookup(self, host:str)->asyncio.Task:
+        loop = asyncio.get_running_loop()
+        task = self._resolving.get(host)
+        if task is None or task.done() or task.get_loop() is not loop:
+            task = loop.create_task(self._lookup(host))
+            # Background refreshes may fail without anybody waiting for them.
+            task.add_done_callback(lambda finished_task: finished_task.cancelled() or finished_task.exception())
+            self._resolving[host] = task
+        return task
+
+    async def _lookup(self, host:str)->list:
+        self.lookups += 1
+        answers = [answer for answer in await asyncio.gather(self._query(host, "A"), self._query(host, "AAAA")) if answer is not None]
+        if answers:
+            addresses = _interleave([record.address for record in answer] for answer in answers)
+            ttl = min(self.max_ttl, max(self.min_ttl, min(answer.rrset.ttl for answer in answers)))
+        else:
+            address_infos = await asyncio.get_running_loop().getaddrinfo(host, None, family=socket.AF_UNSPEC, type=socket.SOCK_STREAM)
+            addresses = list(dict.fromkeys(address_info[4][0] for address_info in address_infos))
+            ttl = self.min_ttl
+        self._entries[host] = (addresses, monotonic(), ttl)
+        return addresses
+
+    async def _query(self, host:str, record_type:str):
+        # Hosts without records of one family answer NoAnswer, which is no failure as long as the other family resolves.
+        try:
+            return await self._get_resolver().resolve(host, record_type, lifetime=self.timeout)
+        except dns.exception.DNSException:
+            return None
+
+    def _get_resolver(self):
+        if self._resolver is None:
+            self._resolver = dns.asyncresolver.Resolver()
+        return self._resolver
+
+    def stats(self)->dict:
+        now = monotonic()
+        return {
+            host: {"addresses": addresses, "ttlSeconds": ttl, "ageSeconds": round(now - resolved_at, 3)}
+            for host, (addresses, resolved_at, ttl) in self._entries.items()
+        }
+
+
+def _interleave(address_lists)->list:
+    # Alternates between the families, so a family that cannot be reached only costs every other attempt.
+    return [address for addresses in zip_longest(*address_lists) for address in addresses if address is not None]
+
+
+def _is_ip_address(host:str)->bool:
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+class CachingDnsNetworkBackend(AsyncNetworkBackend):
+    # Resolves through the DnsCache and connects to the addresses in turn, each attempt getting an equal
+    # share of what is left of the connect timeout. TLS still uses the host name of the request for SNI
+    # and certificate checks.
+    def __init__(self, dns_cache:DnsCache, backend:AsyncNetworkBackend=None):
+        self.dns_cache = dns_cache
+        self._backend = backend or AutoBackend()
+
+    async def connect_tcp(self, host:str, port:int, timeout=None, local_address=None):
+        try:
+            addresses = await self.dns_cache.resolve(host)
+        except (OSError, dns.exception.DNSException) as error:
+            raise httpcore.ConnectError(f"Could not resolve {host}: {error}") from error
+        deadline = None if timeout is None else monotonic() + timeout
+        connect_error = httpcore.ConnectError(f"No addresses for {host}")
+        for index, address in enumerate(addresses):
+            address_timeout = None if deadline is None else max(deadline - monotonic(), 0) / (len(addresses) - index)
+            try:
+                return await self._backend.connect_tcp(address, port, timeout=address_timeout, local_address=local_address)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as error:
+                connect_error = error
+        raise connect_error
+
+    async def connect_unix_socket(self, path:str, timeout=None):
+        return await self._backend.connect_unix_socket(path, timeout=timeout)
+
+    async def sleep(self, seconds:float):
+        await self._backend.sleep(seconds)
@@ -0,0 +1,246 @@
+import asyncio
+from typing import Optional
+from time import perf_counter, monotonic
+import httpx
+from decouple import config
+from fastapi import HTTPException, status
+from modules.concurrency_limiter.concurrency_limiter import AdaptiveConcurrencyLimiter, RequestShedError, PRIORITY_HIGH, PRIORITY_NORMAL
+from modules.upstream.upstream_registry import UpstreamPool, BALANCING_EWMA
+from modules.upstream.dns_cache import DnsCache, CachingDnsNetworkBackend
+from modules.upstream.upstream_transport import UpstreamTransport
+from modules.server_timing import server_timing
+
+# Every setting may list several comma separated replicas of the service.
+UPSTREAM_BASE_URLS = {
+    "identity": config("IDENTITY_PROVIDER_URL", default="https://cs-identity-provider.deta.dev"),
+    "products": config("PRODUCT_SERVICE_URL", default="https://cs-product-service.deta.dev"),
+    "favorites": config("FAVORITES_SERVICE_URL", default="https://cs-favorites-service.deta.dev"),
+    "components": config("COMPONENTS_SERVICE_URL", default="https://cs-components-service.deta.dev"),
+    "currency": config("CURRENCY_SERVICE_URL", default="https://cs-currency-service.deta.dev"),
+}
+UPSTREAM_CONNECT_TIMEOUT = config("UPSTREAM_CONNECT_TIMEOUT", default=3.0, cast=float)
+UPSTREAM_READ_TIMEOUT = config("UPSTREAM_READ_TIMEOUT", default=10.0, cast=float)
+UPSTREAM_MAX_CONNECTIONS = config("UPSTREAM_MAX_CONNECTIONS", default=100, cast=int)
+UPSTREAM_CONCURRENCY_LIMITING_ENABLED = config("UPSTREAM_CONCURRENCY_LIMITING_ENABLED", default=True, cast=bool)
+UPSTREAM_CONCURRENCY_INITIAL_LIMIT = config("UPSTREAM_CONCURRENCY_INITIAL_LIMIT", default=20, cast=int)
+UPSTREAM_CONCURRENCY_MIN_LIMIT = config("UPSTREAM_CONCURRENCY_MIN_LIMIT", default=2, cast=int)
+UPSTREAM_CONCURRENCY_MAX_LIMIT = config("UPSTREAM_CONCURRENCY_MAX_LIMIT", default=200, cast=int)
+UPSTREAM_QUEUE_SIZE = config("UPSTREAM_QUEUE_SIZE", default=50, cast=int)
+UPSTREAM_QUEUE_TIMEOUT = config("UPSTREAM_QUEUE_TIMEOUT", default=1.0, cast=float)
+UPSTREAM_LATENCY_TOLERANCE = config("UPSTREAM_LATENCY_TOLERANCE", default=2.0, cast=float)
+UPSTREAM_BALANCING = config("UPSTREAM_BALANCING", default=BALANCING_EWMA)
+UPSTREAM_EJECTION_FAILURES = config("UPSTREAM_EJECTION_FAILURES", default=5, cast=int)
+UPSTREAM_EJECTION_TIME = config("UPSTREAM_EJECTION_TIME", default=30, cast=float)
+UPSTREAM_HEALTH_CHECK_PATH = config("UPSTREAM_HEALTH_CHECK_PATH", default="/docs")
+UPSTREAM_HEALTH_CHECK_INTERVAL = config("UPSTREAM_HEALTH_CHECK_INTERVAL", default=10, cast=float)
+UPSTREAM_HEALTH_CHECK_TIMEOUT = config("UPSTREAM_HEALTH_CHECK_TIMEOUT", default=2, cast=float)
+UPSTREAM_DNS_CACHE_ENABLED = config("UPSTREAM_DNS_CACHE_ENABLED", default=True, cast=bool)
+UPSTREAM_DNS_MIN_TTL = config("UPSTREAM_DNS_MIN_TTL", default=5, cast=float)
+UPSTREAM_DNS_MAX_TTL = config("UPSTREAM_DNS_MAX_TTL", default=300, cast=float)
+UPSTREAM_KEEPALIVE_EXPIRY = config("UPSTREAM_KEEPALIVE_EXPIRY", default=60, cast=float)
+UPSTREAM_WARM_CONNECTIONS = config("UPSTREAM_WARM_CONNECTIONS", default=2, cast=int)
+UPSTREAM_KEEPALIVE_PING_INTERVAL = config("UPSTREAM_KEEPALIVE_PING_INTERVAL", default=15, cast=float)
+UPSTREAM_HTTP2_ENABLED = config("UPSTREAM_HTTP2_ENABLED", default=False, cast=bool)
+# Plain http upstreams cannot negotiate HTTP/2, with prior knowledge they are spoken to in HTTP/2 (h2c) right away.
+UPSTREAM_HTTP2_PRIOR_KNOWLEDGE = config("UPSTREAM_HTTP2_PRIOR_KNOWLEDGE", default=False, cast=bool)
+UPSTREAM_HTTP2_MAX_STREAMS = config("UPSTREAM_HTTP2_MAX_STREAMS", default=100, cast=int)
+# Per host overrides, e.g. "cs-product-service.deta.dev=50,cs-favorites-service.deta.dev=200".
+UPSTREAM_HTTP2_HOST_MAX_STREAMS = config("UPSTREAM_HTTP2_HOST_MAX_STREAMS", default="")
+
+upstream_pools = {
+    service_name: UpstreamPool(
+        service_name,
+        [base_url for base_url in base_urls.split(",") if base_url.strip()],
+        balancing=UPSTREAM_BALANCING,
+        failure_threshold=UPSTREAM_EJECTION_FAILURES,
+        ejection_time=UPSTREAM_EJECTION_TIME)
+    for service_name, base_urls in UPSTREAM_BASE_URLS.items()
+}
+
+concurrency_limiters = {
+    service_name: AdaptiveConcurrencyLimiter(
+        service_name,
+        initial_limit=UPSTREAM_CONCURRENCY_INITIAL_LIMIT,
+        min_limit=UPSTREAM_CONCURRENCY_MIN_LIMIT,
+        max_limit=UPSTREAM_CONCURRENCY_MAX_LIMIT,
+        max_queue=UPSTREAM_QUEUE_SIZE,
+        queue_timeout=UPSTREAM_QUEUE_TIMEOUT,
+        latency_tolerance=UPSTREAM_LATENCY_TOLERANCE)
+    for service_name in UPSTREAM_BASE_URLS
+} if UPSTREAM_CONCURRENCY_LIMITING_ENABLED else {}
+
+dns_cache = DnsCache(min_ttl=UPSTREAM_DNS_MIN_TTL, max_ttl=UPSTREAM_DNS_MAX_TTL) if UPSTREAM_DNS_CACHE_ENABLED else None
+
+_client = None
+_client_loop = None
+_transport = None
+_stream_semaphores = {}
+# Requests holding a stream per host, counted here since semaphores do not expose it.
+_streams_in_flight = {}
+_background_tasks = []
+
+
+def parse_host_max_streams(value:str)->dict[str, int]:
+    host_max_streams = {}
+    for host_limit in value.split(","):
+        if not host_limit.strip():
+            continue
+        host, max_streams = host_limit.rsplit("=", 1)
+        host_max_streams[host.strip().lower()] = int(max_streams)
+    return host_max_streams
+
+http2_host_max_streams = parse_host_max_streams(UPSTREAM_HTTP2_HOST_MAX_STREAMS)
+
+
+def max_streams(host:str)->int:
+    return http2_host_max_streams.get(host.lower(), UPSTREAM_HTTP2_MAX_STREAMS)
+
+
+def stream_semaphore(base_url:str)->asyncio.Semaphore:
+    # Caps the requests in flight per host, which with HTTP/2 are streams multiplexed over its few connections.
+    host = httpx.URL(base_url).host
+    if host not in _stream_semaphores:
+        _stream_semaphores[host] = asyncio.Semaphore(max_streams(host))
+    return _stream_semaphores[host]
+
+
+def get_client()->httpx.AsyncClient:
+    # Connections belong to the event loop that opened them, so a new loop (test clients start one per request) gets a new client.
+    global _client, _client_loop, _transport, _stream_semaphores, _streams_in_flight
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _transport = UpstreamTransport(
+            http1=not (UPSTREAM_HTTP2_ENABLED and UPSTREAM_HTTP2_PRIOR_KNOWLEDGE),
+            http2=UPSTREAM_HTTP2_ENABLED,
+            limits=httpx.Limits(
+                max_connections=UPSTREAM_MAX_CONNECTIONS,
+                max_keepalive_connections=UPSTREAM_MAX_CONNECTIONS,
+                keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY),
+            network_backend=CachingDnsNetworkBackend(dns_cache) if dns_cache is not None else None)
+        _client = httpx.AsyncClient(
+            transport=_transport,
+            timeout=httpx.Timeout(UPSTREAM_READ_TIMEOUT, connect=UPSTREAM_CONNECT_TIMEOUT))
+        _client_loop = loop
+        _stream_semaphores = {}
+        _streams_in_flight = {}
+    return _client
+
+
+def connection_stats()->dict:
+    if _client is None:
+        return {"http2": UPSTREAM_HTTP2_ENABLED, "connections": [], "streams": {}}
+    return {
+        "http2": UPSTREAM_HTTP2_ENABLED,
+        # e.g. "'https://cs-product-service.deta.dev:443', HTTP/2, ACTIVE, Request Count: 42"
+        "connections": [connection.info() for connection in _transport.pool.connections],
+        "streams": {
+            host: {"inFlight": _streams_in_flight.get(host, 0), "maxStreams": max_streams(host)}
+            for host in _stream_semaphores
+        },
+    }
+
+
+async def close():
+    global _client, _client_loop, _transport
+    if _client is not None and _client_loop is asyncio.get_running_loop():
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+    _transport = None
+
+
+async def check_health():
+    while True:
+        await asyncio.gather(*(
+            upstream_pool.check_health(get_client(), UPSTREAM_HEALTH_CHECK_PATH, UPSTREAM_HEALTH_CHECK_TIMEOUT)
+            for upstream_pool in upstream_pools.values() if len(upstream_pool.replicas) > 1))
+        await asyncio.sleep(UPSTREAM_HEALTH_CHECK_INTERVAL)
+
+
+async def warm_up_connections(replicas:list):
+    # Concurrent requests to one replica each need their own connection, which then stays in the pool.
+    client = get_client()
+    await asyncio.gather(
+        *(client.head(base_url + UPSTREAM_HEALTH_CHECK_PATH, timeout=UPSTREAM_HEALTH_CHECK_TIMEOUT)
+            for base_url in {replica.base_url for replica in replicas}
+            for _ in range(UPSTREAM_WARM_CONNECTIONS)),
+        return_exceptions=True)
+
+
+async def keep_connections_warm():
+    # Resolves the upstream hosts and opens warm connections at startup, then pings replicas
+    # that got no traffic for a ping interval so their idle connections are not closed.
+    replicas = [replica for upstream_pool in upstream_pools.values() for replica in upstream_pool.replicas]
+    await warm_up_connections(replicas)
+    while True:
+        await asyncio.sleep(UPSTREAM_KEEPALIVE_PING_INTERVAL)
+        idle_since = monotonic() - UPSTREAM_KEEPALIVE_PING_INTERVAL
+        await warm_up_connections([replica for replica in replicas if replica.last_used_at <= idle_since])
+
+
+def start_background_tasks():
+    loop = asyncio.get_running_loop()
+    if any(len(upstream_pool.replicas) > 1 for upstream_pool in upstream_pools.values()):
+        _background_tasks.append(loop.create_task(check_health()))
+    if UPSTREAM_WARM_CONNECTIONS > 0:
+        _background_tasks.append(loop.create_task(keep_connections_warm()))
+
+
+async def stop_background_tasks():
+    while _background_tasks:
+        background_task = _background_tasks.pop()
+        background_task.cancel()
+        try:
+            await background_task
+        except asyncio.CancelledError:
+            pass
+
+
+async def request(service_name:str, method:str, path:str, priority:Optional[int]=None, **kwargs)->httpx.Response:
+    upstream_pool = upstream_pools[service_name]
+    if priority is None:
+        priority = PRIORITY_NORMAL if method == "GET" else PRIORITY_HIGH
+    concurrency_limiter = concurrency_limiters.get(service_name)
+    if concurrency_limiter is not None:
+        with server_timing.measure("queue", service_name):
+            try:
+                await concurrency_limiter.acquire(priority)
+            except RequestShedError:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Microservice overloaded",
+                    headers={"Retry-After": "1"})
+    replica = upstream_pool.select()
+    url = replica.base_url + path
+    upstream_pool.on_request_start(replica)
+    rtt = None
+    failed = False
+    try:
+        with server_timing.measure(service_name, f"{method} {path}"):
+            client = get_client()
+            try:
+                if UPSTREAM_HTTP2_ENABLED:
+                    # Time spent waiting for a free stream does not count towards the replica's latency.
+                    host = httpx.URL(replica.base_url).host
+                    streams_in_flight = _streams_in_flight
+                    async with stream_semaphore(replica.base_url):
+                        streams_in_flight[host] = streams_in_flight.get(host, 0) + 1
+                        try:
+                            start = perf_counter()
+                            response = await client.request(method, url, **kwargs)
+                        finally:
+                            streams_in_flight[host] -= 1
+                else:
+                    start = perf_counter()
+                    response = await client.request(method, url, **kwargs)
+            except httpx.HTTPError:
+                failed = True
+                # Timeouts, refused or reset connections and truncated bodies all surface like a 503 from the service.
+                raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
+            rtt = perf_counter() - start
+            failed = response.status_code >= 500
+            return response
+    finally:
+        upstream_pool.on_request_end(replica, rtt, failed)
+        if concurrency_limiter is not None:
+            concurrency_limiter.release(rtt, failed)
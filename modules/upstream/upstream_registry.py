@@ -0,0 +1,112 @@
+import asyncio
+import math
+import random
+from time import monotonic
+
+BALANCING_LEAST_OUTSTANDING = "least_outstanding"
+BALANCING_EWMA = "ewma"
+
+
+class Replica():
+    def __init__(self, base_url:str):
+        self.base_url = base_url.strip().rstrip("/")
+        self.outstanding = 0
+        self.ewma_rtt = None
+        self.ewma_updated_at = 0.0
+        self.last_used_at = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.healthy = True
+
+    def is_available(self, now:float)->bool:
+        return self.healthy and self.ejected_until <= now
+
+    def stats(self)->dict:
+        now = monotonic()
+        return {
+            "baseUrl": self.base_url,
+            "available": self.is_available(now),
+            "healthy": self.healthy,
+            "ejectedForSeconds": round(max(0.0, self.ejected_until - now), 3),
+            "outstanding": self.outstanding,
+            "ewmaRttMs": round(self.ewma_rtt * 1000, 3) if self.ewma_rtt is not None else None,
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+
+class UpstreamPool():
+    # Replicas of one microservice. Requests go to the available replica with the fewest outstanding
+    # requests, or with the lowest EWMA latency weighted by outstanding requests. Replicas failing
+    # failure_threshold times in a row are ejected for ejection_time seconds, doubling with every
+    # ejection, but never more than max_ejection_ratio of the pool. If nothing is available the
+    # whole pool is used rather than failing every request.
+    def __init__(self, service_name:str, base_urls:list, balancing:str=BALANCING_EWMA, ewma_alpha:float=0.3,
+            ewma_decay_time:float=10, failure_threshold:int=5, ejection_time:float=30, max_ejection_time:float=300,
+            max_ejection_ratio:float=0.5):
+        self.service_name = service_name
+        self.replicas = [Replica(base_url) for base_url in base_urls]
+        self.balancing = balancing
+        self.ewma_alpha = ewma_alpha
+        self.ewma_decay_time = ewma_decay_time
+        self.failure_threshold = failure_threshold
+        self.ejection_time = ejection_time
+        self.max_ejection_time = max_ejection_time
+        self.max_ejection_ratio = max_ejection_ratio
+
+    def select(self)->Replica:
+        if len(self.replicas) == 1:
+            return self.replicas[0]
+        now = monotonic()
+        candidates = [replica for replica in self.replicas if replica.is_available(now)] or list(self.replicas)
+        # Shuffled so ties do not always go to the first replica.
+        random.shuffle(candidates)
+        return min(candidates, key=self._load)
+
+    def _load(self, replica:Replica)->float:
+        if self.balancing == BALANCING_LEAST_OUTSTANDING or replica.ewma_rtt is None:
+            return replica.outstanding
+        # The latency of a replica that gets no traffic decays, so a slow one is retried eventually.
+        idle_time = monotonic() - replica.ewma_updated_at
+        return (replica.outstanding + 1) * replica.ewma_rtt * math.exp(-idle_time / self.ewma_decay_time)
+
+    def on_request_start(self, replica:Replica):
+        replica.outstanding += 1
+        replica.requests += 1
+        replica.last_used_at = monotonic()
+
+    def on_request_end(self, replica:Replica, rtt, failed:bool):
+        replica.outstanding -= 1
+        if rtt is not None:
+            replica.ewma_rtt = rtt if replica.ewma_rtt is None else self.ewma_alpha * rtt + (1 - self.ewma_alpha) * replica.ewma_rtt
+            replica.ewma_updated_at = monotonic()
+        if not failed:
+            replica.consecutive_failures = 0
+            return
+        replica.failures += 1
+        replica.consecutive_failures += 1
+        if replica.consecutive_failures >= self.failure_threshold:
+            self._eject(replica)
+
+    def _eject(self, replica:Replica):
+        now = monotonic()
+        ejected = sum(1 for other in self.replicas if other.ejected_until > now)
+        if replica.ejected_until > now or ejected + 1 > len(self.replicas) * self.max_ejection_ratio:
+            return
+        replica.ejected_until = now + min(self.max_ejection_time, self.ejection_time * 2 ** replica.ejections)
+        replica.ejections += 1
+        replica.consecutive_failures = 0
+
+    async def check_health(self, client, path:str, timeout:float):
+        results = await asyncio.gather(*(client.get(replica.base_url + path, timeout=timeout) for replica in self.replicas), return_exceptions=True)
+        for replica, result in zip(self.replicas, results):
+            healthy = not isinstance(result, Exception) and result.status_code < 500
+            if healthy and not replica.healthy:
+                replica.ejections = 0
+            replica.healthy = healthy
+
+    def stats(self)->list:
+        return [replica.stats() for replica in self.replicas]
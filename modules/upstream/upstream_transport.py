@@ -0,0 +1,80 @@
+from contextlib import contextmanager
+from typing import Optional
+import httpcore
+import httpx
+from httpcore.backends.base import AsyncNetworkBackend
+
+# Most specific first, like httpx maps them for its own transport.
+HTTPCORE_ERRORS = (
+    (httpcore.ConnectTimeout, httpx.ConnectTimeout),
+    (httpcore.ReadTimeout, httpx.ReadTimeout),
+    (httpcore.WriteTimeout, httpx.WriteTimeout),
+    (httpcore.PoolTimeout, httpx.PoolTimeout),
+    (httpcore.TimeoutException, httpx.TimeoutException),
+    (httpcore.ConnectError, httpx.ConnectError),
+    (httpcore.ReadError, httpx.ReadError),
+    (httpcore.WriteError, httpx.WriteError),
+    (httpcore.NetworkError, httpx.NetworkError),
+    (httpcore.ProxyError, httpx.ProxyError),
+    (httpcore.UnsupportedProtocol, httpx.UnsupportedProtocol),
+    (httpcore.LocalProtocolError, httpx.LocalProtocolError),
+    (httpcore.RemoteProtocolError, httpx.RemoteProtocolError),
+    (httpcore.ProtocolError, httpx.ProtocolError),
+)
+
+
+@contextmanager
+def map_httpcore_errors():
+    try:
+        yield
+    except Exception as error:
+        for httpcore_error, httpx_error in HTTPCORE_ERRORS:
+            if isinstance(error, httpcore_error):
+                raise httpx_error(str(error)) from error
+        raise
+
+
+class UpstreamResponseStream(httpx.AsyncByteStream):
+    def __init__(self, httpcore_stream):
+        self._httpcore_stream = httpcore_stream
+
+    async def __aiter__(self):
+        with map_httpcore_errors():
+            async for part in self._httpcore_stream:
+                yield part
+
+    async def aclose(self):
+        if hasattr(self._httpcore_stream, "aclose"):
+            await self._httpcore_stream.aclose()
+
+
+class UpstreamTransport(httpx.AsyncBaseTransport):
+    # httpx 0.23 has no option for the network backend of its transport's connection pool, so this
+    # transport builds the httpcore pool itself. The pool is public to read its connections.
+    def __init__(self, http1:bool=True, http2:bool=False, limits:httpx.Limits=httpx.Limits(), network_backend:Optional[AsyncNetworkBackend]=None):
+        self.pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            http1=http1,
+            http2=http2,
+            network_backend=network_backend)
+
+    async def handle_async_request(self, request:httpx.Request)->httpx.Response:
+        httpcore_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(scheme=request.url.raw_scheme, host=request.url.raw_host, port=request.url.port, target=request.url.raw_path),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions)
+        with map_httpcore_errors():
+            httpcore_response = await self.pool.handle_async_request(httpcore_request)
+        return httpx.Response(
+            status_code=httpcore_response.status,
+            headers=httpcore_response.headers,
+            stream=UpstreamResponseStream(httpcore_response.stream),
+            extensions=httpcore_response.extensions)
+
+    async def aclose(self):
+        await self.pool.aclose()
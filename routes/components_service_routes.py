@@ -1,20 +1,59 @@
-from fastapi import FastAPI, APIRouter
+from typing import Optional
+from fastapi import FastAPI, APIRouter, HTTPException, status, Depends
 from fastapi.middleware.cors import CORSMiddleware
-import requests
+from modules.upstream import upstream_client
+from modules.concurrency_limiter.concurrency_limiter import PRIORITY_LOW
+from modules.server_timing.server_timing import TimedRoute
+from modules.catalog_cache.catalog_cache import create_catalog_cache
+from modules.price_conversion.price_conversion import ConvertedPriceCache
 from models.component_model import Component
+from models import error_models
+from routes.currency_service_routes import price_conversion_rate
+from utils import rate_limit
+
+async def fetch_components():
+    headers = {'Content-Type': 'application/json'}
+    response = await upstream_client.request("components", "GET", "/components", priority=PRIORITY_LOW, headers=headers)
+    if response.status_code != status.HTTP_200_OK:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
+    return response.json()
+
+components_cache = create_catalog_cache("components", fetch_components)
+converted_components = ConvertedPriceCache()
+_component_prices = (None, {})
+
+async def get_component_prices()->dict:
+    # Price by component id, rebuilt only when the components cache hands out a new list.
+    global _component_prices
+    components = await components_cache.get()
+    if _component_prices[0] is not components:
+        _component_prices = (components, {component["id"]: float(component["price"] or 0) for component in components})
+    return _component_prices[1]
 
 router = APIRouter(
     prefix="/components",
-    tags=["components microservice"]
+    tags=["components microservice"],
+    dependencies=[Depends(rate_limit("components"))],
+    responses={429 :{
+            "model": error_models.HTTPErrorModel,
+            "description": "Error raised if the client exceeds its rate limit."
+        }},
+    route_class=TimedRoute
 )
 
 @router.get(
     "",
     response_model=list[Component],
     response_description="Returns list of components.",
-    description="Get all available components.", 
+    responses={422 :{
+            "model": error_models.HTTPErrorModel,
+            "description": "Error raised if the requested currency is not supported."
+        }},
+    description="Get all available components, with prices converted to the optional currency.", 
 )
-async def get_components():
-    headers = {'Content-Type': 'application/json'}
-    response = requests.get("https://cs-components-service.deta.dev/components", headers=headers)
-    return response.json()
+async def get_components(currency: Optional[str] = None):
+    components = await components_cache.get()
+    if currency is None:
+        return components
+    rate = await price_conversion_rate(currency)
+    return converted_components.get(currency.upper(), components, rate)
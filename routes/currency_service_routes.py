@@ -1,22 +1,83 @@
-from fastapi import FastAPI, APIRouter, HTTPException, status,Header
+import asyncio
+from typing import Optional
+from fastapi import FastAPI, APIRouter, HTTPException, status,Header, Depends
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime,timedelta
 from decouple import config
-import requests
+from modules.upstream import upstream_client
+from modules.concurrency_limiter.concurrency_limiter import PRIORITY_LOW
+from modules.server_timing.server_timing import TimedRoute
+from modules.catalog_cache.catalog_cache import create_catalog_cache
+from modules.exchange_rates.exchange_rate_feed import ExchangeRateFeed, convert_rates, format_event
 from models.component_model import Component
 from models import error_models, currency_models, auth_models, user_models, product_models, favorites_models
 from modules.jwt.jwt_module import JwtEncoder
-from utils import decode_auth_token
+from utils import decode_auth_token, rate_limit
 
 JWT_SECRET = config("JWT_SECRET")
 JWT_ALGORITHM="HS256"
 CURRENCY_SERVICE_ACCESS_KEY = config("CURRENCY_SERVICE_ACCESS_KEY")
+EXCHANGE_RATE_POLL_INTERVAL = config("EXCHANGE_RATE_POLL_INTERVAL", default=10, cast=float)
+EXCHANGE_RATE_STREAM_HEARTBEAT = config("EXCHANGE_RATE_STREAM_HEARTBEAT", default=15, cast=float)
+PRICE_CURRENCY = config("PRICE_CURRENCY", default="EUR")
 
 currency_service_jwt_encoder = JwtEncoder(secret=CURRENCY_SERVICE_ACCESS_KEY, algorithm=JWT_ALGORITHM)
 
+async def fetch_currencies():
+    headers = {'Content-Type': 'application/json'}
+    response = await upstream_client.request("currency", "GET", "/currencies", priority=PRIORITY_LOW, headers=headers)
+    if response.status_code != status.HTTP_200_OK:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    if response.json() == {}:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return response.json()
+
+currencies_cache = create_catalog_cache("currencies", fetch_currencies)
+
+async def fetch_price_exchange_rates():
+    headers = {'Content-Type': 'application/json'}
+    currency_codes = [currency["code"] for currency in await currencies_cache.get() if currency["code"] != PRICE_CURRENCY]
+    responses = await asyncio.gather(
+        *(upstream_client.request("currency", "GET", f"/currencies/{PRICE_CURRENCY}/{currency_code}", priority=PRIORITY_LOW, headers=headers)
+            for currency_code in currency_codes),
+        return_exceptions=True)
+    last_snapshot = price_exchange_rates_cache.snapshot()
+    last_rates = last_snapshot[0] if last_snapshot is not None else {}
+    rates = {PRICE_CURRENCY: 1.0}
+    for currency_code, response in zip(currency_codes, responses):
+        if isinstance(response, Exception) or response.status_code != status.HTTP_200_OK:
+            # Keep the last known rate instead of dropping the currency for one failed poll.
+            if currency_code in last_rates:
+                rates[currency_code] = last_rates[currency_code]
+            continue
+        rates[currency_code] = response.json()["exchangeRate"]
+    return rates
+
+price_exchange_rates_cache = create_catalog_cache("priceExchangeRates", fetch_price_exchange_rates)
+
+async def fetch_feed_exchange_rates(base_currency:str):
+    # The feed polls through the price rates cache, whose own refreshes are skipped while the feed keeps it fresh.
+    return await price_exchange_rates_cache.refresh()
+
+exchange_rate_feed = ExchangeRateFeed(fetch_feed_exchange_rates, interval=EXCHANGE_RATE_POLL_INTERVAL, base_currency=PRICE_CURRENCY)
+
+async def price_conversion_rate(currency_code:str)->float:
+    # Rate from the currency prices are stored in to currency_code, from the cached rates.
+    rate = (await price_exchange_rates_cache.get()).get(currency_code.upper())
+    if rate is None:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Unsupported currency")
+    return rate
+
 router = APIRouter(
     prefix="/currencies",
-    tags=["currency microservice"]
+    tags=["currency microservice"],
+    dependencies=[Depends(rate_limit("currencies"))],
+    responses={429 :{
+            "model": error_models.HTTPErrorModel,
+            "description": "Error raised if the client exceeds its rate limit."
+        }},
+    route_class=TimedRoute
 )
 
 @router.get(
@@ -31,13 +92,39 @@ router = APIRouter(
     tags=["currency microservice"] 
 )
 async def get_currencies():
-    headers = {'Content-Type': 'application/json'}
-    response = requests.get("https://cs-currency-service.deta.dev/currencies", headers=headers)
-    if response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
-        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
-    if response.json() == {}:
-        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
-    return response.json()
+    return await currencies_cache.get()
+
+
+@router.get(
+    "/stream",
+    response_class=StreamingResponse,
+    response_description="Returns a text/event-stream with a 'rates' event whenever the exchange rates change.",
+    description="Subscribe to exchange rates from the base currency, optionally limited to a comma separated list of currency codes. All subscribers share one upstream poll.",
+    tags=["currency microservice"] 
+)
+async def stream_exchange_rates(base: str = "EUR", symbols: Optional[str] = None):
+    base_currency = base.upper()
+    currency_codes = symbols.upper().split(",") if symbols else None
+
+    async def rate_events():
+        # Subscribed only once the response is streamed, so clients gone before the first chunk leave no subscription behind.
+        queue = exchange_rate_feed.subscribe()
+        last_rates = None
+        try:
+            while True:
+                try:
+                    update = await asyncio.wait_for(queue.get(), EXCHANGE_RATE_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                rates = convert_rates(update["rates"], base_currency, currency_codes)
+                if rates != last_rates:
+                    last_rates = rates
+                    yield format_event("rates", {"base": base_currency, "rates": rates, "updatedAt": update["updatedAt"]})
+        finally:
+            exchange_rate_feed.unsubscribe(queue)
+
+    return StreamingResponse(rate_events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 @router.get(
@@ -53,7 +140,7 @@ async def get_currencies():
 )
 async def get_currency_exchange_rate(old_currency_code, new_currency_code):
     headers = {'Content-Type': 'application/json'}
-    response = requests.get(f"https://cs-currency-service.deta.dev/currencies/{old_currency_code}/{new_currency_code}", headers=headers)
+    response = await upstream_client.request("currency", "GET", f"/currencies/{old_currency_code}/{new_currency_code}", priority=PRIORITY_LOW, headers=headers)
     if response.status_code != status.HTTP_200_OK:
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
     return response.json()
@@ -0,0 +1,163 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, status, Header, Depends
+from fastapi.responses import PlainTextResponse, Response
+from decouple import config
+from models import error_models
+from modules.profiling.request_profiler import ProfileStore
+from modules.profiling.sampling_profiler import SamplingProfiler
+from modules.upstream import upstream_client
+from modules.catalog_cache.catalog_cache import catalog_caches
+from modules.lru_cache.lru_cache import user_caches
+from utils import is_valid_debug_access_key
+
+REQUEST_PROFILE_LIMIT = config("REQUEST_PROFILE_LIMIT", default=20, cast=int)
+REQUEST_PROFILE_DIR = config("REQUEST_PROFILE_DIR", default="")
+SAMPLING_PROFILER_ENABLED = config("SAMPLING_PROFILER_ENABLED", default=False, cast=bool)
+SAMPLING_PROFILER_INTERVAL = config("SAMPLING_PROFILER_INTERVAL", default=0.01, cast=float)
+SAMPLING_PROFILER_MAX_STACKS = config("SAMPLING_PROFILER_MAX_STACKS", default=10000, cast=int)
+
+request_profile_store = ProfileStore(max_profiles=REQUEST_PROFILE_LIMIT, output_dir=REQUEST_PROFILE_DIR or None)
+sampling_profiler = SamplingProfiler(interval=SAMPLING_PROFILER_INTERVAL, max_stacks=SAMPLING_PROFILER_MAX_STACKS)
+
+
+async def verify_debug_access_key(debug_access_key: Optional[str] = Header(default=None, alias="debugAccessKey")):
+    if not is_valid_debug_access_key(debug_access_key):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid debug access key")
+
+
+router = APIRouter(
+    prefix="/debug",
+    tags=["debug"],
+    dependencies=[Depends(verify_debug_access_key)],
+    responses={403 :{
+            "model": error_models.HTTPErrorModel,
+            "description": "Error raised if the provided debug access key is invalid."
+        }},
+)
+
+@router.get(
+    "/profiles",
+    response_description="Returns summaries of the most recent request profiles.",
+    description="List stored request profiles, newest first.",
+)
+async def get_request_profiles():
+    return [profile.summary() for profile in request_profile_store.list()]
+
+
+@router.get(
+    "/profiles/{profile_id}",
+    response_class=PlainTextResponse,
+    response_description="Returns the profile as pstats text report or as raw .prof file.",
+    responses={404 :{
+            "model": error_models.HTTPErrorModel,
+            "description": "Error raised if the profile can not be found."
+        }},
+    description="Get a stored request profile. Use format=prof to download it for snakeviz or pstats.",
+)
+async def get_request_profile(profile_id, format: str = "text", sort_by: str = "cumulative", limit: int = 60):
+    profile = request_profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found.")
+    if format == "prof":
+        return Response(
+            content=profile.to_bytes(),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.prof"'})
+    return profile.to_text(sort_by=sort_by, limit=limit)
+
+
+@router.get(
+    "/profiler",
+    response_description="Returns state and overhead of the sampling profiler of this worker.",
+    description="Get sampling profiler statistics for the worker handling the request.",
+)
+async def get_sampling_profiler_stats():
+    return sampling_profiler.stats()
+
+
+@router.get(
+    "/profiler/collapsed",
+    response_class=PlainTextResponse,
+    response_description="Returns collapsed stacks, one 'frame;frame;frame count' line per stack.",
+    description="Get the aggregated stack samples of this worker for flamegraph.pl or speedscope.",
+)
+async def get_sampling_profiler_collapsed_stacks():
+    return sampling_profiler.collapsed_stacks()
+
+
+@router.post(
+    "/profiler/start",
+    status_code=status.HTTP_204_NO_CONTENT,
+    description="Start the sampling profiler of this worker.",
+)
+async def start_sampling_profiler():
+    sampling_profiler.start()
+
+
+@router.post(
+    "/profiler/stop",
+    status_code=status.HTTP_204_NO_CONTENT,
+    description="Stop the sampling profiler of this worker. Collected samples are kept.",
+)
+async def stop_sampling_profiler():
+    sampling_profiler.stop()
+
+
+@router.post(
+    "/profiler/reset",
+    status_code=status.HTTP_204_NO_CONTENT,
+    description="Discard the collected samples of this worker.",
+)
+async def reset_sampling_profiler():
+    sampling_profiler.reset()
+
+
+@router.get(
+    "/upstreams",
+    response_description="Returns concurrency limit state and replica load, latency and health per microservice.",
+    description="Get the upstream concurrency limiter and load balancing state of this worker.",
+)
+async def get_upstream_states():
+    return {
+        service_name: {
+            "concurrency": upstream_client.concurrency_limiters[service_name].stats() if service_name in upstream_client.concurrency_limiters else None,
+            "replicas": upstream_pool.stats(),
+        }
+        for service_name, upstream_pool in upstream_client.upstream_pools.items()
+    }
+
+
+@router.get(
+    "/connections",
+    response_description="Returns the pooled upstream connections with their HTTP version and the streams in flight per host.",
+    description="Get the upstream connection pool of this worker.",
+)
+async def get_upstream_connections():
+    return upstream_client.connection_stats()
+
+
+@router.get(
+    "/dns",
+    response_description="Returns cached addresses, ttl and age per upstream host.",
+    description="Get the upstream DNS cache of this worker.",
+)
+async def get_dns_cache():
+    return upstream_client.dns_cache.stats() if upstream_client.dns_cache is not None else {}
+
+
+@router.get(
+    "/caches",
+    response_description="Returns freshness, hit and miss counts and refresh failures per catalog cache.",
+    description="Get the catalog cache state of this worker.",
+)
+async def get_catalog_caches():
+    return {name: catalog_cache.stats() for name, catalog_cache in catalog_caches.items()}
+
+
+@router.get(
+    "/user-caches",
+    response_description="Returns entries, bytes, hit and miss counts and evictions per user cache.",
+    description="Get the per-user cache state of this worker.",
+)
+async def get_user_caches():
+    return {name: user_cache.stats() for name, user_cache in user_caches.items()}
@@ -1,24 +1,144 @@
-from fastapi import FastAPI, APIRouter, HTTPException, status, Cookie
+import asyncio
+from typing import Optional
+from fastapi import FastAPI, APIRouter, HTTPException, status, Cookie, Depends, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime,timedelta
 from decouple import config
-import requests
+from modules.upstream import upstream_client
+from modules.concurrency_limiter.concurrency_limiter import PRIORITY_LOW
+from modules.server_timing.server_timing import TimedRoute
 from models.component_model import Component
 from models import error_models, favorites_models
 from modules.jwt.jwt_module import JwtEncoder
-from utils import decode_auth_token
+from modules.idempotency.idempotency import request_fingerprint
+from modules.lru_cache.lru_cache import create_user_cache
+from utils import decode_auth_token, generate_microservice_access_token, rate_limit, run_idempotent
 
 JWT_SECRET = config("JWT_SECRET")
 JWT_ALGORITHM="HS256"
 FAVORITES_SERVICE_ACCESS_KEY = config("FAVORITES_SERVICE_ACCESS_KEY")
+FAVORITES_CACHE_TTL = config("FAVORITES_CACHE_TTL", default=300, cast=float)
+FAVORITES_CACHE_MAX_ENTRIES = config("FAVORITES_CACHE_MAX_ENTRIES", default=10000, cast=int)
+FAVORITES_CACHE_MAX_BYTES = config("FAVORITES_CACHE_MAX_BYTES", default=16 * 1024 * 1024, cast=int)
+FAVORITES_RECONCILE_INTERVAL = config("FAVORITES_RECONCILE_INTERVAL", default=60, cast=float)
+FAVORITES_BULK_MAX_ITEMS = config("FAVORITES_BULK_MAX_ITEMS", default=100, cast=int)
+FAVORITES_BULK_CONCURRENCY = config("FAVORITES_BULK_CONCURRENCY", default=4, cast=int)
+FAVORITE_ITEM_KEYS = {"component": "componentIds", "product": "productIds"}
 
 favorites_service_jwt_encoder = JwtEncoder(secret=FAVORITES_SERVICE_ACCESS_KEY, algorithm=JWT_ALGORITHM)
 
 router = APIRouter(
     prefix="/favorites",
-    tags=["favorites microservice"]
+    tags=["favorites microservice"],
+    dependencies=[Depends(rate_limit("favorites"))],
+    responses={429 :{
+            "model": error_models.HTTPErrorModel,
+            "description": "Error raised if the client exceeds its rate limit."
+        }},
+    route_class=TimedRoute
 )
 
+async def load_favorites(user_id:str, priority:Optional[int]=None):
+    favorites_service_access_token = generate_microservice_access_token(favorites_service_jwt_encoder)
+    
+    headers = {'Content-Type': 'application/json', 'userId':user_id, 'microserviceAccessToken':favorites_service_access_token}
+    get_favorites_response = await upstream_client.request("favorites", "GET", "/favorites", priority=priority, headers=headers)
+
+    if get_favorites_response.status_code != status.HTTP_200_OK:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
+    
+    return get_favorites_response.json()
+
+# Favorites by user id, kept up to date by the toggles going through this worker. Entries read since the last
+# pass are reloaded in the background every FAVORITES_RECONCILE_INTERVAL seconds to pick up changes made elsewhere.
+favorites_cache = create_user_cache(
+    "favorites",
+    ttl=FAVORITES_CACHE_TTL,
+    max_entries=FAVORITES_CACHE_MAX_ENTRIES,
+    max_bytes=FAVORITES_CACHE_MAX_BYTES,
+    reconcile_loader=lambda user_id: load_favorites(user_id, PRIORITY_LOW),
+    reconcile_interval=FAVORITES_RECONCILE_INTERVAL)
+
+
+async def fetch_favorites(user_id:str):
+    return await favorites_cache.get_or_load(user_id, lambda: load_favorites(user_id))
+
+
+def toggle_cached_favorite(user_id:str, item:favorites_models.ToggleFavoriteModel, add:bool):
+    item_key = FAVORITE_ITEM_KEYS.get(item.item_type)
+    if item_key is None:
+        favorites_cache.invalidate(user_id)
+        return
+
+    def toggle(favorites):
+        if add:
+            # Ids already present keep their place, like in the favorites service.
+            if item.id in favorites[item_key]:
+                return favorites
+            return {**favorites, item_key: [*favorites[item_key], item.id]}
+        return {**favorites, item_key: [item_id for item_id in favorites[item_key] if item_id != item.id]}
+
+    favorites_cache.update(user_id, toggle)
+
+
+def favorites_service_headers(user_id:str)->dict:
+    favorites_service_access_token = generate_microservice_access_token(favorites_service_jwt_encoder)
+    return {'Content-Type': 'application/json', 'userId':user_id, 'microserviceAccessToken':favorites_service_access_token}
+
+
+async def add_favorite_item(user_id:str, item_to_add:favorites_models.ToggleFavoriteModel, headers:dict):
+    post_favorite_response = await upstream_client.request("favorites", "POST", "/favorites/items", json=item_to_add.dict(), headers=headers)
+   
+    if post_favorite_response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
+   
+    if post_favorite_response.status_code == status.HTTP_409_CONFLICT:
+        # The item was added elsewhere, so the cached copy missed it.
+        toggle_cached_favorite(user_id, item_to_add, add=True)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Item is already in favorites list.")
+
+    if post_favorite_response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=post_favorite_response.json())
+
+    if post_favorite_response.status_code != status.HTTP_204_NO_CONTENT:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
+
+    toggle_cached_favorite(user_id, item_to_add, add=True)
+
+
+async def remove_favorite_item(user_id:str, item_to_remove:favorites_models.ToggleFavoriteModel, headers:dict):
+    delete_favorite_response = await upstream_client.request("favorites", "DELETE", "/favorites/items", json=item_to_remove.dict(), headers=headers)
+   
+    if delete_favorite_response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
+
+    if delete_favorite_response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=delete_favorite_response.json())
+
+    if delete_favorite_response.status_code != status.HTTP_204_NO_CONTENT:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
+
+    toggle_cached_favorite(user_id, item_to_remove, add=False)
+
+
+async def toggle_favorite_items(user_id:str, items:list[favorites_models.ToggleFavoriteModel], toggle_item)->list[dict]:
+    # The favorites service toggles one item per request, so the items run a few at a time.
+    if len(items) > FAVORITES_BULK_MAX_ITEMS:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"At most {FAVORITES_BULK_MAX_ITEMS} items per request")
+
+    semaphore = asyncio.Semaphore(FAVORITES_BULK_CONCURRENCY)
+
+    async def toggle(item:favorites_models.ToggleFavoriteModel)->dict:
+        async with semaphore:
+            try:
+                # Minted when the item starts, access tokens expire after a minute and queued items may wait longer.
+                await toggle_item(user_id, item, favorites_service_headers(user_id))
+            except HTTPException as exception:
+                return {**item.dict(), "status_code": exception.status_code, "detail": exception.detail}
+        return {**item.dict(), "status_code": status.HTTP_204_NO_CONTENT, "detail": None}
+
+    return await asyncio.gather(*(toggle(item) for item in items))
+
+
 @router.get(
     "",
     response_model=favorites_models.FavoritesModel,
@@ -37,16 +157,7 @@ async def get_favorites_for_user(token: str = Cookie()):
     if decoded_token is None:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token")
 
-    user_id = decoded_token["userId"]
-    favorites_service_access_token = favorites_service_jwt_encoder.generate_jwt({"exp":(datetime.now() + timedelta(minutes=1)).timestamp()})
-    
-    headers = {'Content-Type': 'application/json', 'userId':user_id, 'microserviceAccessToken':favorites_service_access_token}
-    get_favorites_response = requests.get("https://cs-favorites-service.deta.dev/favorites", headers=headers)
-
-    if get_favorites_response.status_code != status.HTTP_200_OK:
-        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
-    
-    return get_favorites_response.json()
+    return await fetch_favorites(decoded_token["userId"])
    
 
 
@@ -61,29 +172,28 @@ async def get_favorites_for_user(token: str = Cookie()):
             "model": error_models.HTTPErrorModel,
             "description": "Error raised if item is already in favorites list."
         },
+        422 :{
+            "model": error_models.HTTPErrorModel,
+            "description": "Error raised if the provided item to add or the idempotency key is not valid, or the key was used for a different request."
+        },
         503 :{
             "model": error_models.HTTPErrorModel,
             "description": "Error raised if microservice request fails."
         }},
-    description="Adds an item to the favorites list of the user.",
+    description="Adds an item to the favorites list of the user. Retries with the same Idempotency-Key header return the first response.",
 )
-async def adds_item_to_user_favorites_list(item_to_add:favorites_models.ToggleFavoriteModel, token: str = Cookie()):
+async def adds_item_to_user_favorites_list(item_to_add:favorites_models.ToggleFavoriteModel, response: Response, token: str = Cookie(), idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key")):
    
     decoded_token = decode_auth_token(token)
     if decoded_token is None:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token")
 
     user_id = decoded_token["userId"]
-    favorites_service_access_token = favorites_service_jwt_encoder.generate_jwt({"exp":(datetime.now() + timedelta(minutes=1)).timestamp()})
-    
-    headers = {'Content-Type': 'application/json', 'userId':user_id, 'microserviceAccessToken':favorites_service_access_token}
-    post_favorite_response = requests.post("https://cs-favorites-service.deta.dev/favorites/items", json=item_to_add.dict(), headers=headers)
-   
-    if post_favorite_response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
-        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
-   
-    if post_favorite_response.status_code == status.HTTP_409_CONFLICT:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Item is already in favorites list.")
+
+    async def add_favorite():
+        await add_favorite_item(user_id, item_to_add, favorites_service_headers(user_id))
+
+    await run_idempotent(idempotency_key, user_id, request_fingerprint("POST", "/favorites/items", item_to_add.dict()), add_favorite, response)
     # all checks passed:
     return
 
@@ -112,15 +222,50 @@ async def delete_item_from_favorites_for_user(item_to_remove:favorites_models.To
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token")
 
     user_id = decoded_token["userId"]
-    favorites_service_access_token = favorites_service_jwt_encoder.generate_jwt({"exp":(datetime.now() + timedelta(minutes=1)).timestamp()})
-    
-    headers = {'Content-Type': 'application/json', 'userId':user_id, 'microserviceAccessToken':favorites_service_access_token}
-    delete_favorite_response = requests.delete("https://cs-favorites-service.deta.dev/favorites/items", json=item_to_remove.dict(), headers=headers)
-   
-    if delete_favorite_response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
-        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
-
-    if delete_favorite_response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY:
-        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=delete_favorite_response.json())
+    await remove_favorite_item(user_id, item_to_remove, favorites_service_headers(user_id))
     # all checks passed:
-    return
\ No newline at end of file
+    return
+
+
+@router.post(
+    "/items/bulk",
+    response_model=list[favorites_models.ToggleFavoriteResultModel],
+    response_description="Returns the status code and error detail of every item, 204 for items that were added.",
+    responses={403 :{
+            "model": error_models.HTTPErrorModel,
+            "description": "Error raised if provided token is invalid."
+        },
+        422 :{
+            "model": error_models.HTTPErrorModel,
+            "description": "Error raised if the request has too many items."
+        }},
+    description="Adds several items to the favorites list of the user. Items that fail, e.g. with 409 if they are already in the list, do not stop the others.",
+)
+async def add_items_to_user_favorites_list(items_to_add:list[favorites_models.ToggleFavoriteModel], token: str = Cookie()):
+    decoded_token = decode_auth_token(token)
+    if decoded_token is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token")
+
+    return await toggle_favorite_items(decoded_token["userId"], items_to_add, add_favorite_item)
+
+
+@router.delete(
+    "/items/bulk",
+    response_model=list[favorites_models.ToggleFavoriteResultModel],
+    response_description="Returns the status code and error detail of every item, 204 for items that were removed.",
+    responses={403 :{
+            "model": error_models.HTTPErrorModel,
+            "description": "Error raised if provided token is invalid."
+        },
+        422 :{
+            "model": error_models.HTTPErrorModel,
+            "description": "Error raised if the request has too many items."
+        }},
+    description="Removes several items from the favorites list of the user. Items that fail, e.g. with 422 if they are not in the list, do not stop the others.",
+)
+async def delete_items_from_user_favorites_list(items_to_remove:list[favorites_models.ToggleFavoriteModel], token: str = Cookie()):
+    decoded_token = decode_auth_token(token)
+    if decoded_token is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token")
+
+    return await toggle_favorite_items(decoded_token["userId"], items_to_remove, remove_favorite_item)
@@ -1,12 +1,12 @@
-from fastapi import FastAPI, APIRouter, HTTPException, status, Response
+from fastapi import FastAPI, APIRouter, HTTPException, status, Response, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime,timedelta
 from decouple import config
-import requests
+from modules.upstream import upstream_client
+from modules.server_timing.server_timing import TimedRoute
 from models.component_model import Component
 from models import error_models, auth_models, user_models
 from modules.jwt.jwt_module import JwtEncoder
-from utils import decode_auth_token
+from utils import decode_auth_token, generate_microservice_access_token, rate_limit
 
 JWT_SECRET = config("JWT_SECRET")
 JWT_ALGORITHM="HS256"
@@ -17,9 +17,25 @@ identity_provider_jwt_encoder = JwtEncoder(secret=IDENTITY_PROVIDER_ACCESS_KEY,
 favorites_service_jwt_encoder = JwtEncoder(secret=FAVORITES_SERVICE_ACCESS_KEY, algorithm=JWT_ALGORITHM)
 
 router = APIRouter(
-    tags=["auth (identity provider)"]
+    tags=["auth (identity provider)"],
+    dependencies=[Depends(rate_limit("auth"))],
+    responses={429 :{
+            "model": error_models.HTTPErrorModel,
+            "description": "Error raised if the client exceeds its rate limit."
+        }},
+    route_class=TimedRoute
 )
 
+
+async def delete_identity_provider_user(user_id:str, password:str):
+    identity_provider_access_token = generate_microservice_access_token(identity_provider_jwt_encoder)
+    headers = {'Content-Type': 'application/json', 'userId':user_id, 'microserviceAccessToken':identity_provider_access_token}
+    try:
+        await upstream_client.request("identity", "DELETE", "/users", json={"password":password}, headers=headers)
+    except HTTPException:
+        pass
+
+
 @router.post(
     "/register",
     description="Register a new user.",
@@ -38,10 +54,10 @@ router = APIRouter(
 )
 async def register_user(user_data: user_models.UserInModel, response : Response):
     
-    identity_provider_access_token = identity_provider_jwt_encoder.generate_jwt({"exp":(datetime.now() + timedelta(minutes=1)).timestamp()})
+    identity_provider_access_token = generate_microservice_access_token(identity_provider_jwt_encoder)
     
     headers = {'Content-Type': 'application/json', 'microserviceAccessToken':identity_provider_access_token}
-    post_user_response = requests.post(f"https://cs-identity-provider.deta.dev/users", json=user_data.dict(), headers=headers)
+    post_user_response = await upstream_client.request("identity", "POST", "/users", json=user_data.dict(), headers=headers)
     
     if post_user_response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
@@ -49,16 +65,25 @@ async def register_user(user_data: user_models.UserInModel, response : Response)
     if post_user_response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=post_user_response.json())
 
+    if post_user_response.status_code != status.HTTP_201_CREATED:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
+
     token = post_user_response.json()["token"]
 
     decoded_token = decode_auth_token(token)
     user_id = decoded_token["userId"]
-    favorites_service_access_token = favorites_service_jwt_encoder.generate_jwt({"exp":(datetime.now() + timedelta(minutes=1)).timestamp()})
+    favorites_service_access_token = generate_microservice_access_token(favorites_service_jwt_encoder)
     
     headers = {'Content-Type': 'application/json', 'userId':user_id, 'microserviceAccessToken':favorites_service_access_token}
-    create_favorites_obj_response = requests.post("https://cs-favorites-service.deta.dev/favorites", json={"ownerId":user_id}, headers=headers)
-    
-    if create_favorites_obj_response.status_code != status.HTTP_201_CREATED:
+    try:
+        create_favorites_obj_response = await upstream_client.request("favorites", "POST", "/favorites", json={"ownerId":user_id}, headers=headers)
+        favorites_obj_created = create_favorites_obj_response.status_code == status.HTTP_201_CREATED
+    except HTTPException:
+        favorites_obj_created = False
+
+    if not favorites_obj_created:
+        # Without a favorites object the account is unusable, so the registration is rolled back.
+        await delete_identity_provider_user(user_id, user_data.password)
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
 
     response.headers["Set-Cookie"] = f"token={token}; Secure; HttpOnly"
@@ -78,10 +103,10 @@ async def register_user(user_data: user_models.UserInModel, response : Response)
 )
 async def login_user(user_data: auth_models.LoginModel, response : Response):
     
-    identity_provider_access_token = identity_provider_jwt_encoder.generate_jwt({"exp":(datetime.now() + timedelta(minutes=1)).timestamp()})
+    identity_provider_access_token = generate_microservice_access_token(identity_provider_jwt_encoder)
     
     headers = {'Content-Type': 'application/json', 'microserviceAccessToken':identity_provider_access_token}
-    login_user_response = requests.post(f"https://cs-identity-provider.deta.dev/login", json=user_data.dict(), headers=headers)
+    login_user_response = await upstream_client.request("identity", "POST", "/login", json=user_data.dict(), headers=headers)
 
     if login_user_response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
@@ -89,6 +114,9 @@ async def login_user(user_data: auth_models.LoginModel, response : Response):
     if login_user_response.status_code == status.HTTP_403_FORBIDDEN:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid credentials")
 
+    if login_user_response.status_code != status.HTTP_200_OK:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
+
     token = login_user_response.json()["token"]
     response.headers["Set-Cookie"] = f"token={token}; Secure; HttpOnly"
 
@@ -1,25 +1,45 @@
-from fastapi import FastAPI, APIRouter, HTTPException, status, Cookie
+import asyncio
+import logging
+from fastapi import FastAPI, APIRouter, HTTPException, status, Cookie, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime,timedelta
 from decouple import config
-import requests
+from modules.upstream import upstream_client
+from modules.server_timing.server_timing import TimedRoute
 from models.component_model import Component
 from models import error_models, currency_models, auth_models, user_models, product_models, favorites_models
 from modules.jwt.jwt_module import JwtEncoder
-from utils import decode_auth_token
+from modules.lru_cache.lru_cache import create_user_cache
+from routes.favorites_service_routes import favorites_cache
+from utils import decode_auth_token, generate_microservice_access_token, rate_limit
 
 JWT_SECRET = config("JWT_SECRET")
 JWT_ALGORITHM="HS256"
 IDENTITY_PROVIDER_ACCESS_KEY = config("IDENTITY_PROVIDER_ACCESS_KEY")
 FAVORITES_SERVICE_ACCESS_KEY = config("FAVORITES_SERVICE_ACCESS_KEY")
 DUMMY_ACCOUNT_USER_ID = config("DUMMY_ACCOUNT_USER_ID")
+USER_PROFILE_CACHE_TTL = config("USER_PROFILE_CACHE_TTL", default=10, cast=float)
+USER_PROFILE_CACHE_MAX_ENTRIES = config("USER_PROFILE_CACHE_MAX_ENTRIES", default=10000, cast=int)
+USER_PROFILE_CACHE_MAX_BYTES = config("USER_PROFILE_CACHE_MAX_BYTES", default=8 * 1024 * 1024, cast=int)
+FAVORITES_CLEANUP_RETRIES = config("FAVORITES_CLEANUP_RETRIES", default=5, cast=int)
+FAVORITES_CLEANUP_RETRY_DELAY = config("FAVORITES_CLEANUP_RETRY_DELAY", default=1.0, cast=float)
 
 identity_provider_jwt_encoder = JwtEncoder(secret=IDENTITY_PROVIDER_ACCESS_KEY, algorithm=JWT_ALGORITHM)
 favorites_service_jwt_encoder = JwtEncoder(secret=FAVORITES_SERVICE_ACCESS_KEY, algorithm=JWT_ALGORITHM)
+logger = logging.getLogger("cs_api_gateway.users")
+# Favorites cleanups retried after the user was deleted, referenced until they finish.
+_favorites_cleanups = set()
+# User data by user id, dropped when the user changes it through this worker.
+user_profile_cache = create_user_cache("userProfiles", ttl=USER_PROFILE_CACHE_TTL, max_entries=USER_PROFILE_CACHE_MAX_ENTRIES, max_bytes=USER_PROFILE_CACHE_MAX_BYTES)
 
 router = APIRouter(
     prefix="/users",
-    tags=["user data (identity provider)"]
+    tags=["user data (identity provider)"],
+    dependencies=[Depends(rate_limit("users"))],
+    responses={429 :{
+            "model": error_models.HTTPErrorModel,
+            "description": "Error raised if the client exceeds its rate limit."
+        }},
+    route_class=TimedRoute
 )
 
 
@@ -31,6 +51,24 @@ def is_protected(user_id):
         return False
 
 
+async def fetch_user_data(user_id:str):
+
+    async def load_user_data():
+        identity_provider_access_token = generate_microservice_access_token(identity_provider_jwt_encoder)
+        headers = {'Content-Type': 'application/json', 'userId':user_id, 'microserviceAccessToken':identity_provider_access_token}
+        get_user_data_response = await upstream_client.request("identity", "GET", f"/users/{user_id}", headers=headers)
+        
+        if get_user_data_response.status_code == status.HTTP_404_NOT_FOUND:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+        if get_user_data_response.status_code != status.HTTP_200_OK:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
+        
+        return get_user_data_response.json()
+
+    return await user_profile_cache.get_or_load(user_id, load_user_data)
+
+
 @router.get(
     "",
     description="Get user data of a given user.",
@@ -52,15 +90,7 @@ async def get_user_data(token: str = Cookie()):
     if decoded_token is None:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token")
 
-    user_id = decoded_token["userId"]
-    identity_provider_access_token = identity_provider_jwt_encoder.generate_jwt({"exp":(datetime.now() + timedelta(minutes=1)).timestamp()})
-    headers = {'Content-Type': 'application/json', 'userId':user_id, 'microserviceAccessToken':identity_provider_access_token}
-    get_user_data_response = requests.get(f"https://cs-identity-provider.deta.dev/users/{user_id}", headers=headers)
-    
-    if get_user_data_response.status_code == status.HTTP_404_NOT_FOUND:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    
-    return get_user_data_response.json()
+    return await fetch_user_data(decoded_token["userId"])
 
 
 @router.patch(
@@ -96,9 +126,9 @@ async def patch_user_by_id(user_data: user_models.UserUpdatesInModel, token: str
     if is_protected(user_id):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User is protected from change")
 
-    identity_provider_access_token = identity_provider_jwt_encoder.generate_jwt({"exp":(datetime.now() + timedelta(minutes=1)).timestamp()})
+    identity_provider_access_token = generate_microservice_access_token(identity_provider_jwt_encoder)
     headers = {'Content-Type': 'application/json', 'userId':user_id, 'microserviceAccessToken':identity_provider_access_token}
-    patch_data_response = requests.patch(f"https://cs-identity-provider.deta.dev/users/{user_id}", json=user_data.dict(), headers=headers)
+    patch_data_response = await upstream_client.request("identity", "PATCH", f"/users/{user_id}", json=user_data.dict(), headers=headers)
     
     if patch_data_response.status_code == status.HTTP_404_NOT_FOUND:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
@@ -109,8 +139,10 @@ async def patch_user_by_id(user_data: user_models.UserUpdatesInModel, token: str
     if patch_data_response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=patch_data_response.json())
 
-    if patch_data_response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
+    if patch_data_response.status_code != status.HTTP_204_NO_CONTENT:
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
+
+    user_profile_cache.invalidate(user_id)
     # All checks passed:
     return
 
@@ -151,9 +183,9 @@ async def change_user_password_by_id(change_password_data: user_models.UserChang
     if is_protected(user_id):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User is protected from change")
 
-    identity_provider_access_token = identity_provider_jwt_encoder.generate_jwt({"exp":(datetime.now() + timedelta(minutes=1)).timestamp()})
+    identity_provider_access_token = generate_microservice_access_token(identity_provider_jwt_encoder)
     headers = {'Content-Type': 'application/json', 'userId':user_id, 'microserviceAccessToken':identity_provider_access_token}
-    patch_password_response = requests.patch(f"https://cs-identity-provider.deta.dev/users/{user_id}/password", json=change_password_data.dict(), headers=headers)
+    patch_password_response = await upstream_client.request("identity", "PATCH", f"/users/{user_id}/password", json=change_password_data.dict(), headers=headers)
 
     if patch_password_response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
@@ -166,10 +198,34 @@ async def change_user_password_by_id(change_password_data: user_models.UserChang
     
     if patch_password_response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=patch_password_response.json())
+
+    if patch_password_response.status_code != status.HTTP_204_NO_CONTENT:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
+
+    user_profile_cache.invalidate(user_id)
     # All checks passed:
     return
        
 
+async def delete_favorites_obj(user_id:str)->bool:
+    favorites_service_access_token = generate_microservice_access_token(favorites_service_jwt_encoder)
+    favorites_service_headers = {'Content-Type': 'application/json', 'userId':user_id, 'microserviceAccessToken':favorites_service_access_token}
+    try:
+        delete_favorites_obj_response = await upstream_client.request("favorites", "DELETE", "/favorites", json={"ownerId":user_id}, headers=favorites_service_headers)
+    except HTTPException:
+        return False
+    # A missing favorites object is already cleaned up.
+    return delete_favorites_obj_response.status_code in (status.HTTP_204_NO_CONTENT, status.HTTP_404_NOT_FOUND)
+
+
+async def retry_favorites_cleanup(user_id:str):
+    for attempt in range(FAVORITES_CLEANUP_RETRIES):
+        await asyncio.sleep(FAVORITES_CLEANUP_RETRY_DELAY * 2 ** attempt)
+        if await delete_favorites_obj(user_id):
+            return
+    logger.error("Giving up deleting the favorites of user %s after %d retries", user_id, FAVORITES_CLEANUP_RETRIES)
+
+
 @router.delete(
      "",
     status_code=status.HTTP_204_NO_CONTENT,
@@ -193,9 +249,9 @@ async def delete_user(passwordIn:auth_models.PasswordInModel, token: str = Cooki
     if is_protected(user_id):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User is protected from deletion")
 
-    identity_provider_access_token = identity_provider_jwt_encoder.generate_jwt({"exp":(datetime.now() + timedelta(minutes=1)).timestamp()})
+    identity_provider_access_token = generate_microservice_access_token(identity_provider_jwt_encoder)
     identity_provider_headers = {'Content-Type': 'application/json', 'userId':user_id, 'microserviceAccessToken':identity_provider_access_token}
-    delete_user_response = requests.delete(f"https://cs-identity-provider.deta.dev/users", json=passwordIn.dict(), headers=identity_provider_headers)
+    delete_user_response = await upstream_client.request("identity", "DELETE", "/users", json=passwordIn.dict(), headers=identity_provider_headers)
     
     if delete_user_response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
@@ -206,10 +262,15 @@ async def delete_user(passwordIn:auth_models.PasswordInModel, token: str = Cooki
         elif {"detail":"Invalid password"}:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid password")
 
-    favorites_service_access_token = favorites_service_jwt_encoder.generate_jwt({"exp":(datetime.now() + timedelta(minutes=1)).timestamp()})
-    favorites_service_headers = {'Content-Type': 'application/json', 'userId':user_id, 'microserviceAccessToken':favorites_service_access_token}
-    delete_favorites_obj_response = requests.delete("https://cs-favorites-service.deta.dev/favorites", json={"ownerId":user_id}, headers=favorites_service_headers)
-
-    if delete_favorites_obj_response.status_code != status.HTTP_204_NO_CONTENT:
+    if delete_user_response.status_code != status.HTTP_204_NO_CONTENT:
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
+
+    user_profile_cache.invalidate(user_id)
+    favorites_cache.invalidate(user_id)
+    # The user is already deleted, so a failed favorites cleanup is retried in the background instead of failing the request.
+    if not await delete_favorites_obj(user_id):
+        logger.warning("Deleting the favorites of user %s failed, retrying in the background", user_id)
+        favorites_cleanup = asyncio.get_running_loop().create_task(retry_favorites_cleanup(user_id))
+        _favorites_cleanups.add(favorites_cleanup)
+        favorites_cleanup.add_done_callback(_favorites_cleanups.discard)
     
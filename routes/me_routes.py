@@ -0,0 +1,66 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, status, Cookie, Depends
+from modules.server_timing.server_timing import TimedRoute
+from models import error_models, me_models
+from routes.identity_provider.identity_provider_users_routes import fetch_user_data
+from routes.product_service_routes import fetch_products
+from routes.favorites_service_routes import fetch_favorites
+from utils import decode_auth_token, rate_limit
+
+router = APIRouter(
+    prefix="/me",
+    tags=["dashboard"],
+    dependencies=[Depends(rate_limit("users"))],
+    responses={429 :{
+            "model": error_models.HTTPErrorModel,
+            "description": "Error raised if the client exceeds its rate limit."
+        }},
+    route_class=TimedRoute
+)
+
+@router.get(
+    "",
+    response_model=me_models.MeResponseModel,
+    response_description="Returns user data, products and favorites of the user. Sections that could not be fetched are null and listed in errors.",
+    responses={403 :{
+            "model": error_models.HTTPErrorModel,
+            "description": "Error raised if the provided token is invalid."
+        },
+        404 :{
+            "model": error_models.HTTPErrorModel,
+            "description": "Error raised if the user could not be found."
+        },
+        503 :{
+            "model": error_models.HTTPErrorModel,
+            "description": "Error raised if no section could be fetched."
+        }},
+    description="Get everything the frontend shows after login in one request, fetched concurrently from the microservices.",
+)
+async def get_me(token: str = Cookie()):
+    decoded_token = decode_auth_token(token)
+    if decoded_token is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token")
+
+    user_id = decoded_token["userId"]
+    sections = {
+        "user": fetch_user_data(user_id),
+        "products": fetch_products(user_id),
+        "favorites": fetch_favorites(user_id),
+    }
+    results = await asyncio.gather(*sections.values(), return_exceptions=True)
+
+    me = {"errors": {}}
+    for section, result in zip(sections, results):
+        if isinstance(result, HTTPException):
+            if result.status_code == status.HTTP_404_NOT_FOUND and section == "user":
+                raise result
+            me[section] = None
+            me["errors"][section] = {"statusCode": result.status_code, "detail": result.detail}
+        elif isinstance(result, Exception):
+            raise result
+        else:
+            me[section] = result
+
+    if len(me["errors"]) == len(sections):
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
+    return me
@@ -1,24 +1,60 @@
-from fastapi import FastAPI, APIRouter, HTTPException, status, Cookie
+from typing import Optional
+from fastapi import FastAPI, APIRouter, HTTPException, status, Cookie, Depends, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime,timedelta
 from decouple import config
-import requests
+from modules.upstream import upstream_client
+from modules.server_timing.server_timing import TimedRoute
 from models.component_model import Component
 from models import error_models, product_models
 from modules.jwt.jwt_module import JwtEncoder
-from utils import decode_auth_token
+from modules.idempotency.idempotency import request_fingerprint
+from modules.price_conversion.price_conversion import ConvertedPriceCache, convert_price
+from modules.lru_cache.lru_cache import create_user_cache
+from routes.currency_service_routes import price_conversion_rate, PRICE_CURRENCY
+from routes.components_service_routes import get_component_prices
+from utils import decode_auth_token, generate_microservice_access_token, rate_limit, run_idempotent
 
 JWT_SECRET = config("JWT_SECRET")
 JWT_ALGORITHM="HS256"
 PRODUCT_SERVICE_ACCESS_KEY = config("PRODUCT_SERVICE_ACCESS_KEY")
+PRODUCTS_CACHE_TTL = config("PRODUCTS_CACHE_TTL", default=30, cast=float)
+PRODUCTS_CACHE_MAX_ENTRIES = config("PRODUCTS_CACHE_MAX_ENTRIES", default=10000, cast=int)
+PRODUCTS_CACHE_MAX_BYTES = config("PRODUCTS_CACHE_MAX_BYTES", default=32 * 1024 * 1024, cast=int)
+PRODUCTS_CONVERTED_MAX_ENTRIES = config("PRODUCTS_CONVERTED_MAX_ENTRIES", default=1000, cast=int)
 
 product_service_jwt_encoder = JwtEncoder(secret=PRODUCT_SERVICE_ACCESS_KEY, algorithm=JWT_ALGORITHM)
+# Product lists by user id. Writes through this worker update or invalidate them, writes through other workers show up after the ttl.
+products_cache = create_user_cache("products", ttl=PRODUCTS_CACHE_TTL, max_entries=PRODUCTS_CACHE_MAX_ENTRIES, max_bytes=PRODUCTS_CACHE_MAX_BYTES)
+# Converted copies of the cached product lists by (user id, currency).
+converted_products = ConvertedPriceCache(max_entries=PRODUCTS_CONVERTED_MAX_ENTRIES)
 
 router = APIRouter(
     prefix="/products",
-    tags=["products microservice"]
+    tags=["products microservice"],
+    dependencies=[Depends(rate_limit("products"))],
+    responses={429 :{
+            "model": error_models.HTTPErrorModel,
+            "description": "Error raised if the client exceeds its rate limit."
+        }},
+    route_class=TimedRoute
 )
 
+async def fetch_products(user_id:str):
+    
+    async def load_products():
+        product_service_access_token = generate_microservice_access_token(product_service_jwt_encoder)
+        
+        headers = {'Content-Type': 'application/json', 'userId':user_id, 'microserviceAccessToken':product_service_access_token}
+        get_products_response = await upstream_client.request("products", "GET", "/products", headers=headers)
+
+        if get_products_response.status_code != status.HTTP_200_OK:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
+
+        return get_products_response.json()
+
+    return await products_cache.get_or_load(user_id, load_products)
+
+
 @router.get(
     "",
     response_model=list[product_models.ProductResponseModel],
@@ -26,21 +62,53 @@ router = APIRouter(
     responses={403 :{
             "model": error_models.HTTPErrorModel,
             "description": "Error raised if the provided token is invalid."
+        },
+        422 :{
+            "model": error_models.HTTPErrorModel,
+            "description": "Error raised if the requested currency is not supported."
         }},
-    description="Get all products belonging to a user.",    
+    description="Get all products belonging to a user, with prices converted to the optional currency.",    
 )
-async def get_products_for_user(token: str = Cookie()):
+async def get_products_for_user(token: str = Cookie(), currency: Optional[str] = None):
     decoded_token = decode_auth_token(token)
     if decoded_token is None:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token")
 
     user_id = decoded_token["userId"]
-    product_service_access_token = product_service_jwt_encoder.generate_jwt({"exp":(datetime.now() + timedelta(minutes=1)).timestamp()})
-    
-    headers = {'Content-Type': 'application/json', 'userId':user_id, 'microserviceAccessToken':product_service_access_token}
-    get_products_response = requests.get(f"https://cs-product-service.deta.dev/products", headers=headers)
+    products = await fetch_products(user_id)
+    if currency is None:
+        return products
+    return converted_products.get((user_id, currency.upper()), products, await price_conversion_rate(currency))
+
+
+@router.post(
+    "/price-preview",
+    response_model=product_models.PricePreviewResponseModel,
+    response_description="Returns the price a product with the given components would have.",
+    responses={403 :{
+            "model": error_models.HTTPErrorModel,
+            "description": "Error raised if the provided token is invalid."
+        },
+        422 :{
+            "model": error_models.HTTPErrorModel,
+            "description": "Error raised if a component is unknown or the requested currency is not supported."
+        }},
+    description="Preview the price of a product from the cached component catalog, optionally converted to a currency, without creating or changing a product.",
+)
+async def preview_product_price(price_preview: product_models.PricePreviewRequestModel, token: str = Cookie(), currency: Optional[str] = None):
+    decoded_token = decode_auth_token(token)
+    if decoded_token is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token")
 
-    return get_products_response.json()
+    component_prices = await get_component_prices()
+    unknown_component_ids = [component_id for component_id in price_preview.component_ids if component_id not in component_prices]
+    if unknown_component_ids:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Unknown components: {', '.join(unknown_component_ids)}")
+
+    price = round(sum(component_prices[component_id] for component_id in price_preview.component_ids), 2)
+    if currency is None:
+        return {"price": price, "currency": PRICE_CURRENCY}
+    return {"price": round(price * await price_conversion_rate(currency), 2), "currency": currency.upper()}
 
 
 @router.get(
@@ -55,19 +123,32 @@ async def get_products_for_user(token: str = Cookie()):
         404 :{
                 "model": error_models.HTTPErrorModel,
                 "description": "Error raised if the product cant be found."
+        },
+        422 :{
+            "model": error_models.HTTPErrorModel,
+            "description": "Error raised if the requested currency is not supported."
         }},
-    description="Get a product by its id, belonging to the user."
+    description="Get a product by its id, belonging to the user, with its price converted to the optional currency."
 )
-async def get_product_by_id(product_id, token: str = Cookie()):
+async def get_product_by_id(product_id, token: str = Cookie(), currency: Optional[str] = None):
     decoded_token = decode_auth_token(token)
     if decoded_token is None:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token")
 
     user_id = decoded_token["userId"]
-    product_service_access_token = product_service_jwt_encoder.generate_jwt({"exp":(datetime.now() + timedelta(minutes=1)).timestamp()})
+    # The cached list only holds products owned by the user, anything else is left to the product service to answer.
+    cached_products = products_cache.get(user_id) or []
+    cached_product = next((product for product in cached_products if product["id"] == product_id), None)
+    if cached_product is not None:
+        if currency is None:
+            return cached_product
+        converted_cached_products = converted_products.get((user_id, currency.upper()), cached_products, await price_conversion_rate(currency))
+        return next(product for product in converted_cached_products if product["id"] == product_id)
+
+    product_service_access_token = generate_microservice_access_token(product_service_jwt_encoder)
     
     headers = {'Content-Type': 'application/json', 'userId':user_id, 'microserviceAccessToken':product_service_access_token}
-    get_product_response = requests.get(f"https://cs-product-service.deta.dev/products/{product_id}", headers=headers)
+    get_product_response = await upstream_client.request("products", "GET", f"/products/{product_id}", headers=headers)
 
     if get_product_response.status_code == status.HTTP_404_NOT_FOUND:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found.")
@@ -75,7 +156,12 @@ async def get_product_by_id(product_id, token: str = Cookie()):
     if get_product_response.status_code == status.HTTP_403_FORBIDDEN:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User is not allowed to get a product not owned.")
 
-    return get_product_response.json()
+    if get_product_response.status_code != status.HTTP_200_OK:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
+
+    if currency is None:
+        return get_product_response.json()
+    return convert_price(get_product_response.json(), await price_conversion_rate(currency))
     
 
 @router.post(
@@ -89,31 +175,39 @@ async def get_product_by_id(product_id, token: str = Cookie()):
         },
         422 :{
             "model": error_models.HTTPErrorModel,
-            "description": "Error raised if provided product data is not valid."
+            "description": "Error raised if provided product data or idempotency key is not valid, or the key was used for a different request."
         }},
-    description="Create a new product for a user",
+    description="Create a new product for a user. Retries with the same Idempotency-Key header return the first response instead of creating another product.",
 )
-async def post_product_by_user(product: product_models.ProductModel, token: str = Cookie()):
+async def post_product_by_user(product: product_models.ProductModel, response: Response, token: str = Cookie(), idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key")):
     decoded_token = decode_auth_token(token)
     if decoded_token is None:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token")
 
     user_id = decoded_token["userId"]
-    product_service_access_token = product_service_jwt_encoder.generate_jwt({"exp":(datetime.now() + timedelta(minutes=1)).timestamp()})
     
     new_product = product.dict()
     new_product["ownerId"] = user_id
 
-    headers = {'Content-Type':'application/json', 'userId':user_id, 'microserviceAccessToken':product_service_access_token}
-    post_product_response = requests.post(f"https://cs-product-service.deta.dev/products", json=new_product, headers=headers)
-    
-    if post_product_response.status_code == status.HTTP_403_FORBIDDEN:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Users are only allowed to create products for themselves.")
+    async def create_product():
+        product_service_access_token = generate_microservice_access_token(product_service_jwt_encoder)
+        headers = {'Content-Type':'application/json', 'userId':user_id, 'microserviceAccessToken':product_service_access_token}
+        post_product_response = await upstream_client.request("products", "POST", "/products", json=new_product, headers=headers)
+        
+        if post_product_response.status_code == status.HTTP_403_FORBIDDEN:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Users are only allowed to create products for themselves.")
+
+        if post_product_response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=post_product_response.json())
+
+        if post_product_response.status_code != status.HTTP_201_CREATED:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
 
-    if post_product_response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY:
-        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=post_product_response.json())
+        created_product = post_product_response.json()
+        products_cache.update(user_id, lambda cached_products: [*cached_products, created_product])
+        return created_product
 
-    return post_product_response.json()
+    return await run_idempotent(idempotency_key, user_id, request_fingerprint("POST", "/products", new_product), create_product, response)
 
 
 @router.patch(
@@ -142,13 +236,13 @@ async def patch_product_by_id(product: product_models.ProductModel, product_id,
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token")
 
     user_id = decoded_token["userId"]
-    product_service_access_token = product_service_jwt_encoder.generate_jwt({"exp":(datetime.now() + timedelta(minutes=1)).timestamp()})
+    product_service_access_token = generate_microservice_access_token(product_service_jwt_encoder)
     
     new_product = product.dict()
     new_product["ownerId"] = user_id
 
     headers = {'Content-Type':'application/json', 'userId':user_id, 'microserviceAccessToken':product_service_access_token}
-    patch_product_response = requests.patch(f"https://cs-product-service.deta.dev/products/{product_id}", json=new_product, headers=headers)
+    patch_product_response = await upstream_client.request("products", "PATCH", f"/products/{product_id}", json=new_product, headers=headers)
     
     if patch_product_response.status_code == status.HTTP_404_NOT_FOUND:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found.")
@@ -158,6 +252,11 @@ async def patch_product_by_id(product: product_models.ProductModel, product_id,
 
     if patch_product_response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=patch_product_response.json())
+
+    if patch_product_response.status_code != status.HTTP_204_NO_CONTENT:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
+    # The product service recalculates the price from the components, so the cached list is reloaded.
+    products_cache.invalidate(user_id)
     #all checks passed:
     return
         
@@ -177,10 +276,18 @@ async def delete_product_by_id(product_id, token: str = Cookie()):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token")
 
     user_id = decoded_token["userId"]
-    product_service_access_token = product_service_jwt_encoder.generate_jwt({"exp":(datetime.now() + timedelta(minutes=1)).timestamp()})
+    product_service_access_token = generate_microservice_access_token(product_service_jwt_encoder)
     
     headers = {'Content-Type':'application/json', 'userId':user_id, 'microserviceAccessToken':product_service_access_token}
-    delete_product_response = requests.delete(f"https://cs-product-service.deta.dev/products/{product_id}", headers=headers)
+    delete_product_response = await upstream_client.request("products", "DELETE", f"/products/{product_id}", headers=headers)
     
     if delete_product_response.status_code == status.HTTP_403_FORBIDDEN:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User is not allowed to delete a product not owned.")
+
+    if delete_product_response.status_code == status.HTTP_404_NOT_FOUND:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found.")
+
+    if delete_product_response.status_code != status.HTTP_204_NO_CONTENT:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Request to microservice failed")
+
+    products_cache.update(user_id, lambda cached_products: [cached_product for cached_product in cached_products if cached_product["id"] != product_id])
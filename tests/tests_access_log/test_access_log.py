@@ -0,0 +1,40 @@
+import json
+import logging
+from datetime import datetime,timedelta
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from modules.access_log.access_log import AccessLogMiddleware, anonymize_user_id
+from routes import product_service_routes
+from utils import jwt_encoder, JWT_ISSUER
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(json.loads(record.getMessage()))
+
+
+def test_access_log_records_route_template_and_anonymized_user():
+    #ARRANGE
+    handler = ListHandler()
+    logger = logging.getLogger("test_access_log")
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    app = FastAPI()
+    app.include_router(router=product_service_routes.router)
+    app.add_middleware(AccessLogMiddleware, logger=logger, user_id_salt="test-salt")
+    client = TestClient(app)
+    token = jwt_encoder.generate_jwt({"userId":"some-user", "exp":(datetime.now() + timedelta(minutes=1)).timestamp(), "aud":"wrong audience", "iss":JWT_ISSUER})
+    #ACT
+    response = client.get("/products/some_product_id", cookies={"token":token})
+    #ASSERT
+    assert response.status_code == 403
+    assert handler.lines[0]["method"] == "GET"
+    assert handler.lines[0]["route"] == "/products/{product_id}"
+    assert handler.lines[0]["status"] == 403
+    assert handler.lines[0]["user"] == anonymize_user_id("some-user", "test-salt")
+    #CLEANUP
+    logger.removeHandler(handler)
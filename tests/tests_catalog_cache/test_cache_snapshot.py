@@ -0,0 +1,46 @@
+import asyncio
+from modules.catalog_cache.catalog_cache import RefreshingCache
+from modules.catalog_cache.cache_snapshot import CacheSnapshotter, write_snapshot, read_snapshot, SNAPSHOT_HEADER
+
+
+async def load_components():
+    return [{"id":"546c08d7-539d-11ed-a980-cd9f67f7363d", "price":559.0}]
+
+
+def test_snapshot_restores_caches_without_loading(tmp_path):
+    #ARRANGE
+    async def failing_loader():
+        raise AssertionError("restored cache must not load")
+    async def run(path):
+        cache = RefreshingCache("components", load_components)
+        await cache.get()
+        write_snapshot(path, {"components":cache})
+        restored_cache = RefreshingCache("components", failing_loader)
+        restored = CacheSnapshotter(path, {"components":restored_cache}).load()
+        return restored, await restored_cache.get()
+    #ACT
+    restored, value = asyncio.run(run(str(tmp_path / "snapshot.bin")))
+    #ASSERT
+    assert restored == ["components"]
+    assert value == [{"id":"546c08d7-539d-11ed-a980-cd9f67f7363d", "price":559.0}]
+
+
+def test_snapshot_is_ignored_when_damaged_or_too_old(tmp_path):
+    #ARRANGE
+    path = str(tmp_path / "snapshot.bin")
+    cache = RefreshingCache("components", load_components)
+    asyncio.run(cache.get())
+    write_snapshot(path, {"components":cache})
+    #ACT
+    valid = read_snapshot(path, max_age=60)
+    too_old = read_snapshot(path, max_age=-1)
+    with open(path, "r+b") as snapshot_file:
+        snapshot_file.seek(SNAPSHOT_HEADER.size + 2)
+        snapshot_file.write(b"#")
+    damaged = read_snapshot(path, max_age=60)
+    missing = read_snapshot(str(tmp_path / "missing.bin"), max_age=60)
+    #ASSERT
+    assert valid is not None
+    assert too_old is None
+    assert damaged is None
+    assert missing is None
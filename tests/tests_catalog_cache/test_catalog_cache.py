@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from modules.catalog_cache.catalog_cache import RefreshingCache
+
+
+def test_refreshing_cache_loads_once_for_concurrent_cold_requests():
+    #ARRANGE
+    loads = []
+    async def loader():
+        loads.append(1)
+        await asyncio.sleep(0.01)
+        return ["component"]
+    async def run():
+        catalog_cache = RefreshingCache("test", loader)
+        values = await asyncio.gather(*(catalog_cache.get() for _ in range(5)))
+        values.append(await catalog_cache.get())
+        return values, catalog_cache.stats()
+    #ACT
+    values, stats = asyncio.run(run())
+    #ASSERT
+    assert len(loads) == 1
+    assert values == [["component"]] * 6
+    assert stats["hits"] == 1
+    assert stats["fresh"]
+
+
+def test_refreshing_cache_serves_stale_value_when_refresh_fails():
+    #ARRANGE
+    results = [["old"], HTTPException(status_code=503)]
+    async def loader():
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    async def run():
+        catalog_cache = RefreshingCache("test", loader, ttl=0, stale_ttl=60)
+        await catalog_cache.get()
+        return await catalog_cache.get()
+    #ACT
+    value = asyncio.run(run())
+    #ASSERT
+    assert value == ["old"]
+
+
+def test_refreshing_cache_raises_when_cold_and_load_fails():
+    #ARRANGE
+    async def loader():
+        raise HTTPException(status_code=503)
+    #ACT / ASSERT
+    with pytest.raises(HTTPException):
+        asyncio.run(RefreshingCache("test", loader).get())
+
+
+def test_refreshing_cache_prefetches_in_background_with_backoff():
+    #ARRANGE
+    loads = []
+    async def loader():
+        loads.append(1)
+        if len(loads) == 2:
+            raise HTTPException(status_code=503)
+        return len(loads)
+    async def run():
+        catalog_cache = RefreshingCache("test", loader, refresh_interval=0.01, retry_delay=0.005, max_backoff=0.01)
+        catalog_cache.start()
+        await asyncio.sleep(0.1)
+        await catalog_cache.stop()
+        return catalog_cache.stats(), await catalog_cache.get()
+    #ACT
+    stats, value = asyncio.run(run())
+    #ASSERT
+    assert len(loads) >= 3
+    assert stats["refreshFailures"] == 1
+    assert stats["hits"] == 0
+    assert not stats["prefetching"]
+    assert value == len(loads)
+
+
+def test_refreshing_cache_skips_background_refresh_while_refreshed_elsewhere():
+    #ARRANGE
+    loads = []
+    async def loader():
+        loads.append(1)
+        return len(loads)
+    async def run():
+        catalog_cache = RefreshingCache("test", loader, refresh_interval=0.05, jitter=0)
+        await catalog_cache.refresh()
+        catalog_cache.start()
+        for _ in range(10):
+            await asyncio.sleep(0.02)
+            await catalog_cache.refresh()
+        await catalog_cache.stop()
+    #ACT
+    asyncio.run(run())
+    #ASSERT
+    assert len(loads) == 11
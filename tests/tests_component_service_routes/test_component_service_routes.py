@@ -17,4 +17,26 @@ def test_get_components_endpoint_returns_components():
         "weight": 300.0,
         "status": "new",
         "eanNumber": "730143312745"
-  }
\ No newline at end of file
+  }
+
+
+def test_get_components_endpoint_converts_prices_to_currency():
+    #ARRANGE
+    client = TestClient(app)
+    exchange_rate = client.get("/currencies/EUR/USD").json()["exchangeRate"]
+    prices_in_eur = {component["id"]:component["price"] for component in client.get("/components").json()}
+    #ACT
+    response = client.get("/components", params={"currency":"USD"})
+    #ASSERT
+    assert response.status_code == 200
+    assert all(component["price"] == round(prices_in_eur[component["id"]] * exchange_rate, 2) for component in response.json())
+
+
+def test_get_components_endpoint_fails_unsupported_currency():
+    #ARRANGE
+    client = TestClient(app)
+    #ACT
+    response = client.get("/components", params={"currency":"XXX"})
+    #ASSERT
+    assert response.status_code == 422
+    assert response.json() == {"detail":"Unsupported currency"}
@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+from modules.concurrency_limiter.concurrency_limiter import AdaptiveConcurrencyLimiter, RequestShedError, PRIORITY_HIGH, PRIORITY_LOW
+
+
+def test_limiter_sheds_requests_when_queue_is_full():
+    #ARRANGE
+    async def run():
+        concurrency_limiter = AdaptiveConcurrencyLimiter("test", initial_limit=1, min_limit=1, max_queue=0, queue_timeout=1)
+        await concurrency_limiter.acquire()
+        with pytest.raises(RequestShedError):
+            await concurrency_limiter.acquire()
+        return concurrency_limiter.stats()
+    #ACT
+    stats = asyncio.run(run())
+    #ASSERT
+    assert stats["inFlight"] == 1
+    assert stats["shed"] == 1
+
+
+def test_limiter_sheds_queued_requests_after_queue_timeout():
+    #ARRANGE
+    async def run():
+        concurrency_limiter = AdaptiveConcurrencyLimiter("test", initial_limit=1, min_limit=1, queue_timeout=0.01)
+        await concurrency_limiter.acquire()
+        with pytest.raises(RequestShedError):
+            await concurrency_limiter.acquire()
+        return concurrency_limiter.stats()
+    #ACT
+    stats = asyncio.run(run())
+    #ASSERT
+    assert stats["queued"] == 0
+    assert stats["shed"] == 1
+
+
+def test_limiter_grants_released_slots_by_priority():
+    #ARRANGE
+    async def run():
+        concurrency_limiter = AdaptiveConcurrencyLimiter("test", initial_limit=1, min_limit=1, queue_timeout=1)
+        granted = []
+        async def acquire(name, priority):
+            await concurrency_limiter.acquire(priority)
+            granted.append(name)
+        await concurrency_limiter.acquire()
+        low = asyncio.create_task(acquire("low", PRIORITY_LOW))
+        high = asyncio.create_task(acquire("high", PRIORITY_HIGH))
+        await asyncio.sleep(0)
+        concurrency_limiter.release(0.01)
+        await asyncio.sleep(0)
+        concurrency_limiter.release(0.01)
+        await asyncio.gather(low, high)
+        return granted
+    #ACT
+    granted = asyncio.run(run())
+    #ASSERT
+    assert granted == ["high", "low"]
+
+
+def test_limiter_high_priority_request_displaces_queued_low_priority_request():
+    #ARRANGE
+    async def run():
+        concurrency_limiter = AdaptiveConcurrencyLimiter("test", initial_limit=1, min_limit=1, max_queue=1, queue_timeout=1)
+        await concurrency_limiter.acquire()
+        low = asyncio.create_task(concurrency_limiter.acquire(PRIORITY_LOW))
+        await asyncio.sleep(0)
+        high = asyncio.create_task(concurrency_limiter.acquire(PRIORITY_HIGH))
+        await asyncio.sleep(0)
+        concurrency_limiter.release(0.01)
+        await high
+        return await asyncio.gather(low, return_exceptions=True)
+    #ACT
+    low_result, = asyncio.run(run())
+    #ASSERT
+    assert isinstance(low_result, RequestShedError)
+
+
+def test_limiter_decreases_limit_on_latency_increase_and_failures():
+    #ARRANGE
+    concurrency_limiter = AdaptiveConcurrencyLimiter("test", initial_limit=10, min_limit=2)
+    #ACT
+    concurrency_limiter.in_flight = 3
+    for rtt in (0.01, 0.01, 0.01):
+        concurrency_limiter.release(rtt)
+    limit_before_congestion = concurrency_limiter.limit
+    concurrency_limiter.in_flight = 1
+    concurrency_limiter.release(0.5)
+    limit_after_congestion = concurrency_limiter.limit
+    #ASSERT
+    assert limit_before_congestion >= 10
+    assert limit_after_congestion < limit_before_congestion
@@ -1,5 +1,8 @@
+import asyncio
 from fastapi.testclient import TestClient
 from main import app
+from modules.exchange_rates.exchange_rate_feed import ExchangeRateFeed
+from routes import currency_service_routes
 
 def test_get_currencies_endpoint():
     #ARRANGE
@@ -36,3 +39,28 @@ def test_get_currency_exchange_rate():
     #ASSERT
     assert response.status_code == 200
     assert response.json()[expected_key]
+
+
+def test_stream_exchange_rates_subscribes_only_while_streaming(monkeypatch):
+    #ARRANGE
+    async def fetch_rates(base_currency):
+        return {"EUR":1.0, "USD":1.03}
+    exchange_rate_feed = ExchangeRateFeed(fetch_rates, interval=60)
+    monkeypatch.setattr(currency_service_routes, "exchange_rate_feed", exchange_rate_feed)
+
+    async def run():
+        await currency_service_routes.stream_exchange_rates(symbols="USD")
+        subscribers_before_streaming = exchange_rate_feed.subscriber_count()
+        response = await currency_service_routes.stream_exchange_rates(symbols="USD")
+        first_event = await response.body_iterator.__anext__()
+        subscribers_while_streaming = exchange_rate_feed.subscriber_count()
+        await response.body_iterator.aclose()
+        await exchange_rate_feed.stop()
+        return subscribers_before_streaming, first_event, subscribers_while_streaming, exchange_rate_feed.subscriber_count()
+    #ACT
+    subscribers_before_streaming, first_event, subscribers_while_streaming, subscribers_after_streaming = asyncio.run(run())
+    #ASSERT
+    assert subscribers_before_streaming == 0
+    assert first_event.startswith("event: rates\n")
+    assert subscribers_while_streaming == 1
+    assert subscribers_after_streaming == 0
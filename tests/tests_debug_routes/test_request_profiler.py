@@ -0,0 +1,51 @@
+from fastapi.testclient import TestClient
+from main import app
+import utils
+
+TEST_DEBUG_ACCESS_KEY = "test-debug-access-key"
+
+
+def test_request_with_debug_profile_header_is_profiled(monkeypatch):
+    #ARRANGE
+    monkeypatch.setattr(utils, "DEBUG_ACCESS_KEY", TEST_DEBUG_ACCESS_KEY)
+    client = TestClient(app)
+    auth_cookie = {
+          "token": "invalid_token"
+    }
+    #ACT
+    response = client.get("/products", cookies=auth_cookie, headers={"debugProfile":TEST_DEBUG_ACCESS_KEY})
+    profile_id = response.headers["debugProfileId"]
+    profile_response = client.get(f"/debug/profiles/{profile_id}", headers={"debugAccessKey":TEST_DEBUG_ACCESS_KEY})
+    #ASSERT
+    assert response.status_code == 403
+    assert profile_response.status_code == 200
+    assert "function calls" in profile_response.text
+    assert "decode_auth_token" in profile_response.text
+
+
+def test_request_with_invalid_debug_profile_header_is_not_profiled(monkeypatch):
+    #ARRANGE
+    monkeypatch.setattr(utils, "DEBUG_ACCESS_KEY", TEST_DEBUG_ACCESS_KEY)
+    client = TestClient(app)
+    auth_cookie = {
+          "token": "invalid_token"
+    }
+    #ACT
+    response = client.get("/products", cookies=auth_cookie, headers={"debugProfile":"wrong key"})
+    #ASSERT
+    assert response.status_code == 403
+    assert "debugProfileId" not in response.headers
+
+
+def test_get_profiles_endpoint_fails_invalid_debug_access_key(monkeypatch):
+    #ARRANGE
+    monkeypatch.setattr(utils, "DEBUG_ACCESS_KEY", TEST_DEBUG_ACCESS_KEY)
+    client = TestClient(app)
+    expected_error = {
+        "detail": "Invalid debug access key"
+    }
+    #ACT
+    response = client.get("/debug/profiles", headers={"debugAccessKey":"wrong key"})
+    #ASSERT
+    assert response.status_code == 403
+    assert response.json() == expected_error
@@ -0,0 +1,76 @@
+import sys
+import threading
+import time
+from fastapi.testclient import TestClient
+from main import app
+from modules.profiling.sampling_profiler import SamplingProfiler, OVERFLOW_STACK
+import utils
+
+TEST_DEBUG_ACCESS_KEY = "test-debug-access-key"
+
+
+def test_sampling_profiler_exports_collapsed_stacks(monkeypatch):
+    #ARRANGE
+    monkeypatch.setattr(utils, "DEBUG_ACCESS_KEY", TEST_DEBUG_ACCESS_KEY)
+    client = TestClient(app)
+    debug_headers = {
+        "debugAccessKey": TEST_DEBUG_ACCESS_KEY
+    }
+    client.post("/debug/profiler/reset", headers=debug_headers)
+    #ACT
+    start_response = client.post("/debug/profiler/start", headers=debug_headers)
+    time.sleep(0.1)
+    stop_response = client.post("/debug/profiler/stop", headers=debug_headers)
+    stats_response = client.get("/debug/profiler", headers=debug_headers)
+    collapsed_response = client.get("/debug/profiler/collapsed", headers=debug_headers)
+    #ASSERT
+    assert start_response.status_code == 204
+    assert stop_response.status_code == 204
+    assert stats_response.json()["running"] is False
+    assert stats_response.json()["samples"] > 0
+    assert "MainThread;" in collapsed_response.text
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed_response.text.splitlines())
+    #CLEANUP
+    client.post("/debug/profiler/reset", headers=debug_headers)
+
+
+def test_sampling_profiler_groups_overflowing_stacks(monkeypatch):
+    #ARRANGE
+    profiler = SamplingProfiler(max_stacks=1)
+    in_first_function = threading.Event()
+    in_second_function = threading.Event()
+    leave_first_function = threading.Event()
+    leave_second_function = threading.Event()
+
+    def wait_in_first_function():
+        in_first_function.set()
+        leave_first_function.wait()
+
+    def wait_in_second_function():
+        in_second_function.set()
+        leave_second_function.wait()
+
+    def parked_thread():
+        wait_in_first_function()
+        wait_in_second_function()
+
+    thread = threading.Thread(target=parked_thread, name="parked-thread", daemon=True)
+    thread.start()
+    # Only the parked thread is sampled, other threads of the test process would take the one stack slot.
+    current_frames = sys._current_frames
+    monkeypatch.setattr(sys, "_current_frames", lambda: {thread.ident: current_frames()[thread.ident]})
+    #ACT
+    in_first_function.wait()
+    profiler.sample()
+    leave_first_function.set()
+    in_second_function.wait()
+    profiler.sample()
+    profiler.sample()
+    leave_second_function.set()
+    thread.join()
+    #ASSERT
+    lines = profiler.collapsed_stacks().splitlines()
+    assert len(lines) == 2
+    assert lines[0] == f"{OVERFLOW_STACK} 2"
+    assert lines[1].startswith("parked-thread;") and "wait_in_first_function" in lines[1] and lines[1].endswith(" 1")
+    assert "wait_in_second_function" not in profiler.collapsed_stacks()
@@ -0,0 +1,54 @@
+import asyncio
+from modules.exchange_rates.exchange_rate_feed import ExchangeRateFeed, convert_rates, format_event
+
+
+def test_exchange_rate_feed_shares_one_poll_between_subscribers():
+    #ARRANGE
+    polls = []
+    async def fetch_rates(base_currency):
+        polls.append(base_currency)
+        return {"EUR":1.0, "USD":1.03 + len(polls) / 100}
+    async def run():
+        exchange_rate_feed = ExchangeRateFeed(fetch_rates, interval=0.05)
+        queues = [exchange_rate_feed.subscribe() for _ in range(100)]
+        updates = [await queue.get() for queue in queues]
+        for queue in queues:
+            exchange_rate_feed.unsubscribe(queue)
+        await asyncio.sleep(0.1)
+        return updates, exchange_rate_feed
+    #ACT
+    updates, exchange_rate_feed = asyncio.run(run())
+    #ASSERT
+    assert len(polls) <= 2
+    assert all(update["rates"] == {"EUR":1.0, "USD":1.04} for update in updates)
+    assert exchange_rate_feed.subscriber_count() == 0
+
+
+def test_exchange_rate_feed_keeps_only_latest_update_for_slow_subscribers():
+    #ARRANGE
+    rates = [{"EUR":1.0, "USD":1.01}, {"EUR":1.0, "USD":1.02}]
+    async def fetch_rates(base_currency):
+        return rates.pop(0)
+    async def run():
+        exchange_rate_feed = ExchangeRateFeed(fetch_rates, interval=60)
+        queue = asyncio.Queue(maxsize=1)
+        exchange_rate_feed._subscribers.add(queue)
+        await exchange_rate_feed.poll()
+        await exchange_rate_feed.poll()
+        return queue.qsize(), queue.get_nowait()
+    #ACT
+    queued, update = asyncio.run(run())
+    #ASSERT
+    assert queued == 1
+    assert update["rates"] == {"EUR":1.0, "USD":1.02}
+
+
+def test_convert_rates_and_format_event():
+    #ARRANGE
+    rates_from_eur = {"EUR":1.0, "USD":2.0, "GBP":0.5}
+    #ACT
+    rates_from_usd = convert_rates(rates_from_eur, "USD", ["EUR", "GBP", "XXX"])
+    event = format_event("rates", {"base":"USD", "rates":rates_from_usd})
+    #ASSERT
+    assert rates_from_usd == {"EUR":0.5, "GBP":0.25}
+    assert event == 'event: rates\ndata: {"base":"USD","rates":{"EUR":0.5,"GBP":0.25}}\n\n'
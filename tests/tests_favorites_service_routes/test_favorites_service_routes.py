@@ -1,6 +1,8 @@
 from fastapi.testclient import TestClient
 from decouple import config
 from main import app
+from routes import favorites_service_routes
+from models import favorites_models
 
 def test_get_favorites_endpoint_returns_favorites_for_user():
     #ARRANGE
@@ -153,4 +155,95 @@ def test_delete_favorite_endpoint_deletes_component_favorite_success():
     #ACT
     response = client.delete("/favorites/items",json={"id":"546c08de-539d-11ed-a980-cd9f67f7363d","itemType":"component"}, cookies=auth_cookie)
     #ASSERT
-    assert response.status_code == 204
\ No newline at end of file
+    assert response.status_code == 204
+
+
+def test_get_favorites_endpoint_applies_toggles_without_reloading_favorites(monkeypatch):
+    #ARRANGE
+    client = TestClient(app)
+    VALID_TOKEN = config("VALID_TOKEN")
+    auth_cookie = {
+          "token": VALID_TOKEN
+    }
+    component_favorite = {"id":"546c08de-539d-11ed-a980-cd9f67f7363d","itemType":"component"}
+    client.get("/favorites", cookies=auth_cookie)
+
+    async def load_favorites(user_id, priority=None):
+        raise AssertionError("favorites were reloaded")
+    monkeypatch.setattr(favorites_service_routes, "load_favorites", load_favorites)
+    #ACT
+    client.post("/favorites/items",json=component_favorite, cookies=auth_cookie)
+    favorites_after_add = client.get("/favorites", cookies=auth_cookie).json()
+    client.delete("/favorites/items",json=component_favorite, cookies=auth_cookie)
+    favorites_after_remove = client.get("/favorites", cookies=auth_cookie).json()
+    #ASSERT
+    assert favorites_after_add["componentIds"][-1] == component_favorite["id"]
+    assert component_favorite["id"] not in favorites_after_remove["componentIds"]
+
+
+def test_toggle_cached_favorite_keeps_order_when_adding_existing_item():
+    #ARRANGE
+    favorites = {"ownerId":"cache-test-user", "componentIds":["a", "b", "c"], "productIds":[]}
+    favorites_service_routes.favorites_cache.set("cache-test-user", favorites)
+    existing_item = favorites_models.ToggleFavoriteModel(id="a", item_type="component")
+    #ACT
+    favorites_service_routes.toggle_cached_favorite("cache-test-user", existing_item, add=True)
+    cached_favorites = favorites_service_routes.favorites_cache.get("cache-test-user")
+    #ASSERT
+    assert cached_favorites["componentIds"] == ["a", "b", "c"]
+    #CLEANUP
+    favorites_service_routes.favorites_cache.invalidate("cache-test-user")
+
+
+def test_bulk_favorites_endpoints_return_result_per_item():
+    #ARRANGE
+    client = TestClient(app)
+    VALID_TOKEN = config("VALID_TOKEN")
+    auth_cookie = {
+          "token": VALID_TOKEN
+    }
+    new_favorite = {"id":"546c08de-539d-11ed-a980-cd9f67f7363d","itemType":"component"}
+    existing_favorite = {"id":"546c08d7-539d-11ed-a980-cd9f67f7363d","itemType":"component"}
+    #ACT
+    add_response = client.post("/favorites/items/bulk",json=[new_favorite, existing_favorite], cookies=auth_cookie)
+    favorites_after_add = client.get("/favorites", cookies=auth_cookie).json()
+    delete_response = client.request("DELETE", "/favorites/items/bulk",json=[new_favorite], cookies=auth_cookie)
+    #ASSERT
+    assert add_response.status_code == 200
+    assert add_response.json() == [
+        {**new_favorite, "statusCode":204, "detail":None},
+        {**existing_favorite, "statusCode":409, "detail":"Item is already in favorites list."},
+    ]
+    assert new_favorite["id"] in favorites_after_add["componentIds"]
+    assert delete_response.json() == [{**new_favorite, "statusCode":204, "detail":None}]
+
+
+def test_bulk_favorites_endpoint_returns_invalid_items_as_unprocessable():
+    #ARRANGE
+    client = TestClient(app)
+    VALID_TOKEN = config("VALID_TOKEN")
+    auth_cookie = {
+          "token": VALID_TOKEN
+    }
+    invalid_favorite = {"id":"546c08de-539d-11ed-a980-cd9f67f7363d","itemType":"bogus"}
+    #ACT
+    response = client.post("/favorites/items/bulk",json=[invalid_favorite], cookies=auth_cookie)
+    #ASSERT
+    assert response.status_code == 200
+    assert response.json()[0]["statusCode"] == 422
+
+
+def test_bulk_favorites_endpoint_fails_too_many_items(monkeypatch):
+    #ARRANGE
+    client = TestClient(app)
+    VALID_TOKEN = config("VALID_TOKEN")
+    auth_cookie = {
+          "token": VALID_TOKEN
+    }
+    monkeypatch.setattr(favorites_service_routes, "FAVORITES_BULK_MAX_ITEMS", 1)
+    favorites = [{"id":"546c08de-539d-11ed-a980-cd9f67f7363d","itemType":"component"}, {"id":"29f6f518-53a8-11ed-a980-cd9f67f7363d","itemType":"product"}]
+    #ACT
+    response = client.post("/favorites/items/bulk",json=favorites, cookies=auth_cookie)
+    #ASSERT
+    assert response.status_code == 422
+    assert response.json() == {"detail":"At most 1 items per request"}
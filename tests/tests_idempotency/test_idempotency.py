@@ -0,0 +1,130 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from datetime import datetime
+from decouple import config
+from modules.jwt.jwt_module import JwtEncoder
+from modules.idempotency.idempotency import IdempotencyStore, IdempotencyKeyConflictError, request_fingerprint
+from main import app
+
+
+def test_idempotency_store_replays_first_result():
+    #ARRANGE
+    calls = []
+    async def operation():
+        calls.append(1)
+        return {"id": len(calls)}
+    async def run():
+        idempotency_store = IdempotencyStore()
+        first = await idempotency_store.run("user", "key", "fingerprint", operation)
+        retry = await idempotency_store.run("user", "key", "fingerprint", operation)
+        other_user = await idempotency_store.run("other user", "key", "fingerprint", operation)
+        return first, retry, other_user
+    #ACT
+    first, retry, other_user = asyncio.run(run())
+    #ASSERT
+    assert first == ({"id": 1}, False)
+    assert retry == ({"id": 1}, True)
+    assert other_user == ({"id": 2}, False)
+
+
+def test_idempotency_store_concurrent_duplicates_wait_for_original():
+    #ARRANGE
+    calls = []
+    async def operation():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "created"
+    async def run():
+        idempotency_store = IdempotencyStore()
+        return await asyncio.gather(*(idempotency_store.run("user", "key", "fingerprint", operation) for _ in range(5)))
+    #ACT
+    results = asyncio.run(run())
+    #ASSERT
+    assert len(calls) == 1
+    assert [result for result, _ in results] == ["created"] * 5
+    assert sum(replayed for _, replayed in results) == 4
+
+
+def test_idempotency_store_duplicate_runs_operation_when_original_is_cancelled():
+    #ARRANGE
+    calls = []
+    async def operation():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "created"
+    async def run():
+        idempotency_store = IdempotencyStore()
+        original = asyncio.create_task(idempotency_store.run("user", "key", "fingerprint", operation))
+        await asyncio.sleep(0)
+        duplicate = asyncio.create_task(idempotency_store.run("user", "key", "fingerprint", operation))
+        await asyncio.sleep(0)
+        original.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await original
+        return await duplicate
+    #ACT
+    result = asyncio.run(run())
+    #ASSERT
+    assert result == ("created", False)
+    assert len(calls) == 2
+
+
+def test_idempotency_store_rejects_key_reuse_with_different_request():
+    #ARRANGE
+    async def operation():
+        return "created"
+    async def run():
+        idempotency_store = IdempotencyStore()
+        await idempotency_store.run("user", "key", request_fingerprint("POST", "/products", {"name":"a"}), operation)
+        await idempotency_store.run("user", "key", request_fingerprint("POST", "/products", {"name":"b"}), operation)
+    #ACT / ASSERT
+    with pytest.raises(IdempotencyKeyConflictError):
+        asyncio.run(run())
+
+
+def test_idempotency_store_forgets_microservice_failures_and_expired_keys():
+    #ARRANGE
+    async def failing_operation():
+        raise HTTPException(status_code=503, detail="Request to microservice failed")
+    async def operation():
+        return "created"
+    async def run():
+        idempotency_store = IdempotencyStore(ttl=0)
+        with pytest.raises(HTTPException):
+            await idempotency_store.run("user", "failing key", "fingerprint", failing_operation)
+        after_failure = await idempotency_store.run("user", "failing key", "fingerprint", operation)
+        await idempotency_store.run("user", "expiring key", "fingerprint", operation)
+        after_expiry = await idempotency_store.run("user", "expiring key", "fingerprint", operation)
+        return after_failure, after_expiry
+    #ACT
+    after_failure, after_expiry = asyncio.run(run())
+    #ASSERT
+    assert after_failure == ("created", False)
+    assert after_expiry == ("created", False)
+
+
+def test_post_product_endpoint_fails_invalid_idempotency_key():
+    #ARRANGE
+    client = TestClient(app)
+    jwt_encoder = JwtEncoder(config("JWT_SECRET"), "HS256")
+    token = jwt_encoder.generate_jwt({
+        "userId":"idempotency-test-user",
+        "exp":datetime.now().timestamp()+60,
+        "aud":"kbe-aw2022-frontend.netlify.app",
+        "iss":"cs-identity-provider.deta.dev"
+    })
+    auth_cookie = {
+          "token": token
+    }
+    test_product = {
+        "name":"test product",
+        "description":"test product description",
+        "componentIds":[]
+    }
+    #ACT
+    response = client.post("/products", json=test_product, headers={"Idempotency-Key":"x"*256}, cookies=auth_cookie)
+    #ASSERT
+    assert response.status_code == 422
+    assert response.json() == {"detail":"Invalid idempotency key"}
@@ -1,8 +1,10 @@
+import asyncio
 from fastapi.testclient import TestClient
 from fastapi import status
 from decouple import config
 from modules.jwt.jwt_module import JwtEncoder
 from main import app
+from routes.identity_provider import identity_provider_users_routes
 
 
 def test_get_user_endpoint_returns_user_data():
@@ -309,4 +311,43 @@ def test_delete_user_endpoint_deletes_user_favorites_obj():
     get_favorites_obj_response = client.get("/favorites", json={"ownerId":new_user_id}, cookies=auth_cookie)
     #ASSERT
     assert delete_user_response.status_code == 204
-    assert delete_user_response.status_code == 204
\ No newline at end of file
+    assert delete_user_response.status_code == 204
+
+def test_delete_user_endpoint_retries_failed_favorites_cleanup(monkeypatch):
+    #ARRANGE
+    JWT_SECRET = config("JWT_SECRET")
+    jwt_aud="kbe-aw2022-frontend.netlify.app"
+    jwt_iss="cs-identity-provider.deta.dev"
+    jwt_encoder = JwtEncoder(JWT_SECRET, "HS256")
+    client = TestClient(app)
+    test_user = {
+        "first_name":"test",
+        "last_name":"test",
+        "user_name":"test_usr3",
+        "email":"test@test.com",
+        "password":"testtesttest4"
+    }
+    new_user_response = client.post("/register",json=test_user)
+    new_user_token = new_user_response.cookies.get("token")
+    new_user_id = jwt_encoder.decode_jwt(token=new_user_token,audience=jwt_aud,issuer=jwt_iss)["userId"]
+    auth_cookie = {
+          "token": new_user_token
+    }
+    retried_user_ids = []
+    delete_favorites_obj = identity_provider_users_routes.delete_favorites_obj
+
+    async def failing_delete_favorites_obj(user_id):
+        return False
+
+    def retry_favorites_cleanup(user_id):
+        retried_user_ids.append(user_id)
+        return asyncio.sleep(0)
+    monkeypatch.setattr(identity_provider_users_routes, "delete_favorites_obj", failing_delete_favorites_obj)
+    monkeypatch.setattr(identity_provider_users_routes, "retry_favorites_cleanup", retry_favorites_cleanup)
+    #ACT
+    delete_user_response = client.delete("/users", json={"password":"testtesttest4"}, cookies=auth_cookie)
+    #ASSERT
+    assert delete_user_response.status_code == 204
+    assert retried_user_ids == [new_user_id]
+    #CLEANUP
+    asyncio.run(delete_favorites_obj(new_user_id))
@@ -328,3 +328,36 @@ def test_update_user_data_endpoint_fails_email_invalid():
     assert response.status_code == 422
     #CLEANUP
     client.delete("/users", json={"password":"testtesttest4"}, cookies=auth_cookie)
+
+
+def test_get_user_endpoint_returns_updated_data_after_cached_read():
+    #ARRANGE
+    client = TestClient(app)
+    test_user = {
+        "first_name":"test",
+        "last_name":"test",
+        "user_name":"test_usr3",
+        "email":"test@test.com",
+        "password":"testtesttest4"
+    }
+    updated_test_user = {
+        "first_name":"updated",
+        "last_name":"updated",
+        "user_name":"test_usr3",
+        "email":"updated@test.com",
+        "password":"testtesttest4"
+    }
+    new_user_response = client.post("/register",json=test_user)
+    auth_cookie = {
+        "token": new_user_response.cookies.get("token")
+    }
+    user_before_update = client.get(f"/users", cookies=auth_cookie).json()
+    #ACT
+    client.patch(f"/users", json=updated_test_user, cookies=auth_cookie)
+    user_after_update = client.get(f"/users", cookies=auth_cookie).json()
+    #ASSERT
+    assert user_before_update["firstName"] == "test"
+    assert user_after_update["firstName"] == "updated"
+    assert user_after_update["email"] == "updated@test.com"
+    #CLEANUP
+    client.delete("/users", json={"password":"testtesttest4"}, cookies=auth_cookie)
@@ -0,0 +1,128 @@
+import asyncio
+from modules.lru_cache.lru_cache import LruCache
+
+
+def test_lru_cache_evicts_least_recently_used_entry():
+    #ARRANGE
+    cache = LruCache("test", max_entries=2)
+    cache.set("a", [1])
+    cache.set("b", [2])
+    #ACT
+    cache.get("a")
+    cache.set("c", [3])
+    #ASSERT
+    assert cache.get("a") == [1]
+    assert cache.get("b") is None
+    assert cache.get("c") == [3]
+    assert cache.evictions == 1
+
+
+def test_lru_cache_is_bounded_by_bytes():
+    #ARRANGE
+    cache = LruCache("test", max_bytes=20, sizeof=len)
+    #ACT
+    cache.set("a", "x" * 10)
+    cache.set("b", "x" * 10)
+    cache.set("c", "x" * 5)
+    cache.set("too big", "x" * 21)
+    #ASSERT
+    assert cache.get("a") is None
+    assert cache.get("too big") is None
+    assert cache.bytes == 15
+    assert len(cache) == 2
+
+
+def test_lru_cache_expires_entries_after_ttl():
+    #ARRANGE
+    cache = LruCache("test", ttl=0)
+    #ACT
+    cache.set("a", [1])
+    #ASSERT
+    assert cache.get("a") is None
+    assert cache.bytes == 0
+
+
+def test_lru_cache_update_changes_cached_value_only():
+    #ARRANGE
+    cache = LruCache("test")
+    cache.set("a", [1])
+    #ACT
+    cache.update("a", lambda value: [*value, 2])
+    cache.update("b", lambda value: [*value, 2])
+    #ASSERT
+    assert cache.get("a") == [1, 2]
+    assert cache.get("b") is None
+
+
+def test_lru_cache_get_or_load_discards_load_invalidated_while_in_flight():
+    #ARRANGE
+    cache = LruCache("test")
+    loads = []
+
+    async def load():
+        loads.append(1)
+        await asyncio.sleep(0.01)
+        return ["old"]
+
+    async def run():
+        load_task = asyncio.create_task(cache.get_or_load("a", load))
+        await asyncio.sleep(0)
+        cache.invalidate("a")
+        loaded = await load_task
+        return loaded, await cache.get_or_load("a", load)
+    #ACT
+    first, second = asyncio.run(run())
+    #ASSERT
+    assert first == ["old"]
+    assert second == ["old"]
+    assert len(loads) == 2
+
+
+def test_lru_cache_reconcile_reloads_entries_changed_in_place():
+    #ARRANGE
+    source = {"a": ["upstream"]}
+
+    async def load(key):
+        return source[key]
+    cache = LruCache("test", reconcile_loader=load, reconcile_interval=0.01)
+    cache.set("a", ["upstream"])
+    cache.update("a", lambda value: [*value, "local"])
+    cache.get("a")
+
+    async def run():
+        cache.start()
+        await asyncio.sleep(0.05)
+        await cache.stop()
+    #ACT
+    asyncio.run(run())
+    #ASSERT
+    assert cache.get("a") == ["upstream"]
+    assert cache.corrections == 1
+
+
+def test_lru_cache_reconcile_reloads_only_read_entries_until_they_expire():
+    #ARRANGE
+    reloads = []
+
+    async def load(key):
+        reloads.append(key)
+        return key
+    cache = LruCache("test", ttl=0.1, reconcile_loader=load, reconcile_interval=0.01)
+    cache.set("read", "read")
+    cache.set("unread", "unread")
+
+    async def run():
+        cache.start()
+        reads = []
+        for _ in range(20):
+            reads.append(cache.get("read"))
+            await asyncio.sleep(0.01)
+        await cache.stop()
+        return reads
+    #ACT
+    reads = asyncio.run(run())
+    #ASSERT
+    assert reads[0] == "read"
+    assert reads[-1] is None
+    assert "read" in reloads
+    assert "unread" not in reloads
@@ -0,0 +1,72 @@
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from decouple import config
+from main import app
+from routes import me_routes
+
+
+def test_get_me_endpoint_returns_user_data_products_and_favorites():
+    #ARRANGE
+    client = TestClient(app)
+    TEST_USER_ID = config("TEST_USER_ID")
+    VALID_TOKEN = config("VALID_TOKEN")
+    auth_cookie = {
+          "token": VALID_TOKEN
+    }
+    expected_user_data = {
+        "firstName":"test",
+        "lastName":"test",
+        "userName":"test_usr",
+        "email":"test@test.com",
+    }
+    #ACT
+    response = client.get("/me", cookies=auth_cookie)
+    #ASSERT
+    assert response.status_code == 200
+    assert response.json()["user"] == expected_user_data
+    assert response.json()["favorites"]["ownerId"] == TEST_USER_ID
+    assert isinstance(response.json()["products"], list)
+    assert response.json()["errors"] == {}
+
+
+def test_get_me_endpoint_returns_partial_result_if_a_microservice_fails(monkeypatch):
+    #ARRANGE
+    client = TestClient(app)
+    VALID_TOKEN = config("VALID_TOKEN")
+    auth_cookie = {
+          "token": VALID_TOKEN
+    }
+    async def fetch_user_data(user_id):
+        return {"firstName":"test", "lastName":"test", "userName":"test_usr", "email":"test@test.com"}
+    async def fetch_favorites(user_id):
+        return {"ownerId":user_id, "componentIds":[], "productIds":[]}
+    async def fetch_products(user_id):
+        raise HTTPException(status_code=503, detail="Request to microservice failed")
+    monkeypatch.setattr(me_routes, "decode_auth_token", lambda token: {"userId":"me-test-user"})
+    monkeypatch.setattr(me_routes, "fetch_user_data", fetch_user_data)
+    monkeypatch.setattr(me_routes, "fetch_favorites", fetch_favorites)
+    monkeypatch.setattr(me_routes, "fetch_products", fetch_products)
+    expected_errors = {
+        "products": {"statusCode":503, "detail":"Request to microservice failed"}
+    }
+    #ACT
+    response = client.get("/me", cookies=auth_cookie)
+    #ASSERT
+    assert response.status_code == 200
+    assert response.json()["user"]["userName"] == "test_usr"
+    assert response.json()["favorites"]["ownerId"] == "me-test-user"
+    assert response.json()["products"] is None
+    assert response.json()["errors"] == expected_errors
+
+
+def test_get_me_endpoint_fails_invalid_token():
+    #ARRANGE
+    client = TestClient(app)
+    auth_cookie = {
+          "token": "invalid_token"
+    }
+    #ACT
+    response = client.get("/me", cookies=auth_cookie)
+    #ASSERT
+    assert response.status_code == 403
+    assert response.json() == {"detail":"Invalid token"}
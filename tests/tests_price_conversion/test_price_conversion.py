@@ -0,0 +1,44 @@
+from modules.price_conversion.price_conversion import ConvertedPriceCache, convert_prices
+
+
+def test_convert_prices_rounds_and_keeps_other_fields():
+    #ARRANGE
+    components = [{"id":"a", "price":559.0}, {"id":"b", "price":""}]
+    #ACT
+    converted = convert_prices(components, 1.0309)
+    #ASSERT
+    assert converted == [{"id":"a", "price":576.27}, {"id":"b", "price":0.0}]
+    assert components[0]["price"] == 559.0
+
+
+def test_converted_price_cache_reuses_conversion_until_list_or_rate_changes():
+    #ARRANGE
+    converted_price_cache = ConvertedPriceCache()
+    components = [{"id":"a", "price":10.0}]
+    refreshed_components = [{"id":"a", "price":20.0}]
+    #ACT
+    first = converted_price_cache.get("USD", components, 2.0)
+    cached = converted_price_cache.get("USD", components, 2.0)
+    new_rate = converted_price_cache.get("USD", components, 3.0)
+    refreshed = converted_price_cache.get("USD", refreshed_components, 3.0)
+    #ASSERT
+    assert cached is first
+    assert new_rate == [{"id":"a", "price":30.0}]
+    assert refreshed == [{"id":"a", "price":60.0}]
+
+
+def test_converted_price_cache_keeps_one_copy_per_key():
+    #ARRANGE
+    converted_price_cache = ConvertedPriceCache(max_entries=2)
+    products = [{"id":"a", "price":10.0}]
+    other_products = [{"id":"b", "price":5.0}]
+    #ACT
+    first = converted_price_cache.get(("user", "USD"), products, 2.0)
+    other_first = converted_price_cache.get(("other user", "USD"), other_products, 2.0)
+    cached = converted_price_cache.get(("user", "USD"), products, 2.0)
+    converted_price_cache.get(("user", "GBP"), products, 0.5)
+    evicted = converted_price_cache.get(("other user", "USD"), other_products, 2.0)
+    #ASSERT
+    assert cached is first
+    assert evicted is not other_first
+    assert evicted == [{"id":"b", "price":10.0}]
@@ -260,4 +260,79 @@ def test_delete_product_endpoint_fails_invalid_token():
     del_response = client.delete("/products/some_product_id",cookies=auth_cookie)
     #ASSERT
     assert del_response.status_code == 403
-    assert del_response.json() == expected_error
\ No newline at end of file
+    assert del_response.json() == expected_error
+
+
+def test_price_preview_endpoint_returns_price_of_components():
+    #ARRANGE
+    client = TestClient(app)
+    VALID_TOKEN = config("VALID_TOKEN")
+    price_preview = {
+        "componentIds":["546c08d7-539d-11ed-a980-cd9f67f7363d","546c08da-539d-11ed-a980-cd9f67f7363d"]
+    }
+    auth_cookie = {
+          "token": VALID_TOKEN
+    }
+    #ACT
+    response = client.post("/products/price-preview", json=price_preview, cookies=auth_cookie)
+    #ASSERT
+    assert response.status_code == 200
+    assert response.json() == {"price":638.9, "currency":"EUR"}
+
+
+def test_price_preview_endpoint_fails_unknown_component():
+    #ARRANGE
+    client = TestClient(app)
+    VALID_TOKEN = config("VALID_TOKEN")
+    price_preview = {
+        "componentIds":["546c08d7-539d-11ed-a980-cd9f67f7363d","unknown"]
+    }
+    auth_cookie = {
+          "token": VALID_TOKEN
+    }
+    #ACT
+    response = client.post("/products/price-preview", json=price_preview, cookies=auth_cookie)
+    #ASSERT
+    assert response.status_code == 422
+    assert response.json() == {"detail":"Unknown components: unknown"}
+
+
+def test_price_preview_endpoint_fails_invalid_token():
+    #ARRANGE
+    client = TestClient(app)
+    price_preview = {
+        "componentIds":["546c08d7-539d-11ed-a980-cd9f67f7363d"]
+    }
+    auth_cookie = {
+          "token": "invalid token"
+    }
+    #ACT
+    response = client.post("/products/price-preview", json=price_preview, cookies=auth_cookie)
+    #ASSERT
+    assert response.status_code == 403
+    assert response.json() == {"detail":"Invalid token"}
+
+
+def test_get_products_endpoint_reflects_products_created_and_deleted_after_listing():
+    #ARRANGE
+    client = TestClient(app)
+    VALID_TOKEN = config("VALID_TOKEN")
+    test_product = {
+        "name":"test new product",
+        "componentIds":["546c08d7-539d-11ed-a980-cd9f67f7363d","546c08da-539d-11ed-a980-cd9f67f7363d"],
+        "description":"new product from post request",
+    }
+    auth_cookie = {
+          "token": VALID_TOKEN
+    }
+    client.get("/products", cookies=auth_cookie)
+    #ACT
+    product_id = client.post("/products",json=test_product, cookies=auth_cookie).json()["id"]
+    products_after_post = client.get("/products", cookies=auth_cookie).json()
+    single_product_response = client.get(f"/products/{product_id}", cookies=auth_cookie)
+    client.delete(f"/products/{product_id}",cookies=auth_cookie)
+    products_after_delete = client.get("/products", cookies=auth_cookie).json()
+    #ASSERT
+    assert product_id in [product["id"] for product in products_after_post]
+    assert single_product_response.status_code == 200
+    assert product_id not in [product["id"] for product in products_after_delete]
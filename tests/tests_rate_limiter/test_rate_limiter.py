@@ -0,0 +1,69 @@
+from fastapi.testclient import TestClient
+from modules.rate_limiter.rate_limiter import TokenBucketRateLimiter, parse_rate_limits
+from main import app
+import utils
+
+
+def test_token_bucket_allows_burst_then_limits():
+    #ARRANGE
+    rate_limiter = TokenBucketRateLimiter(rate=0.5, burst=2)
+    #ACT
+    results = [rate_limiter.acquire("user:1") for _ in range(3)]
+    other_key_result = rate_limiter.acquire("user:2")
+    #ASSERT
+    assert results[:2] == [0.0, 0.0]
+    assert 0 < results[2] <= 2
+    assert other_key_result == 0.0
+
+
+def test_token_bucket_evicts_least_recently_used_keys():
+    #ARRANGE
+    rate_limiter = TokenBucketRateLimiter(rate=1, burst=1, max_keys=2)
+    #ACT
+    for key in ("a", "b", "c"):
+        rate_limiter.acquire(key)
+    #ASSERT
+    assert len(rate_limiter) == 2
+
+
+def test_parse_rate_limits():
+    #ACT
+    limits = parse_rate_limits("products=10/30, auth=1/5")
+    #ASSERT
+    assert limits == {"products":(10.0, 30.0), "auth":(1.0, 5.0)}
+
+
+def test_rate_limited_route_returns_too_many_requests(monkeypatch):
+    #ARRANGE
+    client = TestClient(app)
+    monkeypatch.setitem(utils.rate_limiters, "products", TokenBucketRateLimiter(rate=0.01, burst=2))
+    auth_cookie = {
+          "token": "invalid token"
+    }
+    #ACT
+    responses = [client.get("/products", cookies=auth_cookie) for _ in range(3)]
+    #ASSERT
+    assert [response.status_code for response in responses[:2]] == [403, 403]
+    assert responses[2].status_code == 429
+    assert responses[2].json() == {"detail":"Too many requests"}
+    assert int(responses[2].headers["retry-after"]) >= 1
+
+
+def test_rate_limited_route_decodes_auth_token_once(monkeypatch):
+    #ARRANGE
+    client = TestClient(app)
+    monkeypatch.setitem(utils.rate_limiters, "products", TokenBucketRateLimiter(rate=10, burst=10))
+    decoded_tokens = []
+    decode_jwt = utils.jwt_encoder.decode_jwt
+    def counting_decode_jwt(**kwargs):
+        decoded_tokens.append(kwargs["token"])
+        return decode_jwt(**kwargs)
+    monkeypatch.setattr(utils.jwt_encoder, "decode_jwt", counting_decode_jwt)
+    auth_cookie = {
+          "token": "invalid token"
+    }
+    #ACT
+    response = client.get("/products", cookies=auth_cookie)
+    #ASSERT
+    assert response.status_code == 403
+    assert decoded_tokens == ["invalid token"]
@@ -0,0 +1,49 @@
+from fastapi.testclient import TestClient
+from main import app
+import utils
+
+TEST_DEBUG_ACCESS_KEY = "test-debug-access-key"
+
+
+def test_server_timing_header_is_added_when_requested(monkeypatch):
+    #ARRANGE
+    client = TestClient(app)
+    monkeypatch.setattr(utils, "DEBUG_ACCESS_KEY", TEST_DEBUG_ACCESS_KEY)
+    auth_cookie = {
+          "token": "invalid_token"
+    }
+    #ACT
+    response = client.get("/products", cookies=auth_cookie, headers={"serverTiming":TEST_DEBUG_ACCESS_KEY})
+    #ASSERT
+    assert response.status_code == 403
+    server_timing = response.headers["Server-Timing"]
+    assert "auth;dur=" in server_timing
+    assert "validate;dur=" in server_timing
+    assert "total;dur=" in server_timing
+
+
+def test_server_timing_header_is_omitted_by_default():
+    #ARRANGE
+    client = TestClient(app)
+    auth_cookie = {
+          "token": "invalid_token"
+    }
+    #ACT
+    response = client.get("/products", cookies=auth_cookie)
+    #ASSERT
+    assert response.status_code == 403
+    assert "Server-Timing" not in response.headers
+
+
+def test_server_timing_header_is_omitted_without_valid_debug_access_key(monkeypatch):
+    #ARRANGE
+    client = TestClient(app)
+    monkeypatch.setattr(utils, "DEBUG_ACCESS_KEY", TEST_DEBUG_ACCESS_KEY)
+    auth_cookie = {
+          "token": "invalid_token"
+    }
+    #ACT
+    response = client.get("/products", cookies=auth_cookie, headers={"serverTiming":"true"})
+    #ASSERT
+    assert response.status_code == 403
+    assert "Server-Timing" not in response.headers
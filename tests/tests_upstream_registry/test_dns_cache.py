@@ -0,0 +1,107 @@
+import asyncio
+import pytest
+import dns.exception
+import dns.resolver
+import httpcore
+from modules.upstream.dns_cache import DnsCache, CachingDnsNetworkBackend
+
+
+class Record():
+    def __init__(self, address):
+        self.address = address
+
+class Answer(list):
+    def __init__(self, addresses, ttl):
+        super().__init__(Record(address) for address in addresses)
+        self.rrset = type("RRset", (), {"ttl": ttl})()
+
+class Resolver():
+    def __init__(self, answers, ipv6_answers=None):
+        self.answers = {"A": answers, "AAAA": ipv6_answers or []}
+        self.queries = []
+    async def resolve(self, host, record_type, lifetime):
+        self.queries.append((host, record_type))
+        if not self.answers[record_type]:
+            raise dns.resolver.NoAnswer()
+        answer = self.answers[record_type].pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+def test_dns_cache_keeps_addresses_for_their_ttl():
+    #ARRANGE
+    resolver = Resolver([Answer(["10.0.0.1", "10.0.0.2"], ttl=60)])
+    dns_cache = DnsCache(resolver=resolver)
+    async def run():
+        return [await dns_cache.resolve("cs-product-service.deta.dev") for _ in range(3)], await dns_cache.resolve("127.0.0.1")
+    #ACT
+    addresses, ip_address = asyncio.run(run())
+    #ASSERT
+    assert addresses == [["10.0.0.1", "10.0.0.2"]] * 3
+    assert ip_address == ["127.0.0.1"]
+    assert resolver.queries == [("cs-product-service.deta.dev", "A"), ("cs-product-service.deta.dev", "AAAA")]
+    assert dns_cache.stats()["cs-product-service.deta.dev"]["ttlSeconds"] == 60
+
+
+def test_dns_cache_serves_stale_addresses_when_resolver_fails():
+    #ARRANGE
+    resolver = Resolver([Answer(["10.0.0.1"], ttl=1), dns.exception.Timeout()])
+    dns_cache = DnsCache(min_ttl=0, max_ttl=0, resolver=resolver)
+    async def run():
+        await dns_cache.resolve("cs-product-service.deta.dev")
+        return await dns_cache.resolve("cs-product-service.deta.dev")
+    #ACT
+    addresses = asyncio.run(run())
+    #ASSERT
+    assert addresses == ["10.0.0.1"]
+    assert len(resolver.queries) == 4
+
+
+def test_dns_cache_resolves_ipv4_and_ipv6_addresses():
+    #ARRANGE
+    resolver = Resolver([Answer(["10.0.0.1", "10.0.0.2"], ttl=60)], [Answer(["fd00::1"], ttl=30)])
+    dns_cache = DnsCache(resolver=resolver)
+    #ACT
+    addresses = asyncio.run(dns_cache.resolve("cs-product-service.deta.dev"))
+    #ASSERT
+    assert addresses == ["10.0.0.1", "fd00::1", "10.0.0.2"]
+    assert dns_cache.stats()["cs-product-service.deta.dev"]["ttlSeconds"] == 30
+
+
+def test_caching_dns_backend_tries_next_address_if_connect_fails():
+    #ARRANGE
+    class Backend():
+        def __init__(self):
+            self.connects = []
+        async def connect_tcp(self, host, port, timeout=None, local_address=None):
+            self.connects.append(host)
+            if host == "10.0.0.1":
+                raise httpcore.ConnectError("refused")
+            return f"stream to {host}:{port}"
+    backend = Backend()
+    network_backend = CachingDnsNetworkBackend(DnsCache(resolver=Resolver([Answer(["10.0.0.1", "10.0.0.2"], ttl=60)])), backend)
+    #ACT
+    stream = asyncio.run(network_backend.connect_tcp("cs-product-service.deta.dev", 443))
+    #ASSERT
+    assert stream == "stream to 10.0.0.2:443"
+    assert backend.connects == ["10.0.0.1", "10.0.0.2"]
+
+
+def test_caching_dns_backend_splits_connect_timeout_across_addresses():
+    #ARRANGE
+    class Backend():
+        def __init__(self):
+            self.timeouts = []
+        async def connect_tcp(self, host, port, timeout=None, local_address=None):
+            self.timeouts.append(timeout)
+            await asyncio.sleep(timeout)
+            raise httpcore.ConnectTimeout("timed out")
+    backend = Backend()
+    network_backend = CachingDnsNetworkBackend(DnsCache(resolver=Resolver([Answer(["10.0.0.1", "10.0.0.2"], ttl=60)], [Answer(["fd00::1"], ttl=60)])), backend)
+    #ACT
+    with pytest.raises(httpcore.ConnectTimeout):
+        asyncio.run(network_backend.connect_tcp("cs-product-service.deta.dev", 443, timeout=0.3))
+    #ASSERT
+    assert len(backend.timeouts) == 3
+    assert all(0.05 < timeout <= 0.1 for timeout in backend.timeouts)
@@ -0,0 +1,79 @@
+import asyncio
+import httpx
+from modules.upstream import upstream_client
+
+
+def test_parse_host_max_streams_reads_per_host_limits():
+    #ACT
+    host_max_streams = upstream_client.parse_host_max_streams(" Products.example=50, favorites.example=200,")
+    #ASSERT
+    assert host_max_streams == {"products.example": 50, "favorites.example": 200}
+
+
+def test_max_streams_falls_back_to_default_limit(monkeypatch):
+    #ARRANGE
+    monkeypatch.setattr(upstream_client, "http2_host_max_streams", {"products.example": 5})
+    #ASSERT
+    assert upstream_client.max_streams("products.example") == 5
+    assert upstream_client.max_streams("favorites.example") == upstream_client.UPSTREAM_HTTP2_MAX_STREAMS
+
+
+def test_stream_semaphore_caps_requests_in_flight_per_host(monkeypatch):
+    #ARRANGE
+    monkeypatch.setattr(upstream_client, "http2_host_max_streams", {"products.example": 2})
+    monkeypatch.setattr(upstream_client, "_stream_semaphores", {})
+    in_flight = 0
+    max_in_flight = 0
+
+    async def call():
+        nonlocal in_flight, max_in_flight
+        async with upstream_client.stream_semaphore("https://products.example"):
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+    async def run():
+        await asyncio.gather(*(call() for _ in range(6)))
+    #ACT
+    asyncio.run(run())
+    #ASSERT
+    assert max_in_flight == 2
+    assert upstream_client.stream_semaphore("https://products.example:443/") is upstream_client.stream_semaphore("https://products.example")
+
+
+def test_connection_stats_count_streams_in_flight(monkeypatch):
+    #ARRANGE
+    class Response():
+        status_code = 200
+    class Pool():
+        connections = []
+    class Transport():
+        pool = Pool()
+    class Client():
+        def __init__(self):
+            self.release = asyncio.Event()
+        async def request(self, method, url, **kwargs):
+            await self.release.wait()
+            return Response()
+    client = Client()
+    monkeypatch.setattr(upstream_client, "UPSTREAM_HTTP2_ENABLED", True)
+    monkeypatch.setattr(upstream_client, "_client", client)
+    monkeypatch.setattr(upstream_client, "_transport", Transport())
+    monkeypatch.setattr(upstream_client, "get_client", lambda: client)
+    monkeypatch.setattr(upstream_client, "_stream_semaphores", {})
+    monkeypatch.setattr(upstream_client, "_streams_in_flight", {})
+    host = httpx.URL(upstream_client.upstream_pools["products"].replicas[0].base_url).host
+
+    async def run():
+        requests = [asyncio.create_task(upstream_client.request("products", "GET", "/products")) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        during = upstream_client.connection_stats()["streams"][host]["inFlight"]
+        client.release.set()
+        await asyncio.gather(*requests)
+        return during, upstream_client.connection_stats()["streams"][host]["inFlight"]
+    #ACT
+    during, after = asyncio.run(run())
+    #ASSERT
+    assert during == 3
+    assert after == 0
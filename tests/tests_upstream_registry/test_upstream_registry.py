@@ -0,0 +1,67 @@
+import asyncio
+from modules.upstream.upstream_registry import UpstreamPool, BALANCING_LEAST_OUTSTANDING
+
+
+def test_pool_selects_replica_with_least_outstanding_requests():
+    #ARRANGE
+    upstream_pool = UpstreamPool("products", ["http://a", "http://b", "http://c"], balancing=BALANCING_LEAST_OUTSTANDING)
+    busy_replicas = upstream_pool.replicas[:2]
+    for replica in busy_replicas:
+        upstream_pool.on_request_start(replica)
+    #ACT
+    selected = upstream_pool.select()
+    #ASSERT
+    assert selected.base_url == "http://c"
+
+
+def test_pool_prefers_replica_with_lower_latency():
+    #ARRANGE
+    upstream_pool = UpstreamPool("products", ["http://slow", "http://fast/"])
+    slow_replica, fast_replica = upstream_pool.replicas
+    for replica, rtt in ((slow_replica, 0.5), (fast_replica, 0.05)):
+        upstream_pool.on_request_start(replica)
+        upstream_pool.on_request_end(replica, rtt, failed=False)
+    #ACT
+    selected = [upstream_pool.select().base_url for _ in range(20)]
+    #ASSERT
+    assert selected == ["http://fast"] * 20
+
+
+def test_pool_ejects_failing_replica_but_keeps_at_least_half():
+    #ARRANGE
+    upstream_pool = UpstreamPool("products", ["http://a", "http://b"], failure_threshold=2, ejection_time=60)
+    replica_a, replica_b = upstream_pool.replicas
+    #ACT
+    for replica in (replica_a, replica_a, replica_b, replica_b):
+        upstream_pool.on_request_start(replica)
+        upstream_pool.on_request_end(replica, None, failed=True)
+    selected = {upstream_pool.select().base_url for _ in range(20)}
+    #ASSERT
+    assert selected == {"http://b"}
+    assert not replica_a.stats()["available"]
+    assert replica_b.stats()["available"]
+
+
+def test_pool_health_checks_mark_replicas_and_fall_back_to_all_when_none_is_healthy():
+    #ARRANGE
+    class Response():
+        def __init__(self, status_code):
+            self.status_code = status_code
+    class Client():
+        def __init__(self, status_codes):
+            self.status_codes = status_codes
+        async def get(self, url, timeout):
+            status_code = self.status_codes[url]
+            if status_code is None:
+                raise ConnectionError(url)
+            return Response(status_code)
+    upstream_pool = UpstreamPool("products", ["http://a", "http://b"])
+    #ACT
+    asyncio.run(upstream_pool.check_health(Client({"http://a/docs":200, "http://b/docs":None}), "/docs", 1))
+    partly_healthy = {upstream_pool.select().base_url for _ in range(20)}
+    asyncio.run(upstream_pool.check_health(Client({"http://a/docs":503, "http://b/docs":None}), "/docs", 1))
+    unhealthy = {upstream_pool.select().base_url for _ in range(50)}
+    #ASSERT
+    assert partly_healthy == {"http://a"}
+    assert unhealthy == {"http://a", "http://b"}
+    assert [replica.base_url for replica in upstream_pool.replicas] == ["http://a", "http://b"]
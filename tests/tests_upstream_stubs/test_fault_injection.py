@@ -0,0 +1,45 @@
+import pytest
+from fastapi.testclient import TestClient
+from upstream_stubs.stub_app import create_stub_app
+from upstream_stubs.fault_injection import load_faults
+
+
+def test_error_fault_returns_configured_status(monkeypatch):
+    #ARRANGE
+    monkeypatch.setenv("STUB_FAULTS", '[{"service":"currency", "kind":"error", "status":502}]')
+    client = TestClient(create_stub_app())
+    #ACT
+    currencies_response = client.get("/currencies")
+    components_response = client.get("/components")
+    #ASSERT
+    assert currencies_response.status_code == 502
+    assert components_response.status_code == 200
+
+
+def test_reset_fault_drops_connection_after_headers(monkeypatch):
+    #ARRANGE
+    monkeypatch.setenv("STUB_FAULTS", '[{"service":"components", "kind":"reset"}]')
+    client = TestClient(create_stub_app())
+    #ACT / ASSERT
+    with pytest.raises(ConnectionResetError):
+        client.get("/components")
+
+
+def test_slow_body_fault_keeps_response_intact(monkeypatch):
+    #ARRANGE
+    monkeypatch.setenv("STUB_FAULTS", '[{"service":"components", "kind":"slow_body", "chunk_size":256, "chunk_delay_ms":1}]')
+    client = TestClient(create_stub_app())
+    #ACT
+    response = client.get("/components")
+    #ASSERT
+    assert response.status_code == 200
+    assert len(response.json()) == 100
+
+
+def test_scheduled_fault_is_only_active_inside_its_window():
+    #ARRANGE
+    fault = load_faults('[{"kind":"error", "every_s":10, "for_s":2}]')[0]
+    scope = {"path":"/products", "method":"GET"}
+    #ACT / ASSERT
+    assert fault.applies_to(scope, elapsed=21.0)
+    assert not fault.applies_to(scope, elapsed=25.0)
@@ -0,0 +1,83 @@
+from datetime import datetime,timedelta
+from fastapi.testclient import TestClient
+from decouple import config
+from modules.jwt.jwt_module import JwtEncoder
+from upstream_stubs.stub_app import create_stub_app, StubState, TEST_USER_ID
+from upstream_stubs.stub_settings import StubSettings
+
+JWT_ALGORITHM="HS256"
+
+
+def access_token(access_key_name:str):
+    jwt_encoder = JwtEncoder(secret=config(access_key_name), algorithm=JWT_ALGORITHM)
+    return jwt_encoder.generate_jwt({"exp":(datetime.now() + timedelta(minutes=1)).timestamp()})
+
+
+def test_stub_components_payload_size_is_configurable(monkeypatch):
+    #ARRANGE
+    monkeypatch.setenv("STUB_COMPONENTS_COMPONENT_COUNT", "250")
+    client = TestClient(create_stub_app())
+    #ACT
+    response = client.get("/components")
+    #ASSERT
+    assert response.status_code == 200
+    assert len(response.json()) == 250
+    assert response.json()[0]["id"] == "546c08d7-539d-11ed-a980-cd9f67f7363d"
+
+
+def test_stub_error_rate_returns_service_unavailable(monkeypatch):
+    #ARRANGE
+    monkeypatch.setenv("STUB_ERROR_RATE", "1")
+    client = TestClient(create_stub_app())
+    #ACT
+    response = client.get("/currencies")
+    #ASSERT
+    assert response.status_code == 503
+
+
+def test_stub_login_returns_token_for_seeded_user():
+    #ARRANGE
+    client = TestClient(create_stub_app())
+    headers = {"microserviceAccessToken": access_token("IDENTITY_PROVIDER_ACCESS_KEY")}
+    #ACT
+    response = client.post("/login", json={"user_name":"test_usr", "password":"testtesttest4"}, headers=headers)
+    #ASSERT
+    assert response.status_code == 200
+    assert response.json()["userName"] == "test_usr"
+    assert "token" in response.json()
+
+
+def test_stub_rejects_invalid_microservice_access_token():
+    #ARRANGE
+    client = TestClient(create_stub_app())
+    headers = {"userId": TEST_USER_ID, "microserviceAccessToken": "invalid_token"}
+    #ACT
+    response = client.get("/products", headers=headers)
+    #ASSERT
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Invalid token"}
+
+
+def test_stub_favorites_toggle_conflicts_on_duplicate_item():
+    #ARRANGE
+    client = TestClient(create_stub_app(state=StubState()))
+    headers = {"userId": TEST_USER_ID, "microserviceAccessToken": access_token("FAVORITES_SERVICE_ACCESS_KEY")}
+    item = {"id":"546c08de-539d-11ed-a980-cd9f67f7363d", "item_type":"component"}
+    #ACT
+    first_response = client.post("/favorites/items", json=item, headers=headers)
+    second_response = client.post("/favorites/items", json=item, headers=headers)
+    #ASSERT
+    assert first_response.status_code == 204
+    assert second_response.status_code == 409
+
+
+def test_stub_settings_fall_back_to_global_values(monkeypatch):
+    #ARRANGE
+    monkeypatch.setenv("STUB_LATENCY_MS", "15")
+    monkeypatch.setenv("STUB_PRODUCTS_LATENCY_MS", "40")
+    #ACT
+    product_settings = StubSettings.from_env("products")
+    favorites_settings = StubSettings.from_env("favorites")
+    #ASSERT
+    assert product_settings.latency_ms == 40
+    assert favorites_settings.latency_ms == 15
@@ -0,0 +1,19 @@
+import argparse
+import os
+import uvicorn
+from upstream_stubs.stub_app import SERVICE_NAMES, create_stub_app
+
+# Serves the stand-in upstream services, e.g.:
+#   STUB_LATENCY_MS=20 python -m upstream_stubs --port 8001
+# and point the gateway at it with IDENTITY_PROVIDER_URL=http://127.0.0.1:8001 (and the other *_URL settings).
+parser = argparse.ArgumentParser(description="Run local stand-ins for the gateway's upstream microservices.")
+parser.add_argument("--host", default="127.0.0.1")
+parser.add_argument("--port", type=int, default=8001)
+parser.add_argument("--services", default=",".join(SERVICE_NAMES), help="comma separated subset of " + ", ".join(SERVICE_NAMES))
+parser.add_argument("--faults", help="JSON fault rules or a file containing them, see upstream_stubs/fault_injection.py")
+parser.add_argument("--log-level", default="warning")
+args = parser.parse_args()
+if args.faults:
+    os.environ["STUB_FAULTS"] = args.faults
+
+uvicorn.run(create_stub_app(services=args.services.split(",")), host=args.host, port=args.port, log_level=args.log_level)
@@ -0,0 +1,91 @@
+import random
+from fastapi import APIRouter, Depends
+from upstream_stubs.stub_settings import StubSettings, simulate_upstream_conditions
+
+FIXTURE_COMPONENTS = [
+    {
+        "id": "546c08d7-539d-11ed-a980-cd9f67f7363d",
+        "name": "AMD Ryzen 9 5950X",
+        "vendor": "notebooksbilliger.de",
+        "price": 559.0,
+        "description": "",
+        "location": "Germany",
+        "manufacturer": "100-100000059WOF",
+        "productGroup": "CPU",
+        "weight": 300.0,
+        "status": "new",
+        "eanNumber": "730143312745"
+    },
+    {
+        "id": "546c08da-539d-11ed-a980-cd9f67f7363d",
+        "name": "Corsair Vengeance LPX 16GB DDR4-3200",
+        "vendor": "notebooksbilliger.de",
+        "price": 79.9,
+        "description": "",
+        "location": "Germany",
+        "manufacturer": "CMK16GX4M2E3200C16",
+        "productGroup": "RAM",
+        "weight": 80.0,
+        "status": "new",
+        "eanNumber": "840006627421"
+    },
+    {
+        "id": "546c08de-539d-11ed-a980-cd9f67f7363d",
+        "name": "Samsung 980 PRO 1TB",
+        "vendor": "notebooksbilliger.de",
+        "price": 129.0,
+        "description": "",
+        "location": "Germany",
+        "manufacturer": "MZ-V8P1T0BW",
+        "productGroup": "SSD",
+        "weight": 9.0,
+        "status": "new",
+        "eanNumber": "8806090295550"
+    },
+]
+
+PRODUCT_GROUPS = ["CPU", "GPU", "RAM", "SSD", "HDD", "PSU", "Mainboard", "Case", "Cooler"]
+
+
+def generate_components(count:int, seed:int=42)->list[dict]:
+    generator = random.Random(seed)
+    components = [dict(component) for component in FIXTURE_COMPONENTS[:count]]
+    for index in range(len(components), count):
+        product_group = generator.choice(PRODUCT_GROUPS)
+        components.append({
+            "id": f"stub-component-{index:06d}",
+            "name": f"Stub {product_group} {index}",
+            "vendor": "stub-vendor",
+            "price": round(generator.uniform(5, 2500), 2),
+            "description": f"Generated {product_group} component for load tests.",
+            "location": "Germany",
+            "manufacturer": f"STUB-{index:06d}",
+            "productGroup": product_group,
+            "weight": round(generator.uniform(5, 5000), 1),
+            "status": "new",
+            "eanNumber": f"{4000000000000 + index}"
+        })
+    return components
+
+
+class ComponentCatalog():
+    def __init__(self, count:int):
+        self.components = generate_components(count)
+        self.components_by_id = {component["id"]: component for component in self.components}
+
+    def price_of(self, component_ids:list[str])->float:
+        return round(sum(self.components_by_id[component_id]["price"] for component_id in component_ids), 2)
+
+
+def create_router(settings:StubSettings, catalog:ComponentCatalog)->APIRouter:
+    router = APIRouter(
+        prefix="/components",
+        tags=["components service stub"],
+        dependencies=[Depends(simulate_upstream_conditions(settings))]
+    )
+
+    @router.get("")
+    async def get_components():
+        return catalog.components
+
+    return router
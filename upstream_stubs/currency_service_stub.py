@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from upstream_stubs.stub_settings import StubSettings, simulate_upstream_conditions
+
+CURRENCIES = [
+    {"code": "EUR", "symbol": "€", "name": "Euro", "country": "European Union", "rateToEur": 1.0},
+    {"code": "USD", "symbol": "$", "name": "United States dollar", "country": "United States", "rateToEur": 0.97},
+    {"code": "GBP", "symbol": "£", "name": "Pound sterling", "country": "United Kingdom", "rateToEur": 1.14},
+    {"code": "CHF", "symbol": "Fr.", "name": "Swiss franc", "country": "Switzerland", "rateToEur": 1.02},
+    {"code": "JPY", "symbol": "¥", "name": "Japanese yen", "country": "Japan", "rateToEur": 0.0068},
+    {"code": "COP", "symbol": "$", "name": "Colombian peso", "country": "Colombia", "rateToEur": 0.00021},
+]
+
+
+def create_router(settings:StubSettings, rates_to_eur:dict)->APIRouter:
+    router = APIRouter(
+        prefix="/currencies",
+        tags=["currency service stub"],
+        dependencies=[Depends(simulate_upstream_conditions(settings))]
+    )
+
+    @router.get("")
+    async def get_currencies():
+        return [{key: value for key, value in currency.items() if key != "rateToEur"} for currency in CURRENCIES]
+
+    @router.get("/{old_currency_code}/{new_currency_code}")
+    async def get_exchange_rate(old_currency_code, new_currency_code):
+        if old_currency_code not in rates_to_eur or new_currency_code not in rates_to_eur:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Currency not found")
+        return {"exchangeRate": rates_to_eur[old_currency_code] / rates_to_eur[new_currency_code]}
+
+    return router
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import os
+import random
+from time import monotonic
+from typing import Optional
+from starlette.responses import JSONResponse
+
+SERVICE_PATH_PREFIXES = {
+    "identity": ("/users", "/login"),
+    "products": ("/products",),
+    "favorites": ("/favorites",),
+    "components": ("/components",),
+    "currency": ("/currencies",),
+}
+FAULT_KINDS = ("latency", "error", "reset", "slow_body")
+
+
+class Fault():
+    # One fault rule, e.g. {"service":"favorites", "kind":"latency", "latency_ms":800, "probability":0.05}
+    # or {"service":"identity", "kind":"error", "status":503, "every_s":30, "for_s":5} for a 5 s burst every 30 s.
+    def __init__(self, kind:str, service:Optional[str]=None, method:Optional[str]=None, probability:float=1.0,
+                 every_s:Optional[float]=None, for_s:Optional[float]=None, latency_ms:float=1000.0, status:int=503,
+                 chunk_size:int=512, chunk_delay_ms:float=50.0):
+        if kind not in FAULT_KINDS:
+            raise ValueError(f"Unknown fault kind {kind}, expected one of {FAULT_KINDS}")
+        self.kind = kind
+        self.path_prefixes = SERVICE_PATH_PREFIXES[service] if service else ("",)
+        self.method = method
+        self.probability = probability
+        self.every_s = every_s
+        self.for_s = for_s
+        self.latency_ms = latency_ms
+        self.status = status
+        self.chunk_size = chunk_size
+        self.chunk_delay_ms = chunk_delay_ms
+
+    def applies_to(self, scope, elapsed:float)->bool:
+        if not scope["path"].startswith(self.path_prefixes):
+            return False
+        if self.method is not None and scope["method"] != self.method:
+            return False
+        if self.every_s is not None and elapsed % self.every_s >= (self.for_s or 0):
+            return False
+        return random.random() < self.probability
+
+
+def load_faults(faults_setting:str)->list[Fault]:
+    # The setting is either a JSON list of fault rules or the path of a file containing one.
+    if not faults_setting:
+        return []
+    if os.path.exists(faults_setting):
+        with open(faults_setting) as faults_file:
+            faults_setting = faults_file.read()
+    return [Fault(**fault) for fault in json.loads(faults_setting)]
+
+
+class FaultInjectionMiddleware():
+    def __init__(self, app, faults:list[Fault]):
+        self.app = app
+        self.faults = faults
+        self.started = monotonic()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.faults:
+            await self.app(scope, receive, send)
+            return
+        elapsed = monotonic() - self.started
+        active_faults = [fault for fault in self.faults if fault.applies_to(scope, elapsed)]
+
+        for fault in active_faults:
+            if fault.kind == "latency":
+                await asyncio.sleep(fault.latency_ms / 1000)
+        for fault in active_faults:
+            if fault.kind == "error":
+                await JSONResponse({"detail":"Injected fault"}, status_code=fault.status)(scope, receive, send)
+                return
+        for fault in active_faults:
+            if fault.kind == "reset":
+                send = self._resetting_send(send)
+            elif fault.kind == "slow_body":
+                send = self._slow_body_send(send, fault)
+        await self.app(scope, receive, send)
+
+    def _resetting_send(self, send):
+        # Sends the status line and headers, then drops the connection before the body.
+        async def resetting_send(message):
+            await send(message)
+            if message["type"] == "http.response.start":
+                raise ConnectionResetError("Injected connection reset")
+        return resetting_send
+
+    def _slow_body_send(self, send, fault:Fault):
+        async def slow_body_send(message):
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            chunks = [body[index:index + fault.chunk_size] for index in range(0, len(body), fault.chunk_size)] or [b""]
+            for index, chunk in enumerate(chunks):
+                last_chunk = index == len(chunks) - 1
+                await send({"type":"http.response.body", "body":chunk, "more_body":more_body or not last_chunk})
+                if not last_chunk:
+                    await asyncio.sleep(fault.chunk_delay_ms / 1000)
+        return slow_body_send
@@ -0,0 +1,63 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Body
+from fastapi.responses import Response
+from upstream_stubs.stub_settings import StubSettings, simulate_upstream_conditions, verify_microservice_access_token
+
+ITEM_TYPE_KEYS = {"component": "componentIds", "product": "productIds"}
+
+
+def create_router(settings:StubSettings, favorites:dict, access_key:str)->APIRouter:
+    router = APIRouter(
+        prefix="/favorites",
+        tags=["favorites service stub"],
+        dependencies=[Depends(simulate_upstream_conditions(settings)), Depends(verify_microservice_access_token(access_key))]
+    )
+
+    def get_favorites_or_404(user_id:str)->dict:
+        favorites_obj = favorites.get(user_id)
+        if favorites_obj is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Favorites not found")
+        return favorites_obj
+
+    def item_list(favorites_obj:dict, item:dict)->list:
+        key = ITEM_TYPE_KEYS.get(item.get("item_type"))
+        if key is None:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid item type")
+        return favorites_obj[key]
+
+    @router.get("")
+    async def get_favorites(user_id: Optional[str] = Header(default=None, alias="userId")):
+        return get_favorites_or_404(user_id)
+
+    @router.post("", status_code=status.HTTP_201_CREATED)
+    async def post_favorites(favorites_data:dict = Body(), user_id: Optional[str] = Header(default=None, alias="userId")):
+        if favorites_data.get("ownerId") != user_id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Owner does not match user.")
+        favorites[user_id] = {"ownerId": user_id, "componentIds": [], "productIds": []}
+        return favorites[user_id]
+
+    @router.delete("", status_code=status.HTTP_204_NO_CONTENT)
+    async def delete_favorites(favorites_data:dict = Body(), user_id: Optional[str] = Header(default=None, alias="userId")):
+        if favorites_data.get("ownerId") != user_id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Owner does not match user.")
+        get_favorites_or_404(user_id)
+        del favorites[user_id]
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    @router.post("/items", status_code=status.HTTP_204_NO_CONTENT)
+    async def post_item(item:dict = Body(), user_id: Optional[str] = Header(default=None, alias="userId")):
+        items = item_list(get_favorites_or_404(user_id), item)
+        if item.get("id") in items:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Item is already in favorites list.")
+        items.append(item["id"])
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    @router.delete("/items", status_code=status.HTTP_204_NO_CONTENT)
+    async def delete_item(item:dict = Body(), user_id: Optional[str] = Header(default=None, alias="userId")):
+        items = item_list(get_favorites_or_404(user_id), item)
+        if item.get("id") not in items:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Item is not in favorites list.")
+        items.remove(item["id"])
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    return router
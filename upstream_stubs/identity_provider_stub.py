@@ -0,0 +1,113 @@
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Body
+from fastapi.responses import Response
+from upstream_stubs.stub_settings import StubSettings, JWT_ALGORITHM, simulate_upstream_conditions, verify_microservice_access_token
+from modules.jwt.jwt_module import JwtEncoder
+
+JWT_AUDIENCE="kbe-aw2022-frontend.netlify.app"
+JWT_ISSUER="cs-identity-provider.deta.dev"
+TOKEN_LIFETIME = timedelta(days=1)
+
+
+class UserStore():
+    def __init__(self):
+        self.users_by_id = {}
+        self.user_ids_by_name = {}
+
+    def add(self, user:dict, user_id:Optional[str]=None)->dict:
+        user = dict(user, id=user_id or str(uuid.uuid4()))
+        self.users_by_id[user["id"]] = user
+        self.user_ids_by_name[user["user_name"]] = user["id"]
+        return user
+
+    def get_by_name(self, user_name:str)->Optional[dict]:
+        user_id = self.user_ids_by_name.get(user_name)
+        return self.users_by_id.get(user_id) if user_id else None
+
+    def remove(self, user_id:str):
+        user = self.users_by_id.pop(user_id)
+        self.user_ids_by_name.pop(user["user_name"], None)
+
+
+def user_out(user:dict)->dict:
+    return {
+        "firstName": user["first_name"],
+        "lastName": user["last_name"],
+        "userName": user["user_name"],
+        "email": user["email"],
+    }
+
+
+def create_router(settings:StubSettings, user_store:UserStore, jwt_secret:str, access_key:str)->APIRouter:
+    jwt_encoder = JwtEncoder(secret=jwt_secret, algorithm=JWT_ALGORITHM)
+    router = APIRouter(
+        tags=["identity provider stub"],
+        dependencies=[Depends(simulate_upstream_conditions(settings)), Depends(verify_microservice_access_token(access_key))]
+    )
+
+    def auth_response(user:dict)->dict:
+        exp = (datetime.now() + TOKEN_LIFETIME).timestamp()
+        token = jwt_encoder.generate_jwt({
+            "userId": user["id"],
+            "userName": user["user_name"],
+            "exp": exp,
+            "aud": JWT_AUDIENCE,
+            "iss": JWT_ISSUER,
+        })
+        return {"token": token, "userName": user["user_name"], "exp": str(exp)}
+
+    def get_user_or_404(user_id:str)->dict:
+        user = user_store.users_by_id.get(user_id)
+        if user is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+        return user
+
+    @router.post("/users", status_code=status.HTTP_201_CREATED)
+    async def post_user(user_data:dict = Body()):
+        if user_store.get_by_name(user_data.get("user_name")) is not None:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="User name is already taken")
+        return auth_response(user_store.add(user_data))
+
+    @router.post("/login")
+    async def login(credentials:dict = Body()):
+        user = user_store.get_by_name(credentials.get("user_name"))
+        if user is None or user["password"] != credentials.get("password"):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid credentials")
+        return auth_response(user)
+
+    @router.get("/users/{user_id}")
+    async def get_user(user_id):
+        return user_out(get_user_or_404(user_id))
+
+    @router.patch("/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
+    async def patch_user(user_id, user_updates:dict = Body()):
+        user = get_user_or_404(user_id)
+        if user["password"] != user_updates.get("password"):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid password")
+        other_user = user_store.get_by_name(user_updates.get("user_name"))
+        if other_user is not None and other_user["id"] != user_id:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="User name is already taken")
+        user_store.user_ids_by_name.pop(user["user_name"], None)
+        user.update({key: value for key, value in user_updates.items() if key != "password"})
+        user_store.user_ids_by_name[user["user_name"]] = user_id
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    @router.patch("/users/{user_id}/password", status_code=status.HTTP_204_NO_CONTENT)
+    async def patch_password(user_id, change_password_data:dict = Body()):
+        user = get_user_or_404(user_id)
+        if user["password"] != change_password_data.get("password"):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid password")
+        user["password"] = change_password_data["new_password"]
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    @router.delete("/users", status_code=status.HTTP_204_NO_CONTENT)
+    async def delete_user(password_data:dict = Body(), user_id: Optional[str] = Header(default=None, alias="userId")):
+        user = user_store.users_by_id.get(user_id)
+        if user is None or user["password"] != password_data.get("password"):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid password")
+        user_store.remove(user_id)
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    return router
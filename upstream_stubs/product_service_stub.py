@@ -0,0 +1,74 @@
+import uuid
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Body
+from fastapi.responses import Response
+from upstream_stubs.stub_settings import StubSettings, simulate_upstream_conditions, verify_microservice_access_token
+from upstream_stubs.components_service_stub import ComponentCatalog
+
+
+def create_router(settings:StubSettings, products:dict, catalog:ComponentCatalog, access_key:str)->APIRouter:
+    router = APIRouter(
+        prefix="/products",
+        tags=["product service stub"],
+        dependencies=[Depends(simulate_upstream_conditions(settings)), Depends(verify_microservice_access_token(access_key))]
+    )
+
+    def product_out(product:dict)->dict:
+        return {key: value for key, value in product.items() if key != "ownerId"}
+
+    def validate_product(product_data:dict):
+        unknown_component_ids = [component_id for component_id in product_data.get("component_ids", []) if component_id not in catalog.components_by_id]
+        if unknown_component_ids:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Unknown components: {unknown_component_ids}")
+
+    def get_owned_product(product_id:str, user_id:str)->dict:
+        product = products.get(product_id)
+        if product is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found.")
+        if product["ownerId"] != user_id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User is not the owner of the product.")
+        return product
+
+    @router.get("")
+    async def get_products(user_id: Optional[str] = Header(default=None, alias="userId")):
+        return [product_out(product) for product in products.values() if product["ownerId"] == user_id]
+
+    @router.get("/{product_id}")
+    async def get_product(product_id, user_id: Optional[str] = Header(default=None, alias="userId")):
+        return product_out(get_owned_product(product_id, user_id))
+
+    @router.post("", status_code=status.HTTP_201_CREATED)
+    async def post_product(product_data:dict = Body(), user_id: Optional[str] = Header(default=None, alias="userId")):
+        if product_data.get("ownerId") != user_id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Owner does not match user.")
+        validate_product(product_data)
+        product = {
+            "id": str(uuid.uuid4()),
+            "name": product_data["name"],
+            "description": product_data["description"],
+            "componentIds": product_data["component_ids"],
+            "price": catalog.price_of(product_data["component_ids"]),
+            "ownerId": user_id,
+        }
+        products[product["id"]] = product
+        return product_out(product)
+
+    @router.patch("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
+    async def patch_product(product_id, product_data:dict = Body(), user_id: Optional[str] = Header(default=None, alias="userId")):
+        product = get_owned_product(product_id, user_id)
+        validate_product(product_data)
+        product.update({
+            "name": product_data["name"],
+            "description": product_data["description"],
+            "componentIds": product_data["component_ids"],
+            "price": catalog.price_of(product_data["component_ids"]),
+        })
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
+    async def delete_product(product_id, user_id: Optional[str] = Header(default=None, alias="userId")):
+        get_owned_product(product_id, user_id)
+        del products[product_id]
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    return router
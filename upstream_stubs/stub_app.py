@@ -0,0 +1,61 @@
+from decouple import config
+from fastapi import FastAPI
+from upstream_stubs import identity_provider_stub, product_service_stub, favorites_service_stub, components_service_stub, currency_service_stub
+from upstream_stubs.stub_settings import StubSettings
+from upstream_stubs.fault_injection import FaultInjectionMiddleware, load_faults
+
+SERVICE_NAMES = ["identity", "products", "favorites", "components", "currency"]
+
+TEST_USER_ID = config("TEST_USER_ID", default="stub-test-user")
+DUMMY_ACCOUNT_USER_ID = config("DUMMY_ACCOUNT_USER_ID", default="stub-dummy-user")
+TEST_PRODUCT_ID = "29f6f518-53a8-11ed-a980-cd9f67f7363d"
+
+
+class StubState():
+    # In-memory data shared by the stub services, seeded with the fixtures the gateway tests expect.
+    def __init__(self, component_count:int=100):
+        self.catalog = components_service_stub.ComponentCatalog(component_count)
+        self.users = identity_provider_stub.UserStore()
+        self.products = {}
+        self.favorites = {}
+        self.rates_to_eur = {currency["code"]: currency["rateToEur"] for currency in currency_service_stub.CURRENCIES}
+        self._seed()
+
+    def _seed(self):
+        test_user = self.users.add({"first_name":"test", "last_name":"test", "user_name":"test_usr", "email":"test@test.com", "password":"testtesttest4"}, user_id=TEST_USER_ID)
+        dummy_user = self.users.add({"first_name":"dummy", "last_name":"account", "user_name":"dummy_usr", "email":"dummy@test.com", "password":"dummydummy1"}, user_id=DUMMY_ACCOUNT_USER_ID)
+        fixture_component_ids = [component["id"] for component in components_service_stub.FIXTURE_COMPONENTS[:2]]
+        self.products[TEST_PRODUCT_ID] = {
+            "id": TEST_PRODUCT_ID,
+            "name": "test product",
+            "description": "test product for get method",
+            "componentIds": fixture_component_ids,
+            "price": self.catalog.price_of(fixture_component_ids),
+            "ownerId": test_user["id"],
+        }
+        for user in (test_user, dummy_user):
+            self.favorites[user["id"]] = {"ownerId": user["id"], "componentIds": [], "productIds": []}
+        self.favorites[test_user["id"]]["componentIds"] = list(fixture_component_ids)
+
+
+def create_stub_app(services:list[str]=SERVICE_NAMES, state:StubState=None)->FastAPI:
+    settings = {service_name: StubSettings.from_env(service_name) for service_name in SERVICE_NAMES}
+    state = state or StubState(component_count=settings["components"].component_count)
+    app = FastAPI(title="cs-api-gateway upstream stubs")
+    app.state.stub_state = state
+
+    if "identity" in services:
+        app.include_router(identity_provider_stub.create_router(settings["identity"], state.users, config("JWT_SECRET"), config("IDENTITY_PROVIDER_ACCESS_KEY")))
+    if "products" in services:
+        app.include_router(product_service_stub.create_router(settings["products"], state.products, state.catalog, config("PRODUCT_SERVICE_ACCESS_KEY")))
+    if "favorites" in services:
+        app.include_router(favorites_service_stub.create_router(settings["favorites"], state.favorites, config("FAVORITES_SERVICE_ACCESS_KEY")))
+    if "components" in services:
+        app.include_router(components_service_stub.create_router(settings["components"], state.catalog))
+    if "currency" in services:
+        app.include_router(currency_service_stub.create_router(settings["currency"], state.rates_to_eur))
+
+    faults = load_faults(config("STUB_FAULTS", default=""))
+    if faults:
+        app.add_middleware(FaultInjectionMiddleware, faults=faults)
+    return app
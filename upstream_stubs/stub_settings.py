@@ -0,0 +1,47 @@
+import asyncio
+import random
+from typing import Optional
+from decouple import config
+from fastapi import HTTPException, Header, status
+from modules.jwt.jwt_module import JwtEncoder
+
+JWT_ALGORITHM="HS256"
+
+
+class StubSettings():
+    def __init__(self, latency_ms:float=0.0, latency_jitter_ms:float=0.0, error_rate:float=0.0, component_count:int=100):
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        self.component_count = component_count
+
+    @classmethod
+    def from_env(cls, service_name:str):
+        # STUB_<SERVICE>_<SETTING> overrides the global STUB_<SETTING> for a single service.
+        prefix = f"STUB_{service_name.upper()}_"
+        def setting(name, default, cast):
+            return config(prefix + name, default=config("STUB_" + name, default=default, cast=cast), cast=cast)
+        return cls(
+            latency_ms=setting("LATENCY_MS", 0.0, float),
+            latency_jitter_ms=setting("LATENCY_JITTER_MS", 0.0, float),
+            error_rate=setting("ERROR_RATE", 0.0, float),
+            component_count=setting("COMPONENT_COUNT", 100, int),
+        )
+
+
+def simulate_upstream_conditions(settings:StubSettings):
+    async def dependency():
+        latency = settings.latency_ms + random.uniform(0, settings.latency_jitter_ms)
+        if latency > 0:
+            await asyncio.sleep(latency / 1000)
+        if settings.error_rate > 0 and random.random() < settings.error_rate:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Service unavailable")
+    return dependency
+
+
+def verify_microservice_access_token(access_key:str):
+    jwt_encoder = JwtEncoder(secret=access_key, algorithm=JWT_ALGORITHM)
+    async def dependency(microservice_access_token: Optional[str] = Header(default=None, alias="microserviceAccessToken")):
+        if microservice_access_token is None or not jwt_encoder.validate_jwt(microservice_access_token):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid token")
+    return dependency
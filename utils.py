@@ -1,5 +1,14 @@
+import hmac
+import math
+from contextvars import ContextVar
+from datetime import datetime,timedelta
+from typing import Optional
 from decouple import config
+from fastapi import HTTPException, Request, Response, Cookie, status
+from modules.idempotency.idempotency import IdempotencyStore, IdempotencyKeyConflictError
 from modules.jwt.jwt_module import JwtEncoder
+from modules.rate_limiter.rate_limiter import TokenBucketRateLimiter, parse_rate_limits
+from modules.server_timing import server_timing
 
 JWT_SECRET = config("JWT_SECRET")
 JWT_ALGORITHM="HS256"
@@ -8,8 +17,74 @@ JWT_ISSUER="cs-identity-provider.deta.dev"
 
 jwt_encoder = JwtEncoder(secret=JWT_SECRET, algorithm=JWT_ALGORITHM)
 
+# The rate limit dependency and the route decode the same cookie, async dependencies and routes run in
+# the same context, so the decoded token is kept for the rest of the request.
+_decoded_auth_token = ContextVar("decoded_auth_token", default=None)
+
 def decode_auth_token(token:str):
+    decoded_auth_token = _decoded_auth_token.get()
+    if decoded_auth_token is not None and decoded_auth_token[0] == token:
+        return decoded_auth_token[1]
+    with server_timing.measure("auth"):
+        try:
+            decoded_token = jwt_encoder.decode_jwt(token=token,audience=JWT_AUDIENCE,issuer=JWT_ISSUER)
+        except:
+            decoded_token = None
+    _decoded_auth_token.set((token, decoded_token))
+    return decoded_token
+
+def generate_microservice_access_token(microservice_jwt_encoder:JwtEncoder):
+    with server_timing.measure("token"):
+        return microservice_jwt_encoder.generate_jwt({"exp":(datetime.now() + timedelta(minutes=1)).timestamp()})
+
+DEBUG_ACCESS_KEY = config("DEBUG_ACCESS_KEY", default="")
+
+def is_valid_debug_access_key(key:str):
+    if not DEBUG_ACCESS_KEY or key is None:
+        return False
+    return hmac.compare_digest(key, DEBUG_ACCESS_KEY)
+
+RATE_LIMITING_ENABLED = config("RATE_LIMITING_ENABLED", default=False, cast=bool)
+RATE_LIMITS = config("RATE_LIMITS", default="auth=2/20,users=10/40,products=10/40,favorites=10/40,components=20/60,currencies=20/60")
+RATE_LIMITER_MAX_KEYS = config("RATE_LIMITER_MAX_KEYS", default=100000, cast=int)
+
+rate_limiters = {
+    route_group: TokenBucketRateLimiter(rate=rate, burst=burst, max_keys=RATE_LIMITER_MAX_KEYS)
+    for route_group, (rate, burst) in parse_rate_limits(RATE_LIMITS).items()
+} if RATE_LIMITING_ENABLED else {}
+
+def rate_limit(route_group:str):
+    # Router dependency limiting requests per user id from the auth cookie, or per client ip without a valid one.
+    async def check_rate_limit(request: Request, token: Optional[str] = Cookie(default=None)):
+        rate_limiter = rate_limiters.get(route_group)
+        if rate_limiter is None:
+            return
+        decoded_token = decode_auth_token(token) if token else None
+        key = f"user:{decoded_token['userId']}" if decoded_token else f"ip:{request.client.host if request.client else ''}"
+        retry_after = rate_limiter.acquire(key)
+        if retry_after > 0:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests",
+                headers={"Retry-After": str(math.ceil(retry_after))})
+    return check_rate_limit
+
+IDEMPOTENCY_KEY_TTL = config("IDEMPOTENCY_KEY_TTL", default=86400, cast=float)
+IDEMPOTENCY_STORE_MAX_ENTRIES = config("IDEMPOTENCY_STORE_MAX_ENTRIES", default=10000, cast=int)
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+idempotency_store = IdempotencyStore(ttl=IDEMPOTENCY_KEY_TTL, max_entries=IDEMPOTENCY_STORE_MAX_ENTRIES)
+
+async def run_idempotent(idempotency_key:Optional[str], user_id:str, fingerprint:str, operation, response:Response):
+    # Runs operation() once per user and Idempotency-Key, retries get the first outcome replayed.
+    if idempotency_key is None:
+        return await operation()
+    if not idempotency_key or len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid idempotency key")
     try:
-        return jwt_encoder.decode_jwt(token=token,audience=JWT_AUDIENCE,issuer=JWT_ISSUER)
-    except:
-        return None
\ No newline at end of file
+        result, replayed = await idempotency_store.run(user_id, idempotency_key, fingerprint, operation)
+    except IdempotencyKeyConflictError:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Idempotency key was already used for a different request")
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result